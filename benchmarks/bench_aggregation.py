@@ -0,0 +1,83 @@
+#!/usr/bin/env python3
+# benchmarks/bench_aggregation.py
+
+"""
+Benchmark da agregação fatiada: tempo das regras robustas x número de processos.
+
+Guarda `--clients` atualizações densas sintéticas com `--params` parâmetros
+(como chegariam numa rodada) e mede só o result() de cada regra, no próprio
+processo (1) e com a matriz em memória compartilhada dividida entre 2, 4, ...
+processos. O speedup é relativo ao executor serial.
+
+Uso:
+    python benchmarks/bench_aggregation.py [--params 20000000] [--clients 32] [--workers 1 2 4 8]
+"""
+
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import argparse
+import time
+import numpy as np
+from common.aggregation import ClientUpdate
+from common.robust_aggregation import AGGREGATION_RULES, make_aggregator
+from common.sharded_aggregation import create_executor
+
+
+def client_updates(global_weights, clients, scratch):
+    """
+    Atualizações sintéticas geradas sob demanda em um único buffer de trabalho:
+    aggregator.add copia cada uma para a matriz da rodada antes da próxima,
+    então o benchmark não guarda uma segunda cópia das `clients` atualizações
+    """
+    for i in range(clients):
+        np.random.default_rng(i).standard_normal(out=scratch, dtype=np.float32)
+        scratch *= 0.01
+        scratch += global_weights[0]
+        yield ClientUpdate('dense', [scratch]), 100 + i
+
+
+def bench(rule, global_weights, clients, executor, repeats):
+    """Tempo médio do result() da regra, com as atualizações já guardadas"""
+    times = []
+    scratch = np.empty_like(global_weights[0])
+    for _ in range(repeats):
+        aggregator = make_aggregator(rule, global_weights, clients, byzantine=clients // 4,
+                                     executor=executor)
+        for update, sample_count in client_updates(global_weights, clients, scratch):
+            aggregator.add(update, sample_count)
+        start = time.perf_counter()
+        aggregator.result()
+        times.append(time.perf_counter() - start)
+    return np.mean(times)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Speedup da agregação fatiada por número de processos")
+    parser.add_argument('--params', type=int, default=20_000_000)
+    parser.add_argument('--clients', type=int, default=32)
+    parser.add_argument('--workers', type=int, nargs='+', default=[1, 2, 4, 8])
+    parser.add_argument('--rules', nargs='+', default=[r for r in AGGREGATION_RULES if r != 'fedavg'])
+    parser.add_argument('--repeats', type=int, default=3)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    global_weights = [rng.standard_normal(args.params).astype(np.float32) * 0.05]
+
+    print(f"Modelo: {args.params} parâmetros, {args.clients} clientes, {os.cpu_count()} núcleos, "
+          f"{args.repeats} repetições")
+    print(f"{'Regra':<14}" + ''.join(f"{f'{w} proc. (s)':>14}" for w in args.workers) + f"{'Speedup':>10}")
+
+    executors = {w: create_executor(w) for w in args.workers}
+    try:
+        for rule in args.rules:
+            times = [bench(rule, global_weights, args.clients, executors[w], args.repeats) for w in args.workers]
+            print(f"{rule:<14}" + ''.join(f"{t:>14.3f}" for t in times) + f"{times[0] / min(times):>9.1f}x")
+    finally:
+        for executor in executors.values():
+            executor.shutdown()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,101 @@
+#!/usr/bin/env python3
+# benchmarks/bench_serialization.py
+
+"""
+Benchmark do protocolo de pesos do /fit: JSON (listas aninhadas) x binário.
+
+Mede, para os pesos do modelo de create_simple_model, o tempo de
+codificação, de transferência (via socket local) e de decodificação.
+
+Uso:
+    python benchmarks/bench_serialization.py [--repeats 20]
+"""
+
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import argparse
+import socket
+import struct
+import threading
+import time
+import numpy as np
+from common.serialization import (
+    CONTENT_TYPE_BINARY, CONTENT_TYPE_JSON, decode_payload, encode_payload
+)
+
+# Formatos dos tensores de create_simple_model (784x128 + 128 + 128x10 + 10 = 101.770 parâmetros)
+SIMPLE_MODEL_SHAPES = [(784, 128), (128,), (128, 10), (10,)]
+
+
+def transfer(body: bytes) -> float:
+    """Envia o payload por um par de sockets locais e retorna o tempo gasto"""
+    sender, receiver = socket.socketpair()
+    received = bytearray()
+
+    def receive():
+        (size,) = struct.unpack('<Q', receiver.recv(8, socket.MSG_WAITALL))
+        while len(received) < size:
+            chunk = receiver.recv(min(1 << 20, size - len(received)))
+            if not chunk:
+                break
+            received.extend(chunk)
+
+    reader = threading.Thread(target=receive)
+    start = time.perf_counter()
+    reader.start()
+    sender.sendall(struct.pack('<Q', len(body)) + body)
+    reader.join()
+    elapsed = time.perf_counter() - start
+
+    sender.close()
+    receiver.close()
+    return elapsed
+
+
+def bench(weights, content_type, repeats):
+    """Retorna (tamanho em bytes, encode médio, transferência média, decode médio)"""
+    encode_times, transfer_times, decode_times = [], [], []
+    body = b''
+    for _ in range(repeats):
+        start = time.perf_counter()
+        body = encode_payload(weights, {'sample_count': 1000}, content_type)
+        encode_times.append(time.perf_counter() - start)
+
+        transfer_times.append(transfer(body))
+
+        start = time.perf_counter()
+        decode_payload(body, content_type)
+        decode_times.append(time.perf_counter() - start)
+
+    return len(body), np.mean(encode_times), np.mean(transfer_times), np.mean(decode_times)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark JSON x binário para os pesos do /fit")
+    parser.add_argument('--repeats', type=int, default=20)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    weights = [rng.standard_normal(shape).astype(np.float32) * 0.05 for shape in SIMPLE_MODEL_SHAPES]
+    num_params = sum(w.size for w in weights)
+
+    print(f"Modelo: {num_params} parâmetros, {args.repeats} repetições")
+    print(f"{'Formato':<10}{'Tamanho (KB)':>14}{'Encode (ms)':>14}{'Transf. (ms)':>14}{'Decode (ms)':>14}")
+
+    results = {}
+    for name, content_type in (('json', CONTENT_TYPE_JSON), ('binary', CONTENT_TYPE_BINARY)):
+        size, encode_t, transfer_t, decode_t = bench(weights, content_type, args.repeats)
+        results[name] = (size, encode_t + transfer_t + decode_t)
+        print(f"{name:<10}{size / 1024:>14.1f}{encode_t * 1000:>14.2f}"
+              f"{transfer_t * 1000:>14.2f}{decode_t * 1000:>14.2f}")
+
+    json_size, json_total = results['json']
+    bin_size, bin_total = results['binary']
+    print(f"\nRedução de tamanho: {json_size / bin_size:.1f}x | "
+          f"Speedup total (encode+transf.+decode): {json_total / bin_total:.1f}x")
+
+
+if __name__ == '__main__':
+    main()
@@ -1,33 +1,281 @@
 # client-service/client_app.py
-from flask import Flask, request, jsonify
+from flask import Flask, request, jsonify, Response
+from werkzeug.exceptions import RequestEntityTooLarge
+from werkzeug.serving import WSGIRequestHandler
+from collections import OrderedDict
+import requests
 import tensorflow as tf
 import numpy as np
 from common.model import create_simple_model
+from common.serialization import (
+    decode_payload, encode_payload, negotiate_content_type, request_headers, PayloadError,
+    CONTENT_TYPE_BINARY
+)
+from common.sparsification import ErrorFeedback
+from common.streaming import CONTENT_TYPE_STREAM, LayerStream, read_stream
+from common.manifest import ModelManifest, ManifestMismatch, expand_flat_payload, flatten_payload
+from common.quantization import quantize, dequantize
+from common.compression import (
+    available_codecs, compress, decompress, max_wire_bytes, negotiate_encoding, read_response_body,
+    CompressionError, DEFAULT_MAX_DECOMPRESSED_BYTES, IDENTITY
+)
+from common.grpc_transport import (
+    CHANNEL_OPTIONS, SESSION_METHOD, decode_message, encode_message, result_messages, grpc
+)
 import os
+import queue
+import threading
+import time
 import traceback
 
 
 app = Flask(__name__)
 
-print("Carregando dados do MNIST...")
-(x_train, y_train), _ = tf.keras.datasets.mnist.load_data()
-x_train = x_train / 255.0
-
 client_id = int(os.environ.get('CLIENT_ID', 0))
+# Limite para o tamanho descomprimido dos payloads recebidos
+MAX_DECOMPRESSED_BYTES = int(os.environ.get('MAX_DECOMPRESSED_BYTES', DEFAULT_MAX_DECOMPRESSED_BYTES))
+# O corpo na rede também é limitado: o Flask recusa (413) um Content-Length maior
+app.config['MAX_CONTENT_LENGTH'] = max_wire_bytes(MAX_DECOMPRESSED_BYTES)
+# Quantidade de versões do modelo global mantidas no cache local
+MODEL_CACHE_SIZE = int(os.environ.get('MODEL_CACHE_SIZE', 2))
+MODEL_FETCH_TIMEOUT = float(os.environ.get('MODEL_FETCH_TIMEOUT', 60))
+# Codecs aceitos no download do modelo (modo pull), em ordem de preferência
+MODEL_ACCEPT_ENCODING = ', '.join(available_codecs() + [IDENTITY])
+# Sessão persistente (keep-alive) para baixar o modelo do orquestrador
+model_server_session = requests.Session()
+# Modo poll: o cliente busca as tarefas no orquestrador (GET /task) em vez de
+# receber chamadas no /fit; funciona sem rota do orquestrador até o cliente
+TASK_SERVER_URL = os.environ.get('TASK_SERVER_URL')
+CLIENT_NAME = os.environ.get('CLIENT_NAME', f'client-{client_id + 1}')
+TASK_POLL_WAIT = float(os.environ.get('TASK_POLL_WAIT', 30))
+# Transporte gRPC: um único stream bidirecional com o orquestrador (host:porta)
+GRPC_SERVER_ADDR = os.environ.get('GRPC_SERVER_ADDR')
+GRPC_HEARTBEAT_INTERVAL = float(os.environ.get('GRPC_HEARTBEAT_INTERVAL', 15))
 start_index = client_id * 1000
 end_index = start_index + 1000
-local_dataset = tf.data.Dataset.from_tensor_slices(
-    (x_train[start_index:end_index], y_train[start_index:end_index])
-).batch(32)
+# Shard local do MNIST, carregado em segundo plano (load_local_state) enquanto
+# o servidor HTTP já responde ao GET /health
+local_dataset = None
+
+# Resíduo da esparsificação top-k, acumulado entre as rodadas
+error_feedback = ErrorFeedback()
+
+# Versões do modelo global já recebidas (hash -> pesos), base para os diffs
+# e para evitar baixar de novo um modelo que já está aqui
+model_cache = OrderedDict()
+current_model = {"version": None}
+
+# Manifesto do modelo combinado com o orquestrador em POST /manifest
+session_manifest = {"manifest": None, "local": None}
+
+# Prontidão reportada em GET /health: cada flag só vira True quando o
+# carregamento correspondente termina em load_local_state
+readiness = {"dataset": False, "model": False}
+
+
+class BaseVersionMissing(Exception):
+    """Diff recebido para uma versão base que não está no cache local"""
+
+
+def load_local_state():
+    """Carrega o shard local do MNIST e constrói o modelo (e o manifesto), nessa ordem"""
+    global local_dataset
+    print("Carregando dados do MNIST...")
+    (x_train, y_train), _ = tf.keras.datasets.mnist.load_data()
+    local_dataset = tf.data.Dataset.from_tensor_slices(
+        (x_train[start_index:end_index] / 255.0, y_train[start_index:end_index])
+    ).batch(32)
+    readiness["dataset"] = True
+    print(f"Cliente {client_id} iniciado com dados do índice {start_index} ao {end_index}.")
+    # Constrói o modelo (e o manifesto) antes de aceitar tarefas, para que o
+    # primeiro /fit não pague a inicialização do TensorFlow
+    local_manifest()
+    readiness["model"] = True
+
+
+def not_ready():
+    """Resposta 503 (com o estado da prontidão) enquanto dados ou modelo ainda carregam"""
+    if all(readiness.values()):
+        return None
+    return jsonify({"error": f"Cliente {client_id} ainda carregando", **readiness}), 503
+
+
+def local_manifest() -> ModelManifest:
+    """Manifesto da arquitetura local, calculado uma única vez"""
+    if session_manifest["local"] is None:
+        session_manifest["local"] = ModelManifest.from_model(create_simple_model())
+    return session_manifest["local"]
+
+
+def load_global_model(metadata, weights):
+    """Dequantiza, aplica o diff (se houver) e guarda a versão no cache local"""
+    weights = expand_flat_payload(metadata, weights, session_manifest["manifest"])
+    weights = dequantize(weights, metadata.get('quantization'))
+
+    base_version = metadata.get('base_version')
+    if base_version is not None:
+        base = model_cache.get(base_version)
+        if base is None:
+            raise BaseVersionMissing(base_version)
+        weights = [b + diff for b, diff in zip(base, weights)]
+
+    version = metadata.get('model_version')
+    weights = [np.array(w, dtype=np.float32) for w in weights]
+    if version is not None:
+        model_cache[version] = weights
+        model_cache.move_to_end(version)
+        while len(model_cache) > MODEL_CACHE_SIZE:
+            model_cache.popitem(last=False)
+    current_model["version"] = version
+    return weights
+
+
+def fetch_global_model(model_url, version):
+    """Baixa do orquestrador uma versão que não está no cache (diff, se possível)"""
+    params = {'base': current_model["version"]} if current_model["version"] in model_cache else None
+    response = model_server_session.get(
+        model_url,
+        params=params,
+        headers={**request_headers(CONTENT_TYPE_BINARY), 'Accept-Encoding': MODEL_ACCEPT_ENCODING},
+        timeout=MODEL_FETCH_TIMEOUT,
+        stream=True
+    )
+    response.raise_for_status()
+    body, wire_size, _ = read_response_body(response, MAX_DECOMPRESSED_BYTES)
+    metadata, weights = decode_payload(body, response.headers.get('Content-Type'))
+    if metadata.get('model_version') != version:
+        raise PayloadError(f"Modelo recebido não corresponde à versão {version}")
+    print(f"Cliente {client_id}: modelo {version[:12]} baixado ({wire_size / 1e6:.2f} MB)")
+    return load_global_model(metadata, weights)
+
+
+@app.route('/health', methods=['GET'])
+def health():
+    """Prontidão do cliente: 200 quando pode treinar, 503 enquanto ainda carrega"""
+    ready = all(readiness.values())
+    body = {"ready": ready, "client_id": client_id, **readiness}
+    return jsonify(body), 200 if ready else 503
+
+
+@app.route('/manifest', methods=['POST'])
+def negotiate_manifest():
+    """Handshake do manifesto: recusa logo uma arquitetura diferente da local"""
+    loading = not_ready()
+    if loading is not None:
+        return loading
+    try:
+        remote = ModelManifest.from_dict(request.get_json(force=True))
+    except ManifestMismatch as e:
+        return jsonify({"error": str(e)}), 400
+
+    try:
+        local_manifest().check(remote)
+    except ManifestMismatch as e:
+        print(f"Cliente {client_id}: manifesto recusado ({e})")
+        return jsonify({"error": str(e), "manifest": local_manifest().to_dict()}), 409
+
+    session_manifest["manifest"] = remote
+    print(f"Cliente {client_id}: manifesto {remote.manifest_id} combinado")
+    return jsonify({"manifest_id": remote.manifest_id})
+
+
+def fit_streaming():
+    """
+    /fit no modo streaming: cada camada recebida é carregada direto na
+    variável do modelo e a resposta é gerada camada por camada, sem manter
+    uma cópia completa dos pesos em memória.
+    """
+    try:
+        config, layers = read_stream(request.stream, MAX_DECOMPRESSED_BYTES)
+    except PayloadError as e:
+        return jsonify({"error": str(e)}), 415
+    except RequestEntityTooLarge as e:
+        return jsonify({"error": e.description}), 413
+
+    model = create_simple_model()
+    model.compile(optimizer='adam',
+                  loss='sparse_categorical_crossentropy',
+                  metrics=['accuracy'])
+
+    loaded = 0
+    try:
+        for variable, layer in zip(model.weights, layers):
+            variable.assign(layer)
+            loaded += 1
+        # Consome o marcador de fim (e detecta camadas sobrando)
+        if next(layers, None) is not None or loaded != len(model.weights):
+            raise PayloadError("Número de camadas não corresponde ao modelo local")
+    except (PayloadError, ValueError) as e:
+        return jsonify({"error": str(e)}), 415
+    current_model["version"] = config.get('model_version')
+
+    # O top-k precisa dos pesos recebidos para calcular o delta
+    topk = config.get('update_mode') == 'topk'
+    weights = model.get_weights() if topk else None
+
+    print(f"Cliente {client_id}: Iniciando treinamento local (streaming)...")
+    model.fit(local_dataset, epochs=1, verbose=1)
+    print(f"Cliente {client_id}: Treinamento concluído.")
+
+    result = {
+        "sample_count": end_index - start_index,
+        "model_version": current_model["version"]
+    }
+    if topk:
+        delta = [new - old for new, old in zip(model.get_weights(), weights)]
+        sparse = error_feedback.compress(delta, float(config.get('density', 0.05)))
+        tensors = [sparse.indices, sparse.values]
+        result["update_type"] = "sparse_delta"
+    else:
+        # Cada camada só é copiada para fora do modelo quando for enviada
+        tensors = (variable.numpy() for variable in model.weights)
+
+    return Response(LayerStream(tensors, result), mimetype=CONTENT_TYPE_STREAM)
 
-print(f"Cliente {client_id} iniciado com dados do índice {start_index} ao {end_index}.")
 
 # 4. Definição da rota da API
 @app.route('/fit', methods=['POST'])
 def fit():
     try:
-        weights_json = request.json['weights']
-        weights = [np.array(w, dtype=np.float32) for w in weights_json]
+        loading = not_ready()
+        if loading is not None:
+            return loading
+        if request.content_type == CONTENT_TYPE_STREAM:
+            return fit_streaming()
+
+        # Aceita o protocolo binário ou JSON, conforme o Content-Type,
+        # opcionalmente comprimido (Content-Encoding)
+        try:
+            body = decompress(
+                request.get_data(),
+                request.headers.get('Content-Encoding', IDENTITY),
+                MAX_DECOMPRESSED_BYTES
+            )
+            config, weights = decode_payload(body, request.content_type)
+        except (PayloadError, CompressionError) as e:
+            return jsonify({"error": str(e)}), 415
+        except RequestEntityTooLarge as e:
+            return jsonify({"error": e.description}), 413
+
+        try:
+            if 'model_url' in config:
+                # Modo pull: o /fit traz só o hash; o modelo vem do cache ou do orquestrador
+                weights = model_cache.get(config['model_version'])
+                if weights is None:
+                    weights = fetch_global_model(config['model_url'], config['model_version'])
+                else:
+                    current_model["version"] = config['model_version']
+            else:
+                weights = load_global_model(config, weights)
+        except BaseVersionMissing:
+            # Diff do modelo global sobre uma versão que não temos
+            return jsonify({
+                "error": "Versão base do diff não está no cache local",
+                "model_version": current_model["version"]
+            }), 409
+        except ManifestMismatch as e:
+            # Manifesto não combinado (ex.: cliente reiniciado); o orquestrador refaz o handshake
+            return jsonify({"error": str(e)}), 412
 
         model = create_simple_model()
 
@@ -40,21 +288,218 @@ def fit():
         print(f"Cliente {client_id}: Iniciando treinamento local...")
         model.fit(local_dataset, epochs=1, verbose=1)
 
-        new_weights = [w.tolist() for w in model.get_weights()]
         print(f"Cliente {client_id}: Treinamento concluído.")
 
-        return jsonify({
-            "weights": new_weights, 
-            "sample_count": end_index - start_index
-        })
+        new_weights = model.get_weights()
+        result = {
+            "sample_count": end_index - start_index,
+            "model_version": current_model["version"]
+        }
+
+        uplink_quantization = config.get('uplink_quantization', 'none')
+
+        if config.get('update_mode') == 'topk':
+            # Envia só as maiores coordenadas do delta; o resto fica no resíduo
+            delta = [new - old for new, old in zip(new_weights, weights)]
+            sparse = error_feedback.compress(delta, float(config.get('density', 0.05)))
+            tensors = [sparse.indices, sparse.values]
+            result["update_type"] = "sparse_delta"
+        elif uplink_quantization != 'none':
+            # Quantizar o delta preserva muito mais precisão do que quantizar os pesos
+            tensors = [new - old for new, old in zip(new_weights, weights)]
+            result["update_type"] = "dense_delta"
+        else:
+            tensors = new_weights
+
+        tensors, quantization = quantize(
+            tensors, uplink_quantization, config.get('stochastic_rounding', False)
+        )
+        if quantization:
+            result["quantization"] = quantization
+        tensors, result = flatten_payload(tensors, result, session_manifest["manifest"])
+
+        # Responde no formato e na compressão pedidos pelo orquestrador
+        response_type = negotiate_content_type(request.headers.get('Accept'))
+        encoding = negotiate_encoding(request.headers.get('Accept-Encoding'))
+        body = compress(
+            encode_payload(tensors, result, response_type),
+            encoding,
+            config.get('compression_level')
+        )
+        response = Response(body, mimetype=response_type)
+        if encoding != IDENTITY:
+            response.headers['Content-Encoding'] = encoding
+        return response
 
     except Exception as e:
         print(f"ERRO CRÍTICO no cliente {client_id}: {e}")
         traceback.print_exc()
         return jsonify({"error": str(e)}), 500
 
+def run_task(body, headers):
+    """Executa uma tarefa recebida pela fila com o mesmo handler do /fit"""
+    with app.test_request_context('/fit', method='POST', data=body, headers=headers):
+        return app.make_response(fit())
+
+
+def execute_task(body, headers, manifest_source):
+    """
+    Executa uma tarefa; num 412 (manifesto não combinado), combina o manifesto
+    da sessão obtido por manifest_source(), como no POST /manifest, e tenta de novo
+    """
+    result = run_task(body, headers)
+    if result.status_code != 412:
+        return result
+    with app.test_request_context('/manifest', method='POST', json=manifest_source()):
+        manifest_result = app.make_response(negotiate_manifest())
+    if manifest_result.status_code != 200:
+        manifest_result.status_code = 412  # Arquitetura diferente
+        return manifest_result
+    return run_task(body, headers)
+
+
+def fetch_task_manifest(session):
+    """Manifesto da sessão publicado pelo orquestrador (GET /manifest)"""
+    response = session.get(f"{TASK_SERVER_URL}/manifest", timeout=MODEL_FETCH_TIMEOUT)
+    response.raise_for_status()
+    return response.json()
+
+
+def task_worker():
+    """
+    Laço do modo poll: espera uma tarefa por até TASK_POLL_WAIT segundos,
+    treina e devolve a resposta do /fit em POST /task/<id>/result.
+    """
+    session = requests.Session()
+    backoff = 1.0
+    print(f"Cliente {client_id}: buscando tarefas em {TASK_SERVER_URL} como {CLIENT_NAME}")
+    while True:
+        try:
+            response = session.get(
+                f"{TASK_SERVER_URL}/task",
+                params={'client': CLIENT_NAME, 'wait': TASK_POLL_WAIT},
+                timeout=TASK_POLL_WAIT + MODEL_FETCH_TIMEOUT,
+                stream=True  # O corpo é lido sem a descompressão automática
+            )
+            if response.status_code == 204:
+                response.close()
+                backoff = 1.0
+                continue
+            response.raise_for_status()
+            body = response.raw.read(decode_content=False)
+            response.close()
+            headers = {
+                'Content-Type': response.headers.get('Content-Type'),
+                'Content-Encoding': response.headers.get('Content-Encoding', IDENTITY),
+                'Accept': response.headers.get('X-Accept', '*/*'),
+                'Accept-Encoding': response.headers.get('X-Accept-Encoding', IDENTITY),
+            }
+
+            result = execute_task(body, headers, lambda: fetch_task_manifest(session))
+
+            result_headers = {'Content-Type': result.content_type, 'X-Fit-Status': str(result.status_code)}
+            if 'Content-Encoding' in result.headers:
+                result_headers['Content-Encoding'] = result.headers['Content-Encoding']
+            result_body = result.get_data()
+            reconnected = False
+            while True:
+                try:
+                    posted = session.post(
+                        f"{TASK_SERVER_URL}/task/{response.headers['X-Task-Id']}/result",
+                        data=result_body, headers=result_headers, timeout=MODEL_FETCH_TIMEOUT
+                    )
+                except requests.exceptions.ConnectionError:
+                    # Conexão keep-alive fechada durante o treino; tenta uma vez com outra
+                    if reconnected:
+                        raise
+                    reconnected = True
+                    continue
+                if posted.status_code != 429:
+                    break
+                # Orçamento de memória do orquestrador cheio: reenvia depois
+                time.sleep(float(posted.headers.get('Retry-After', 1)))
+            if posted.status_code == 410:
+                print(f"Cliente {client_id}: tarefa cancelada pelo orquestrador, resultado descartado")
+            backoff = 1.0
+        except requests.exceptions.RequestException as e:
+            print(f"Cliente {client_id}: orquestrador indisponível ({e}); nova tentativa em {backoff:.0f}s")
+            time.sleep(backoff)
+            backoff = min(backoff * 2, 60.0)
+
+
+def grpc_worker():
+    """
+    Transporte gRPC: mantém um stream com o orquestrador, treina cada tarefa
+    recebida e devolve o resultado pelo mesmo stream, com heartbeats enquanto
+    não há o que enviar. Reconecta com backoff se o stream cair.
+    """
+    backoff = 1.0
+    print(f"Cliente {client_id}: conectando ao orquestrador via gRPC em {GRPC_SERVER_ADDR} como {CLIENT_NAME}")
+    while True:
+        outbox = queue.Queue()
+        session_manifest_dict = {}
+
+        def outgoing():
+            yield encode_message({'type': 'hello', 'client': CLIENT_NAME})
+            while True:
+                try:
+                    message = outbox.get(timeout=GRPC_HEARTBEAT_INTERVAL)
+                except queue.Empty:
+                    message = encode_message({'type': 'heartbeat'})
+                if message is None:
+                    return
+                yield message
+
+        channel = grpc.insecure_channel(GRPC_SERVER_ADDR, options=CHANNEL_OPTIONS)
+        try:
+            for data in channel.stream_stream(SESSION_METHOD)(outgoing()):
+                backoff = 1.0
+                header, body = decode_message(data)
+                if header['type'] == 'manifest':
+                    session_manifest_dict.update(header['manifest'])
+                    continue
+                if header['type'] != 'task':
+                    continue
+                headers = {
+                    'Content-Type': header.get('content_type'),
+                    'Content-Encoding': header.get('content_encoding') or IDENTITY,
+                    'Accept': header.get('accept') or '*/*',
+                    'Accept-Encoding': header.get('accept_encoding') or IDENTITY,
+                }
+                result = execute_task(bytes(body), headers, lambda: session_manifest_dict)
+                # O corpo vai em pedaços, depois do cabeçalho com o tamanho
+                for message in result_messages({
+                    'task_id': header['task_id'],
+                    'status': result.status_code,
+                    'content_type': result.content_type,
+                    'content_encoding': result.headers.get('Content-Encoding', IDENTITY),
+                }, result.get_data()):
+                    outbox.put(message)
+        except grpc.RpcError as e:
+            print(f"Cliente {client_id}: stream gRPC encerrado ({e.code()}); nova tentativa em {backoff:.0f}s")
+        finally:
+            outbox.put(None)
+            channel.close()
+        time.sleep(backoff)
+        backoff = min(backoff * 2, 60.0)
+
+
+def start_client():
+    """Carrega dados e modelo e então inicia o laço de tarefas (modos grpc e poll)"""
+    load_local_state()
+    if GRPC_SERVER_ADDR:
+        grpc_worker()
+    elif TASK_SERVER_URL:
+        task_worker()
+
+
 # 5. Execução do servidor
 if __name__ == '__main__':
+    # O servidor HTTP sobe já (GET /health responde 503 até a carga terminar);
+    # nos modos poll e grpc, o cliente só passa a buscar tarefas depois dela
+    threading.Thread(target=start_client, daemon=True).start()
+    # HTTP/1.1 para o orquestrador reaproveitar a conexão entre as chamadas
+    WSGIRequestHandler.protocol_version = "HTTP/1.1"
     app.run(host='0.0.0.0', port=5000)
 
 # Simulação de dados locais (em um cenário real, os dados já estariam aqui)
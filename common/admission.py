@@ -0,0 +1,90 @@
+# /common/admission.py
+
+"""
+Controle de admissão das atualizações recebidas, por orçamento de memória.
+
+Com o envio concorrente, as respostas de todos os clientes podem chegar ao
+mesmo tempo; sem limite, o orquestrador leria e decodificaria N corpos de
+uma vez (corpo comprimido + descomprimido, ou o texto JSON + os arrays). O
+AdmissionController reserva, antes de cada leitura, uma estimativa da
+memória que ela vai ocupar até a atualização ser decodificada, e só deixa
+entrar leituras enquanto a soma cabe no orçamento.
+
+O que acontece com quem não cabe depende do transporte:
+
+    push   a leitura é adiada: a resposta fica no socket e o TCP segura o cliente
+    poll   o POST do resultado recebe 429 + Retry-After e o cliente reenvia
+    grpc   o stream deixa de ser lido e o controle de fluxo do HTTP/2 segura o cliente
+
+Uma leitura maior que o orçamento inteiro é admitida sozinha, quando nada
+mais estiver reservado, para não travar a rodada.
+"""
+
+import threading
+import time
+
+from common.compression import IDENTITY
+from common.serialization import CONTENT_TYPE_BINARY, CONTENT_TYPE_JSON
+
+
+class AdmissionTimeout(TimeoutError):
+    """O orçamento não liberou espaço para a leitura dentro do prazo"""
+
+
+class AdmissionController:
+    """
+    Orçamento de `budget_bytes` para as leituras em andamento. `dense_bytes`
+    é o tamanho de uma atualização densa float32 (ModelManifest.total_size * 4),
+    usado quando o tamanho descomprimido não é conhecido.
+    """
+
+    def __init__(self, budget_bytes: int, dense_bytes: int):
+        self.budget_bytes = budget_bytes
+        self.dense_bytes = dense_bytes
+        self.in_use = 0
+        self.peak = 0  # Maior reserva simultânea
+        self.deferred = 0  # Leituras que tiveram de esperar (ou foram recusadas)
+        self._changed = threading.Condition()
+
+    def cost(self, headers) -> int:
+        """Memória estimada para ler e decodificar um corpo com estes cabeçalhos"""
+        length = int(headers.get('Content-Length') or self.dense_bytes)
+        content_type = (headers.get('Content-Type') or '').split(';')[0].strip()
+        if headers.get('Content-Encoding', IDENTITY) != IDENTITY:
+            # Corpo na rede + descomprimido (ao menos uma atualização densa)
+            length += max(length, self.dense_bytes)
+        if content_type == CONTENT_TYPE_JSON:
+            # O texto fica em memória junto com os arrays decodificados
+            return 2 * length + self.dense_bytes
+        if content_type != CONTENT_TYPE_BINARY:
+            return length + self.dense_bytes
+        return length
+
+    def acquire(self, nbytes: int, timeout: float = None) -> bool:
+        """Reserva `nbytes`, esperando até `timeout` segundos (None = sem limite)"""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._changed:
+            waited = False
+            while self.in_use and self.in_use + nbytes > self.budget_bytes:
+                if not waited:
+                    self.deferred += 1
+                    waited = True
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    return False
+                self._changed.wait(remaining)
+            self.in_use += nbytes
+            self.peak = max(self.peak, self.in_use)
+            return True
+
+    def release(self, nbytes: int):
+        with self._changed:
+            self.in_use -= nbytes
+            self._changed.notify_all()
+
+    def admit(self, headers, timeout: float = None) -> int:
+        """Reserva o custo de um corpo com estes cabeçalhos; levanta AdmissionTimeout se não couber"""
+        nbytes = self.cost(headers)
+        if not self.acquire(nbytes, timeout):
+            raise AdmissionTimeout(f"Orçamento de memória cheio ({self.in_use / 1e6:.1f} MB em uso)")
+        return nbytes
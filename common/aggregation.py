@@ -0,0 +1,290 @@
+# /common/aggregation.py
+
+"""
+Agregação Federated Averaging das atualizações dos clientes.
+
+Aceita pesos densos (formato original do /fit), deltas densos e deltas
+esparsos top-k, em float32 ou quantizados (fp16/int8).
+
+Cada atualização densa é tratada como um único vetor float32 contíguo no
+layout do manifesto: quando o payload já chega plano (manifest_id), o
+vetor é o próprio buffer recebido, sem cópia; caso contrário, as camadas
+são copiadas (e dequantizadas) uma vez para um buffer de trabalho. A média
+vira então uma redução ponderada sobre vetores inteiros, sem laço por
+camada: weighted_sum percorre os vetores em blocos que cabem no cache, e o
+resultado só é dividido nas camadas do Keras no fim (views).
+"""
+
+import threading
+from typing import NamedTuple, Optional
+import numpy as np
+from common.quantization import dequantize, dequantize_tensor
+from common.serialization import PayloadError
+
+UPDATE_DENSE = 'dense'
+UPDATE_DENSE_DELTA = 'dense_delta'
+UPDATE_SPARSE_DELTA = 'sparse_delta'
+
+# Elementos por bloco na redução ponderada (256 KB em float32: cabe no cache L2)
+AGGREGATION_BLOCK = 1 << 16
+
+
+class ClientUpdate(NamedTuple):
+    """Atualização recebida de um cliente, ainda no formato do payload"""
+    update_type: str
+    tensors: list
+    quantization: Optional[dict] = None
+    flat: Optional[np.ndarray] = None  # Buffer plano de que `tensors` são views (payload com manifesto)
+
+
+def parse_client_update(metadata, tensors, flat=None) -> ClientUpdate:
+    """Converte a resposta decodificada do /fit em uma ClientUpdate"""
+    return ClientUpdate(
+        metadata.get('update_type', UPDATE_DENSE),
+        tensors,
+        metadata.get('quantization'),
+        flat
+    )
+
+
+def sparse_delta(update: ClientUpdate, size: int):
+    """
+    (índices, valores) de um delta esparso, dequantizados e validados contra um
+    vetor de `size` elementos. Levanta PayloadError se o par estiver malformado
+    ou algum índice cair fora de [0, size). Índices repetidos são permitidos: a
+    soma deve usar np.add.at, que acumula cada ocorrência.
+    """
+    try:
+        indices, values = dequantize(update.tensors, update.quantization)
+    except ValueError as e:
+        raise PayloadError(f"Delta esparso malformado: {e}") from e
+    indices, values = np.asarray(indices), np.asarray(values)
+    if indices.ndim != 1 or indices.dtype.kind not in 'iu':
+        raise PayloadError(f"Índices do delta esparso devem ser inteiros 1-D, não {indices.dtype}{indices.shape}")
+    if values.shape != indices.shape:
+        raise PayloadError(f"{values.size} valores para {indices.size} índices no delta esparso")
+    if indices.size and (int(indices.min()) < 0 or int(indices.max()) >= size):
+        raise PayloadError(f"Índice do delta esparso fora do intervalo [0, {size})")
+    return indices, values
+
+
+def layer_offsets(weights) -> np.ndarray:
+    """Posição de cada camada no vetor achatado (len(weights) + 1 valores)"""
+    return np.cumsum([0] + [w.size for w in weights])
+
+
+def dense_vector(update: ClientUpdate, offsets, out: np.ndarray) -> np.ndarray:
+    """
+    Atualização densa como um vetor float32 contíguo. Um payload plano em
+    float32 é devolvido sem cópia; nos demais casos as camadas são escritas
+    (dequantizadas) em `out`, que é devolvido.
+    """
+    quantized = update.quantization and update.quantization.get('mode', 'none') != 'none'
+    flat = update.flat
+    if flat is not None and not quantized and flat.dtype == np.float32 and flat.size == out.size:
+        return flat
+    if len(update.tensors) != len(offsets) - 1:
+        raise ValueError(f"Atualização com {len(update.tensors)} camadas, esperado {len(offsets) - 1}")
+    params = (update.quantization or {}).get('params') or [None] * len(update.tensors)
+    for i, (tensor, p) in enumerate(zip(update.tensors, params)):
+        if tensor.size != offsets[i + 1] - offsets[i]:
+            raise ValueError(f"Camada {i} com {tensor.size} elementos, esperado {offsets[i + 1] - offsets[i]}")
+        out[offsets[i]:offsets[i + 1]] = dequantize_tensor(tensor, p).reshape(-1)
+    return out
+
+
+def weighted_sum(vectors, coefficients, out: np.ndarray, accumulate: bool = False,
+                 block_size: int = AGGREGATION_BLOCK) -> np.ndarray:
+    """
+    out (+)= Σ coefficients[i] * vectors[i], sobre vetores float32 do mesmo
+    tamanho. A redução percorre o vetor em blocos de `block_size` elementos:
+    o bloco de `out` e o buffer de trabalho ficam no cache enquanto todas as
+    atualizações são somadas a ele, e cada vetor é lido uma única vez.
+    """
+    scratch = np.empty(min(block_size, out.size), dtype=np.float32)
+    coefficients = [np.float32(c) for c in coefficients]
+    for start in range(0, out.size, block_size):
+        stop = min(start + block_size, out.size)
+        target = out[start:stop]
+        weighted = scratch[:stop - start]
+        terms = zip(vectors, coefficients)
+        if not accumulate:
+            vector, c = next(terms, (None, None))
+            if vector is None:
+                target.fill(0)
+                continue
+            np.multiply(vector[start:stop], c, out=target, casting='unsafe')
+        for vector, c in terms:
+            np.multiply(vector[start:stop], c, out=weighted, casting='unsafe')
+            target += weighted
+    return out
+
+
+def federated_average(global_weights, client_updates):
+    """
+    Média ponderada pelo número de amostras de cada cliente.
+
+    client_updates: lista de (ClientUpdate, sample_count). Deltas são
+    relativos a global_weights.
+    """
+    total_samples = sum(sample_count for _, sample_count in client_updates)
+
+    # O novo modelo é um único vetor (as camadas são views dele): os deltas
+    # esparsos entram pelos índices achatados e as atualizações densas numa
+    # única redução ponderada sobre os vetores inteiros
+    new_flat, new_weights = _flat_layers(global_weights)
+    offsets = layer_offsets(global_weights)
+
+    vectors, coefficients = [], []
+    scratch = None  # Vetor de trabalho para as atualizações que não chegam planas
+    delta_share = 0.0
+    for update, sample_count in client_updates:
+        weight_contribution = sample_count / total_samples
+
+        if update.update_type == UPDATE_SPARSE_DELTA:
+            indices, values = sparse_delta(update, new_flat.size)
+            np.add.at(new_flat, indices, values * np.float32(weight_contribution))
+        else:
+            if scratch is None:
+                scratch = np.empty(new_flat.size, dtype=np.float32)
+            vector = dense_vector(update, offsets, scratch)
+            if vector is scratch:
+                # Camadas copiadas/dequantizadas: somadas antes que o buffer seja reaproveitado
+                weighted_sum([vector], [weight_contribution], new_flat, accumulate=True)
+            else:
+                vectors.append(vector)
+                coefficients.append(weight_contribution)
+
+        if update.update_type != UPDATE_DENSE:
+            # global + delta: a parte global é somada uma única vez abaixo
+            delta_share += weight_contribution
+
+    if delta_share:
+        if scratch is None:
+            scratch = np.empty(new_flat.size, dtype=np.float32)
+        for i, global_w in enumerate(global_weights):
+            scratch[offsets[i]:offsets[i + 1]] = np.asarray(global_w).reshape(-1)
+        vectors.append(scratch)
+        coefficients.append(delta_share)
+
+    weighted_sum(vectors, coefficients, new_flat, accumulate=True)
+    return new_weights
+
+
+class StreamingAverage:
+    """
+    FedAvg incremental: cada atualização é somada (ponderada por sample_count)
+    à soma corrente assim que chega, e o buffer em que foi recebida pode ser
+    liberado em seguida; a memória fica em O(tamanho do modelo), qualquer que
+    seja o número de clientes da rodada.
+
+    No modo streaming, as camadas de uma atualização são escritas, à medida
+    que chegam do socket, num buffer só dela (fora do lock); a soma corrente só
+    recebe a atualização completa, de modo que uma transferência interrompida é
+    descartada sem corromper a média e um cliente lento não segura os uploads
+    dos demais. add() e add_stream() podem ser chamados de várias threads.
+
+    seal() fecha a entrada (sob o lock): uma thread de straggler que termine
+    depois disso tem a atualização recusada, e `clients` fica com exatamente
+    os clientes que entraram na média.
+    """
+
+    def __init__(self, global_weights):
+        self.global_weights = global_weights
+        self._sum, _ = _flat_layers(global_weights)
+        self._scratch = np.empty_like(self._sum)  # Camadas copiadas/dequantizadas em add() (sob o lock)
+        self._offsets = layer_offsets(global_weights)
+        self.total_samples = 0
+        self._delta_samples = 0
+        self.clients = {}  # Índice do cliente -> amostras somadas à média
+        self._lock = threading.Lock()
+        self._closed = False
+
+    def _check_open(self):
+        if self._closed:
+            raise ValueError("Rodada já agregada; atualização tardia descartada")
+
+    def add_stream(self, metadata, layers, out: np.ndarray = None, client: int = None):
+        """
+        Soma uma atualização recebida em streaming (metadados + gerador de camadas).
+        out: vetor float32 do tamanho do modelo onde as camadas são escritas (ex.:
+        o slot da arena do cliente); sem ele, um buffer é alocado para o upload.
+        client: índice do cliente, registrado em `clients`
+        """
+        update_type = metadata.get('update_type', UPDATE_DENSE)
+        if update_type == UPDATE_SPARSE_DELTA:
+            # Índices e valores precisam estar completos antes da soma
+            self.add(parse_client_update(metadata, list(layers)), metadata['sample_count'], client)
+            return
+        self._check_open()
+        pending = np.empty_like(self._sum) if out is None else out[:self._sum.size]
+        received = 0
+        for i, layer in enumerate(layers):
+            if i >= len(self.global_weights):
+                raise ValueError(f"Atualização com mais camadas que o modelo ({len(self.global_weights)})")
+            expected = self.global_weights[i].shape
+            if layer.shape != expected:
+                raise ValueError(f"Camada {i} com shape {layer.shape}, esperado {expected}")
+            pending[self._offsets[i]:self._offsets[i + 1]] = dequantize_tensor(layer).reshape(-1)
+            received += 1
+        if received != len(self.global_weights):
+            raise ValueError(f"Atualização incompleta: {received}/{len(self.global_weights)} camadas")
+        with self._lock:
+            self._check_open()
+            weighted_sum([pending], [metadata['sample_count']], self._sum, accumulate=True)
+            self._count(metadata['sample_count'], update_type, client)
+
+    def add(self, update: ClientUpdate, sample_count, client: int = None):
+        """
+        Soma uma atualização já recebida por completo; ao retornar, os buffers
+        da atualização podem ser liberados. Levanta ValueError depois de seal().
+        """
+        with self._lock:
+            self._check_open()
+            if update.update_type == UPDATE_SPARSE_DELTA:
+                indices, values = sparse_delta(update, self._sum.size)
+                np.add.at(self._sum, indices, values * np.float32(sample_count))
+            else:
+                # dense_vector valida o tamanho antes de qualquer escrita na soma
+                vector = dense_vector(update, self._offsets, self._scratch)
+                weighted_sum([vector], [sample_count], self._sum, accumulate=True)
+            self._count(sample_count, update.update_type, client)
+
+    def _count(self, sample_count, update_type, client):
+        self.total_samples += sample_count
+        if update_type != UPDATE_DENSE:
+            self._delta_samples += sample_count
+        if client is not None:
+            self.clients[client] = self.clients.get(client, 0) + sample_count
+
+    def seal(self):
+        """Fecha a entrada de atualizações; result() ainda pode ser chamado"""
+        with self._lock:
+            self._closed = True
+
+    def close(self):
+        """Encerra a média sem resultado (ex.: rodada pulada); atualizações tardias são recusadas"""
+        self.seal()
+
+    def result(self):
+        """
+        Novos pesos globais (views de um único vetor), com as atualizações
+        somadas até seal(). Encerra a média, se ainda estiver aberta.
+        """
+        self.seal()
+        new_flat, new_weights = _flat_layers(self.global_weights)
+        np.multiply(self._sum, 1.0 / self.total_samples, out=new_flat, casting='unsafe')
+        if self._delta_samples:
+            delta_share = self._delta_samples / self.total_samples
+            for new_w, global_w in zip(new_weights, self.global_weights):
+                new_w += global_w * delta_share
+        return new_weights
+
+
+def _flat_layers(weights):
+    """Vetor float32 zerado e as views por camada com os shapes de `weights`"""
+    sizes = [w.size for w in weights]
+    flat = np.zeros(sum(sizes), dtype=np.float32)
+    offsets = np.cumsum([0] + sizes)
+    layers = [flat[offsets[i]:offsets[i + 1]].reshape(w.shape) for i, w in enumerate(weights)]
+    return flat, layers
@@ -0,0 +1,142 @@
+# /common/arena.py
+
+"""
+Arena de recepção das atualizações dos clientes.
+
+Em vez de acumular cada resposta em um objeto bytes novo (e, no JSON, em
+listas aninhadas de floats), o orquestrador aloca uma única vez um buffer
+com um slot por cliente, dimensionado pelo manifesto de shapes do modelo.
+As respostas binárias sem compressão são lidas com readinto diretamente no
+slot do cliente e decodificadas com np.frombuffer, de modo que os tensores
+entregues à agregação são views sobre a arena, reaproveitada a cada rodada.
+
+Os slots não são fixos por cliente: cada resposta ocupa um slot livre até
+ser somada ao agregador da rodada, de modo que a arena é dimensionada pelas
+leituras simultâneas e não pela população inteira.
+
+Respostas comprimidas, em JSON, maiores que o slot (ex.: top-k com
+densidade alta) ou que chegam sem slot livre caem no caminho normal de
+read_response_body.
+"""
+
+import threading
+import numpy as np
+
+from common.compression import DEFAULT_MAX_DECOMPRESSED_BYTES, IDENTITY, read_response_body
+from common.serialization import CONTENT_TYPE_BINARY, MAGIC
+
+# Espaço reservado para os metadados JSON de cada resposta
+DEFAULT_METADATA_BYTES = 64 * 1024
+
+# Tamanho de cada leitura do socket para dentro do slot
+_READ_CHUNK = 1024 * 1024
+
+# Início de cada slot alinhado à linha de cache (e a float32, para as views de vector())
+_SLOT_ALIGNMENT = 64
+
+
+def binary_payload_size(manifest, metadata_bytes: int = DEFAULT_METADATA_BYTES) -> int:
+    """Tamanho máximo de um payload binário com as camadas (shape, dtype) do manifesto"""
+    size = len(MAGIC) + 4 + metadata_bytes + 4
+    for spec in manifest:
+        nbytes = int(np.prod(spec.shape, dtype=np.int64)) * np.dtype(spec.dtype).itemsize
+        size += 2 + 4 * len(spec.shape) + 8 + nbytes
+    return size
+
+
+class UpdateArena:
+    """
+    Buffer pré-alocado com `num_slots` slots, cada um grande o bastante para
+    uma atualização densa float32 com as camadas `manifest` (ModelManifest.layers).
+
+    Os tensores decodificados de um slot continuam válidos até o cliente
+    liberar o slot (release/release_all) e ele ser ocupado por outra resposta.
+    """
+
+    def __init__(self, manifest, num_slots: int, metadata_bytes: int = DEFAULT_METADATA_BYTES):
+        self.manifest = list(manifest)
+        self.num_slots = num_slots
+        size = binary_payload_size(self.manifest, metadata_bytes)
+        self.slot_size = -(-size // _SLOT_ALIGNMENT) * _SLOT_ALIGNMENT
+        self._buffer = np.empty(num_slots * self.slot_size, dtype=np.uint8)
+        self._view = memoryview(self._buffer)
+        self._assigned = {}  # Índice do cliente -> slot ocupado
+        self._free = list(range(num_slots - 1, -1, -1))
+        self._lock = threading.Lock()
+
+    @property
+    def nbytes(self) -> int:
+        return self._buffer.nbytes
+
+    def slot(self, index: int) -> memoryview:
+        start = index * self.slot_size
+        return self._view[start:start + self.slot_size]
+
+    def vector(self, index: int, size: int):
+        """
+        Vetor float32 de `size` elementos sobre o slot do cliente `index` (ex.:
+        as camadas de um upload em streaming); None se a arena estiver cheia.
+        Vale até o slot ser liberado.
+        """
+        if size * 4 > self.slot_size:
+            return None
+        slot = self._acquire(index)
+        if slot is None:
+            return None
+        return np.frombuffer(self.slot(slot), dtype=np.float32, count=size)
+
+    def _acquire(self, index: int):
+        """Slot do cliente `index` (reaproveita o que já ocupa); None se a arena estiver cheia"""
+        with self._lock:
+            slot = self._assigned.get(index)
+            if slot is None and self._free:
+                slot = self._assigned[index] = self._free.pop()
+            return slot
+
+    def release(self, index: int):
+        """Devolve o slot do cliente `index`; seus tensores deixam de ser válidos"""
+        with self._lock:
+            slot = self._assigned.pop(index, None)
+            if slot is not None:
+                self._free.append(slot)
+
+    def release_all(self, keep=()):
+        """Libera os slots de todos os clientes, exceto `keep` (ex.: stragglers ainda lendo)"""
+        with self._lock:
+            for index in [i for i in self._assigned if i not in keep]:
+                self._free.append(self._assigned.pop(index))
+
+    def fits(self, response) -> bool:
+        """A resposta pode ser lida direto na arena (binária, sem compressão e com tamanho conhecido)?"""
+        headers = response.headers
+        content_type = (headers.get('Content-Type') or '').split(';')[0].strip()
+        content_length = headers.get('Content-Length')
+        return (
+            content_type == CONTENT_TYPE_BINARY
+            and headers.get('Content-Encoding', IDENTITY) == IDENTITY
+            and content_length is not None
+            and int(content_length) <= self.slot_size
+        )
+
+    def read(self, index: int, response, max_size: int = DEFAULT_MAX_DECOMPRESSED_BYTES):
+        """
+        Lê o corpo de uma resposta do requests (aberta com stream=True).
+        Retorna: (corpo, tamanho na rede, tempo de CPU da descompressão), onde
+        o corpo é uma view sobre o slot do cliente `index` sempre que possível.
+        """
+        slot = self._acquire(index) if self.fits(response) else None
+        if slot is None:
+            return read_response_body(response, max_size)
+
+        length = int(response.headers['Content-Length'])
+        target = self.slot(slot)[:length]
+        received = 0
+        try:
+            while received < length:
+                n = response.raw.readinto(target[received:received + _READ_CHUNK])
+                if not n:
+                    break
+                received += n
+        finally:
+            response.close()
+        return target[:received], received, 0.0
@@ -0,0 +1,94 @@
+# /common/broadcast.py
+
+"""
+Estágio de broadcast de uma rodada.
+
+O modelo global é quantizado, serializado e comprimido uma única vez por
+variante (modelo completo, diff sobre uma versão base ou só o hash, no
+modo pull). O buffer resultante é imutável e reaproveitado em todos os
+envios e reenvios da rodada, em vez de refazer o json.dumps por cliente.
+"""
+
+import threading
+import time
+from dataclasses import dataclass
+from typing import Optional
+
+from common.compression import CompressionStats, IDENTITY, compress
+from common.manifest import ModelManifest, flatten_payload
+from common.quantization import quantize
+from common.serialization import encode_payload
+
+
+@dataclass
+class DownlinkEncoding:
+    """Como o modelo global é codificado para os clientes"""
+    content_type: str
+    quantization: str = 'none'
+    stochastic_rounding: bool = False
+    compression: str = IDENTITY
+    compression_level: Optional[int] = None
+    # Com o manifesto combinado, as camadas vão em um único buffer plano
+    manifest: Optional[ModelManifest] = None
+
+    def encode(self, tensors, metadata, stats: 'RoundBroadcast' = None) -> bytes:
+        """Quantiza, serializa e comprime; registra os tempos em `stats`, se informado"""
+        start = time.perf_counter()
+        quantized, quantization = quantize(tensors, self.quantization, self.stochastic_rounding)
+        quantized, metadata = flatten_payload(quantized, {**metadata, 'quantization': quantization}, self.manifest)
+        payload = encode_payload(quantized, metadata, self.content_type)
+        serialization_time = time.perf_counter() - start
+
+        cpu_start = time.process_time()
+        wire = compress(payload, self.compression, self.compression_level)
+        if stats is not None:
+            stats.serialization_time += serialization_time
+            stats.compression_stats.record(len(payload), len(wire), time.process_time() - cpu_start)
+        return wire
+
+
+class RoundBroadcast:
+    """
+    Buffers codificados uma vez por rodada e compartilhados por todos os
+    clientes. Pode ser usado pelas threads do dispatcher ao mesmo tempo.
+    """
+
+    def __init__(self, encoding: DownlinkEncoding, model_store, model_version: str, fit_config: dict):
+        self.encoding = encoding
+        self.model_store = model_store
+        self.model_version = model_version
+        self.fit_config = fit_config
+        self.serialization_time = 0.0
+        self.compression_stats = CompressionStats()
+        self._full_body = None
+        self._diff_bodies = {}
+        self._lock = threading.Lock()
+
+    def full_body(self, model_url: str = None) -> bytes:
+        """
+        Modelo completo, ou apenas o hash e a URL do modelo se `model_url`
+        for informado (modo pull).
+        """
+        with self._lock:
+            if self._full_body is None:
+                if model_url is None:
+                    tensors, metadata = self.model_store.get(self.model_version), self.fit_config
+                else:
+                    tensors, metadata = [], {**self.fit_config, 'model_url': model_url}
+                self._full_body = self.encoding.encode(tensors, metadata, self)
+            return self._full_body
+
+    def diff_body(self, base_version: str) -> Optional[bytes]:
+        """Diff sobre `base_version`, ou None se a base não estiver no histórico"""
+        with self._lock:
+            if base_version not in self._diff_bodies:
+                diff = self.model_store.diff(base_version, self.model_version)
+                if diff is None:
+                    return None
+                self._diff_bodies[base_version] = self.encoding.encode(
+                    diff, {**self.fit_config, 'base_version': base_version}, self
+                )
+            return self._diff_bodies[base_version]
+
+    def is_diff(self, body: bytes) -> bool:
+        return body is not self._full_body
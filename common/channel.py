@@ -0,0 +1,241 @@
+# /common/channel.py
+
+"""
+Canais persistentes do orquestrador com cada cliente.
+
+Cada endpoint tem uma requests.Session própria com um pool de conexões
+keep-alive, de modo que o handshake, o /fit e os reenvios de uma sessão
+reaproveitam a mesma conexão TCP em vez de abrir uma nova a cada chamada.
+Antes de cada rodada, warm_up() abre (ou confere) as conexões de todos os
+clientes em paralelo, com um timeout curto.
+
+Antes da primeira rodada, wait_until_ready() consulta GET /health de cada
+cliente até todos estarem prontos ou o prazo acabar, em vez de uma pausa
+fixa no início.
+
+Cada canal tem também um circuit breaker: depois de `failure_threshold`
+falhas seguidas o circuito abre e o cliente deixa de ser chamado. Passado o
+backoff (que dobra a cada nova abertura, até `max_backoff`), o cliente é
+sondado com uma requisição barata; se responder, volta a receber o /fit e o
+circuito fecha no primeiro sucesso. Assim um nó que caiu não custa mais
+MIN_TIMEOUT segundos por rodada.
+
+Os canais são criados sob demanda, na primeira vez que um cliente é
+contatado, e as sondagens em paralelo usam no máximo MAX_PARALLEL_PROBES
+threads, para que populações grandes com seleção por rodada não custem uma
+sessão e uma thread por cliente registrado.
+"""
+
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+from requests.adapters import HTTPAdapter
+
+CLOSED = 'closed'
+OPEN = 'open'
+HALF_OPEN = 'half_open'
+
+MAX_PARALLEL_PROBES = 64
+
+
+def health_url(fit_endpoint: str) -> str:
+    """Endpoint de prontidão do cliente, ao lado do /fit"""
+    return fit_endpoint.rsplit('/', 1)[0] + '/health'
+
+
+class CircuitOpenError(requests.exceptions.ConnectionError):
+    """Cliente ignorado porque o circuito está aberto (ou a sondagem falhou)"""
+
+
+class CircuitBreaker:
+    """Estado de falhas de um cliente (thread-safe)"""
+
+    def __init__(self, failure_threshold: int = 3, base_backoff: float = 30.0, max_backoff: float = 300.0):
+        self.failure_threshold = failure_threshold
+        self.base_backoff = base_backoff
+        self.max_backoff = max_backoff
+        self.failures = 0  # Falhas seguidas
+        self._state = CLOSED
+        self._opened_at = 0.0
+        self._backoff = 0.0
+        self._open_count = 0  # Aberturas seguidas, para o backoff exponencial
+        self._lock = threading.Lock()
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            return self._state
+
+    def retry_after(self) -> float:
+        """Segundos até o cliente poder ser sondado de novo (0 se já pode ser chamado)"""
+        with self._lock:
+            if self._state != OPEN:
+                return 0.0
+            return max(0.0, self._opened_at + self._backoff - time.monotonic())
+
+    def allow(self) -> bool:
+        """O cliente pode ser chamado? Um circuito aberto com o backoff vencido passa a meio-aberto"""
+        with self._lock:
+            if self._state == OPEN:
+                if time.monotonic() < self._opened_at + self._backoff:
+                    return False
+                self._state = HALF_OPEN
+            return True
+
+    def record_success(self):
+        with self._lock:
+            self._state = CLOSED
+            self.failures = 0
+            self._open_count = 0
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self._state == HALF_OPEN or self.failures >= self.failure_threshold:
+                self._backoff = min(self.base_backoff * 2 ** self._open_count, self.max_backoff)
+                self._open_count += 1
+                self._opened_at = time.monotonic()
+                self._state = OPEN
+
+
+class ClientChannel:
+    """Sessão HTTP persistente e circuit breaker de um cliente"""
+
+    def __init__(self, endpoint: str, pool_size: int = 2, breaker: CircuitBreaker = None):
+        self.endpoint = endpoint
+        self.health_url = health_url(endpoint)
+        self.breaker = breaker or CircuitBreaker()
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+
+    def post(self, url: str, **kwargs):
+        return self.session.post(url, **kwargs)
+
+    def probe(self, timeout: float) -> bool:
+        """Sondagem barata (GET /health): qualquer resposta HTTP indica que o cliente está no ar"""
+        try:
+            self.session.get(self.health_url, timeout=timeout).close()
+            return True
+        except requests.exceptions.RequestException:
+            return False
+
+    def ready(self, timeout: float) -> bool:
+        """O cliente terminou de carregar os dados e o modelo?"""
+        try:
+            response = self.session.get(self.health_url, timeout=timeout)
+            response.close()
+            return response.status_code == 200
+        except requests.exceptions.RequestException:
+            return False
+
+    def close(self):
+        self.session.close()
+
+
+class ChannelPool:
+    """Canais de todos os clientes da sessão"""
+
+    def __init__(self, endpoints, pool_size: int = 2, failure_threshold: int = 3,
+                 base_backoff: float = 30.0, max_backoff: float = 300.0, probe_timeout: float = 2.0):
+        self.endpoints = list(endpoints)
+        self.pool_size = pool_size
+        self.failure_threshold = failure_threshold
+        self.base_backoff = base_backoff
+        self.max_backoff = max_backoff
+        self.probe_timeout = probe_timeout
+        self._channels = {}
+        self._lock = threading.Lock()
+
+    def __getitem__(self, endpoint: str) -> ClientChannel:
+        with self._lock:
+            channel = self._channels.get(endpoint)
+            if channel is None:
+                channel = self._channels[endpoint] = ClientChannel(
+                    endpoint, self.pool_size,
+                    CircuitBreaker(self.failure_threshold, self.base_backoff, self.max_backoff)
+                )
+            return channel
+
+    def available(self, endpoint: str) -> bool:
+        """O cliente pode entrar na rodada (circuito fechado ou backoff vencido)?"""
+        return self.retry_after(endpoint) == 0.0
+
+    def retry_after(self, endpoint: str) -> float:
+        channel = self._channels.get(endpoint)
+        return channel.breaker.retry_after() if channel is not None else 0.0
+
+    def _probe(self, endpoint: str) -> bool:
+        channel = self[endpoint]
+        if not channel.breaker.allow():
+            return False
+        if channel.probe(self.probe_timeout):
+            return True
+        channel.breaker.record_failure()
+        return False
+
+    def warm_up(self, endpoints) -> list:
+        """
+        Abre as conexões dos clientes em paralelo antes da rodada; para os
+        clientes com circuito meio-aberto, vale como a sondagem.
+        Retorna: os endpoints que responderam (os demais contam uma falha)
+        """
+        endpoints = list(endpoints)
+        if not endpoints:
+            return []
+        with ThreadPoolExecutor(max_workers=min(len(endpoints), MAX_PARALLEL_PROBES)) as executor:
+            reachable = list(executor.map(self._probe, endpoints))
+        return [endpoint for endpoint, ok in zip(endpoints, reachable) if ok]
+
+    def wait_until_ready(self, endpoints, deadline: float, poll_interval: float = 0.5,
+                         min_ready: int = None) -> list:
+        """
+        Consulta GET /health dos clientes até todos (ou `min_ready`) estarem
+        prontos ou `deadline` segundos passarem.
+        Retorna: os endpoints prontos (os demais seguem para a sessão e são
+        tratados pelo handshake e pelo circuit breaker)
+        """
+        pending = list(endpoints)
+        ready = []
+        deadline_at = time.monotonic() + deadline
+        min_ready = len(pending) if min_ready is None else min_ready
+        with ThreadPoolExecutor(max_workers=max(1, min(len(pending), MAX_PARALLEL_PROBES))) as executor:
+            while pending:
+                started = time.monotonic()
+                results = list(executor.map(
+                    lambda endpoint: self[endpoint].ready(self.probe_timeout), pending
+                ))
+                ready += [endpoint for endpoint, ok in zip(pending, results) if ok]
+                pending = [endpoint for endpoint, ok in zip(pending, results) if not ok]
+                if len(ready) >= min_ready or time.monotonic() >= deadline_at:
+                    break
+                time.sleep(max(0.0, min(poll_interval - (time.monotonic() - started),
+                                        deadline_at - time.monotonic())))
+        return ready
+
+    def call(self, endpoint: str, fn, probe: bool = False):
+        """
+        Executa fn() registrando o desfecho no circuit breaker do cliente.
+        Com probe=True, um cliente que não está com o circuito fechado é
+        sondado antes (usado quando não há warm_up, ex.: no modo FedBuff).
+        """
+        breaker = self[endpoint].breaker
+        if probe and breaker.state != CLOSED and not self._probe(endpoint):
+            raise CircuitOpenError(f"Circuito aberto para {endpoint}")
+        try:
+            result = fn()
+        except requests.exceptions.RequestException:
+            breaker.record_failure()
+            raise
+        breaker.record_success()
+        return result
+
+    def states(self) -> dict:
+        return {endpoint: channel.breaker.state for endpoint, channel in self._channels.items()}
+
+    def close(self):
+        for channel in self._channels.values():
+            channel.close()
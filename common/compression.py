@@ -0,0 +1,179 @@
+# /common/compression.py
+
+"""
+Compressão negociada (Accept-Encoding / Content-Encoding) dos payloads do /fit.
+
+Codecs: 'gzip' (biblioteca padrão), 'zstd' (pacote zstandard) e 'lz4'
+(pacote lz4). Os dois últimos são opcionais: se não estiverem instalados,
+simplesmente não são anunciados na negociação. A descompressão é sempre
+limitada a um tamanho máximo para que um payload malicioso ou corrompido
+não esgote a memória.
+"""
+
+import time
+import zlib
+from dataclasses import dataclass
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+try:
+    import lz4.frame as lz4_frame
+except ImportError:
+    lz4_frame = None
+
+IDENTITY = 'identity'
+
+# Ordem de preferência quando o cliente aceita vários codecs
+_PREFERENCE = ('zstd', 'lz4', 'gzip')
+
+DEFAULT_LEVELS = {'gzip': 6, 'zstd': 3, 'lz4': 0}
+
+# Limite padrão para o tamanho descomprimido (256 MB)
+DEFAULT_MAX_DECOMPRESSED_BYTES = 256 * 1024 * 1024
+
+# Leituras do corpo de uma resposta (1 MB por vez)
+_READ_CHUNK = 1024 * 1024
+
+
+class CompressionError(ValueError):
+    """Codec não suportado, payload corrompido ou acima do limite de tamanho"""
+
+
+def available_codecs():
+    """Codecs disponíveis neste processo, em ordem de preferência"""
+    codecs = []
+    for codec in _PREFERENCE:
+        if codec == 'zstd' and zstandard is None:
+            continue
+        if codec == 'lz4' and lz4_frame is None:
+            continue
+        codecs.append(codec)
+    return codecs
+
+
+def encoding_headers(codec) -> dict:
+    """
+    Cabeçalhos de uma requisição cujo corpo foi comprimido com `codec` e que
+    pede a resposta no mesmo codec (ou sem compressão, como alternativa).
+    """
+    if codec in (None, '', IDENTITY):
+        return {'Accept-Encoding': IDENTITY}
+    return {'Content-Encoding': codec, 'Accept-Encoding': f'{codec}, {IDENTITY};q=0.5'}
+
+
+def negotiate_encoding(accept_header) -> str:
+    """Escolhe o codec da resposta a partir do Accept-Encoding recebido"""
+    if not accept_header:
+        return IDENTITY
+    accepted = [item.split(';')[0].strip().lower() for item in accept_header.split(',')]
+    supported = available_codecs()
+    for codec in accepted:
+        if codec in supported:
+            return codec
+    return IDENTITY
+
+
+def compress(data: bytes, codec: str, level=None) -> bytes:
+    """Comprime um payload com o codec indicado"""
+    if codec in (None, '', IDENTITY):
+        return data
+    if codec not in available_codecs():
+        raise CompressionError(f"Codec de compressão indisponível: {codec}")
+
+    level = DEFAULT_LEVELS[codec] if level is None else level
+    if codec == 'gzip':
+        compressor = zlib.compressobj(level, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+        return compressor.compress(data) + compressor.flush()
+    if codec == 'zstd':
+        return zstandard.ZstdCompressor(level=level).compress(data)
+    return lz4_frame.compress(data, compression_level=level)
+
+
+def decompress(data: bytes, codec: str, max_size: int = DEFAULT_MAX_DECOMPRESSED_BYTES) -> bytes:
+    """Descomprime um payload, abortando se o resultado passar de max_size bytes"""
+    if codec in (None, '', IDENTITY):
+        if len(data) > max_size:
+            raise CompressionError(f"Payload de {len(data)} bytes excede o limite de {max_size}")
+        return data
+    if codec not in available_codecs():
+        raise CompressionError(f"Codec de compressão indisponível: {codec}")
+
+    try:
+        if codec == 'gzip':
+            decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS)
+            result = decompressor.decompress(data, max_size + 1)
+        elif codec == 'zstd':
+            with zstandard.ZstdDecompressor().stream_reader(data) as reader:
+                result = reader.read(max_size + 1)
+        else:
+            decompressor = lz4_frame.LZ4FrameDecompressor()
+            result = decompressor.decompress(data, max_length=max_size + 1)
+    except (zlib.error, RuntimeError) as e:
+        raise CompressionError(f"Payload {codec} corrompido: {e}") from e
+    except Exception as e:
+        if zstandard is not None and isinstance(e, zstandard.ZstdError):
+            raise CompressionError(f"Payload {codec} corrompido: {e}") from e
+        raise
+
+    if len(result) > max_size:
+        raise CompressionError(f"Payload descomprimido excede o limite de {max_size} bytes")
+    return result
+
+
+def max_wire_bytes(max_size: int) -> int:
+    """
+    Maior corpo aceito na rede para um limite descomprimido de `max_size`
+    (os codecs expandem um pouco os dados incompressíveis)
+    """
+    return max_size + max_size // 100 + 64 * 1024
+
+
+def read_response_body(response, max_size: int = DEFAULT_MAX_DECOMPRESSED_BYTES):
+    """
+    Lê o corpo de uma resposta do requests (aberta com stream=True) sem a
+    descompressão automática do urllib3, aplicando o limite de tamanho já na
+    leitura da rede: um Content-Length acima de max_wire_bytes(max_size) é
+    recusado antes de ler, e o corpo é lido em pedaços até esse limite.
+    Retorna: (corpo descomprimido, tamanho na rede, tempo de CPU gasto)
+    """
+    limit = max_wire_bytes(max_size)
+    try:
+        length = response.headers.get('Content-Length')
+        if length is not None and length.strip().isdigit() and int(length) > limit:
+            raise CompressionError(f"Corpo de {length} bytes excede o limite de {limit}")
+        chunks, received = [], 0
+        while True:
+            chunk = response.raw.read(min(_READ_CHUNK, limit + 1 - received), decode_content=False)
+            if not chunk:
+                break
+            received += len(chunk)
+            if received > limit:
+                raise CompressionError(f"Corpo excede o limite de {limit} bytes")
+            chunks.append(chunk)
+        raw = b''.join(chunks)
+    finally:
+        response.close()
+    start = time.process_time()
+    body = decompress(raw, response.headers.get('Content-Encoding', IDENTITY), max_size)
+    return body, len(raw), time.process_time() - start
+
+
+@dataclass
+class CompressionStats:
+    """Acumula bytes e custo de CPU da compressão ao longo de uma rodada"""
+    uncompressed_bytes: int = 0
+    compressed_bytes: int = 0
+    cpu_time: float = 0.0
+
+    def record(self, uncompressed_bytes: int, compressed_bytes: int, cpu_time: float):
+        self.uncompressed_bytes += uncompressed_bytes
+        self.compressed_bytes += compressed_bytes
+        self.cpu_time += cpu_time
+
+    @property
+    def ratio(self) -> float:
+        """Tamanho original / tamanho na rede (1.0 = sem ganho)"""
+        return self.uncompressed_bytes / self.compressed_bytes if self.compressed_bytes else 1.0
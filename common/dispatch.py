@@ -0,0 +1,351 @@
+# /common/dispatch.py
+
+"""
+Envio concorrente do /fit para os clientes de uma rodada.
+
+O AsyncDispatcher dispara todos os clientes ao mesmo tempo com asyncio e
+entrega os resultados na ordem em que ficam prontos, de modo que a duração
+da rodada acompanha o cliente mais lento, e não a soma de todos. Cada troca
+com um cliente (fit_client) continua usando requests, com o timeout
+adaptativo do próprio cliente, e roda em um pool de threads limitado por
+`max_concurrency`.
+
+Com quórum e/ou prazo, a rodada termina assim que K clientes responderem
+com sucesso ou o prazo passar, o que vier primeiro. As chamadas restantes
+são canceladas: a rodada não espera mais por elas e o que chegar depois é
+descartado. Como uma requisição bloqueada do requests não pode ser
+interrompida de fora, a thread do straggler só é liberada quando a resposta
+chega ou o timeout adaptativo estoura; até lá o cliente fica marcado como
+ocupado (busy) e não recebe uma nova chamada. Quem chama run() fecha o
+agregador da rodada (seal) assim que ela retorna, para que essas threads não
+somem mais nada à média.
+"""
+
+import asyncio
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import Any, Callable, Optional
+
+import requests
+
+from common.admission import AdmissionTimeout
+from common.aggregation import ClientUpdate, parse_client_update
+from common.manifest import ManifestMismatch, expand_flat_payload, handshake_manifest
+from common.serialization import decode_payload
+from common.streaming import LayerStream, read_stream
+
+
+@dataclass
+class RoundContext:
+    """O que todas as trocas de uma rodada compartilham"""
+    broadcast: Any  # RoundBroadcast da rodada
+    full_body: Optional[bytes]
+    headers: dict
+    global_weights: list
+    fit_config: dict
+    manifest: Any
+    arena: Any
+    max_decompressed_bytes: int
+    streaming: bool = False
+    aggregator: Any = None  # StreamingAverage em que cada atualização é somada assim que chega
+    use_diffs: bool = False
+    manifest_clients: set = field(default_factory=set)
+    channels: Any = None  # ChannelPool com as sessões persistentes de cada cliente
+    tasks: Any = None  # TaskServer, no modo poll (os clientes buscam as tarefas)
+    admission: Any = None  # AdmissionController com o orçamento de memória das leituras
+
+
+@dataclass
+class FitResult:
+    """Resultado de uma troca bem-sucedida com um cliente"""
+    metadata: dict
+    sample_count: int
+    update: Optional[ClientUpdate]  # None quando já somada ao agregador da rodada
+    rtt: float
+    bytes_sent: int = 0
+    bytes_received: int = 0
+    diff_sent: bool = False
+    uncompressed_bytes: int = 0
+    cpu_time: float = 0.0
+
+
+def _client_update(ctx: RoundContext, metadata, tensors) -> ClientUpdate:
+    """Camadas do payload (views do buffer plano, se houver manifesto) e o próprio buffer"""
+    flat = tensors[0] if metadata.get('manifest_id') is not None else None
+    return parse_client_update(metadata, expand_flat_payload(metadata, tensors, ctx.manifest), flat)
+
+
+def _fold(ctx: RoundContext, index: int, update: ClientUpdate, sample_count) -> Optional[ClientUpdate]:
+    """
+    Soma a atualização ao agregador da rodada, se houver, e devolve o slot da
+    arena em que ela foi recebida; retorna a atualização apenas se ela não foi somada.
+    """
+    if ctx.aggregator is None:
+        return update
+    try:
+        ctx.aggregator.add(update, sample_count, index)
+    finally:
+        ctx.arena.release(index)
+    return None
+
+
+def fit_client(ctx: RoundContext, index: int, endpoint: str, base_version, timeout: float) -> FitResult:
+    """
+    Envia o modelo a um cliente, trata os reenvios (412: manifesto perdido;
+    409: sem a versão base do diff) e decodifica a resposta.
+    """
+    if ctx.tasks is not None:
+        return fit_task(ctx, index, endpoint, base_version, timeout)
+    http = ctx.channels[endpoint] if ctx.channels is not None else requests
+    if endpoint not in ctx.manifest_clients:
+        handshake_manifest(endpoint, ctx.manifest, timeout, http)
+        ctx.manifest_clients.add(endpoint)
+
+    # Clientes com uma versão recente recebem apenas o diff
+    wire_body = LayerStream(ctx.global_weights, ctx.fit_config) if ctx.streaming else ctx.full_body
+    if ctx.use_diffs and not ctx.streaming and base_version is not None:
+        wire_body = ctx.broadcast.diff_body(base_version) or ctx.full_body
+
+    def post(body):
+        return http.post(
+            endpoint,
+            data=body,
+            headers=ctx.headers,
+            timeout=timeout,  # Timeout adaptativo do cliente
+            stream=True  # O corpo é lido sem a descompressão automática
+        )
+
+    start_time = time.time()
+    response = post(wire_body)
+    bytes_sent = wire_body.nbytes if ctx.streaming else len(wire_body)
+
+    # 412: o cliente perdeu o manifesto (ex.: reiniciou); refaz o handshake e reenvia
+    if response.status_code == 412 and not ctx.streaming:
+        response.close()
+        print(f"Cliente {index+1} sem o manifesto; refazendo o handshake...")
+        handshake_manifest(endpoint, ctx.manifest, timeout, http)
+        response = post(wire_body)
+        bytes_sent += len(wire_body)
+
+    # 409: o cliente não tem a versão base do diff, então recebe o modelo completo
+    diff_sent = False
+    if response.status_code == 409 and not ctx.streaming and ctx.broadcast.is_diff(wire_body):
+        response.close()
+        print(f"Cliente {index+1} sem a versão base; reenviando o modelo completo...")
+        response = post(ctx.full_body)
+        bytes_sent += len(ctx.full_body)
+    elif not ctx.streaming and ctx.broadcast.is_diff(wire_body):
+        diff_sent = True
+    rtt = time.time() - start_time
+
+    # Lança um erro se a resposta for 4xx ou 5xx
+    response.raise_for_status()
+
+    if ctx.streaming:
+        # Cada camada é escrita no slot da arena do cliente assim que chega, e a
+        # atualização completa é somada à média
+        try:
+            metadata, layers = read_stream(response.raw, ctx.max_decompressed_bytes)
+            ctx.aggregator.add_stream(metadata, layers, ctx.arena.vector(index, ctx.manifest.total_size), index)
+            wire_size = response.raw.tell()
+        finally:
+            ctx.arena.release(index)
+            response.close()
+        return FitResult(metadata, metadata['sample_count'], None, rtt, bytes_sent, wire_size,
+                         uncompressed_bytes=wire_size)
+
+    # Com o orçamento de memória cheio, a resposta espera no socket (leitura adiada)
+    reserved = 0
+    if ctx.admission is not None:
+        try:
+            reserved = ctx.admission.admit(response.headers, timeout)
+        except AdmissionTimeout:
+            response.close()
+            raise
+    try:
+        body, wire_size, cpu_time = ctx.arena.read(index, response, ctx.max_decompressed_bytes)
+        metadata, tensors = decode_payload(body, response.headers.get('Content-Type'))
+        update = _fold(ctx, index, _client_update(ctx, metadata, tensors), metadata['sample_count'])
+    finally:
+        # A reserva de memória vale até a atualização ser somada (ou descartada)
+        if reserved:
+            ctx.admission.release(reserved)
+    return FitResult(
+        metadata, metadata['sample_count'], update, rtt,
+        bytes_sent, wire_size, diff_sent, len(body), cpu_time
+    )
+
+
+def fit_task(ctx: RoundContext, index: int, endpoint: str, base_version, timeout: float) -> FitResult:
+    """
+    fit_client no modo poll: publica o mesmo corpo do /fit na fila do cliente e
+    espera o resultado que ele devolve. O manifesto o cliente busca sozinho
+    (GET /manifest); um 412 no resultado indica uma arquitetura diferente.
+    """
+    wire_body = ctx.full_body
+    if ctx.use_diffs and base_version is not None:
+        wire_body = ctx.broadcast.diff_body(base_version) or ctx.full_body
+    diff_sent = ctx.broadcast.is_diff(wire_body)
+
+    def reader(upload):
+        return ctx.arena.read(index, upload, ctx.max_decompressed_bytes)
+
+    start_time = time.time()
+    task = ctx.tasks.run(endpoint, wire_body, ctx.headers, reader, timeout)
+    bytes_sent = len(wire_body)
+
+    # 409: o cliente não tem a versão base do diff, então recebe o modelo completo
+    if task.status == 409 and diff_sent:
+        print(f"Cliente {index+1} sem a versão base; reenviando o modelo completo...")
+        remaining = max(timeout - (time.time() - start_time), 1.0)
+        task = ctx.tasks.run(endpoint, ctx.full_body, ctx.headers, reader, remaining)
+        bytes_sent += len(ctx.full_body)
+        diff_sent = False
+    rtt = time.time() - start_time
+
+    if task.status == 412:
+        raise ManifestMismatch(task.error)
+    if task.status != 200:
+        raise requests.exceptions.HTTPError(f"{task.status} no resultado do cliente {index+1}: {task.error}")
+
+    # A reserva de memória feita ao receber o resultado vale até a soma ao agregador
+    try:
+        body, wire_size, cpu_time = task.result
+        metadata, tensors = decode_payload(body, task.content_type)
+        update = _fold(ctx, index, _client_update(ctx, metadata, tensors), metadata['sample_count'])
+    finally:
+        ctx.tasks.release(task)
+    return FitResult(
+        metadata, metadata['sample_count'], update, rtt,
+        bytes_sent, wire_size, diff_sent, len(body), cpu_time
+    )
+
+
+@dataclass
+class Dispatch:
+    """Desfecho de uma chamada: `result` em caso de sucesso, `error` caso contrário"""
+    index: int
+    endpoint: str
+    timeout: float
+    result: Any = None
+    error: Optional[BaseException] = None
+    elapsed: float = 0.0
+
+
+class AsyncDispatcher:
+    """Fan-out concorrente das chamadas de uma rodada"""
+
+    def __init__(self, max_concurrency: int = 64):
+        self.max_concurrency = max_concurrency
+        self._executor = ThreadPoolExecutor(max_workers=max_concurrency, thread_name_prefix='fit')
+        self._in_flight = set()  # Endpoints com uma chamada ainda em andamento
+        self._lock = threading.Lock()
+
+    def busy(self, endpoint: str) -> bool:
+        """O cliente ainda está com uma chamada cancelada em andamento?"""
+        with self._lock:
+            return endpoint in self._in_flight
+
+    def run(self, jobs, on_complete: Callable[[Dispatch], None],
+            quorum: int = None, deadline: float = None) -> list:
+        """
+        jobs: lista de (index, endpoint, timeout, função sem argumentos).
+        on_complete é chamado na thread de quem chamou run(), na ordem em que
+        as chamadas terminam, e pode retornar novas chamadas (no mesmo formato
+        de `jobs`) a disparar em seguida; run() termina quando não houver mais
+        chamadas pendentes. Uma chamada conta para o quórum se terminar sem
+        erro e com resultado diferente de None.
+
+        quorum: encerra a rodada após esse número de sucessos (None = todos)
+        deadline: encerra a rodada após esse número de segundos (None = sem prazo)
+        Retorna: os Dispatch das chamadas canceladas (stragglers)
+        """
+        return asyncio.run(self._run(jobs, on_complete, quorum, deadline))
+
+    def in_flight(self) -> set:
+        """Endpoints com uma chamada em andamento (inclusive as canceladas)"""
+        with self._lock:
+            return set(self._in_flight)
+
+    def _track(self, endpoint, job):
+        """
+        Marca o endpoint como ocupado enquanto a função roda na thread.
+        Retorna: (função a executar, cancelamento); cancelada antes de começar,
+        a função não roda e o endpoint é liberado na hora.
+        """
+        state = {'started': False, 'cancelled': False}
+        with self._lock:
+            self._in_flight.add(endpoint)
+
+        def tracked():
+            with self._lock:
+                if state['cancelled']:
+                    return None
+                state['started'] = True
+            try:
+                return job()
+            finally:
+                with self._lock:
+                    self._in_flight.discard(endpoint)
+
+        def cancel():
+            with self._lock:
+                if not state['started']:
+                    state['cancelled'] = True
+                    self._in_flight.discard(endpoint)
+        return tracked, cancel
+
+    async def _run(self, jobs, on_complete, quorum, deadline):
+        loop = asyncio.get_running_loop()
+        deadline_at = loop.time() + deadline if deadline else None
+
+        async def call(dispatch, job):
+            start = time.time()
+            try:
+                dispatch.result = await loop.run_in_executor(self._executor, job)
+            except Exception as e:
+                dispatch.error = e
+            dispatch.elapsed = time.time() - start
+            return dispatch
+
+        tasks = {}
+        cancels = {}
+        pending = set()
+
+        def submit(new_jobs):
+            for index, endpoint, timeout, job in new_jobs or ():
+                dispatch = Dispatch(index, endpoint, timeout)
+                tracked, cancels[id(dispatch)] = self._track(endpoint, job)
+                task = asyncio.ensure_future(call(dispatch, tracked))
+                tasks[task] = dispatch
+                pending.add(task)
+
+        submit(jobs)
+        successes = 0
+        while pending:
+            remaining = None
+            if deadline_at is not None:
+                remaining = deadline_at - loop.time()
+                if remaining <= 0:
+                    break
+            done, _ = await asyncio.wait(pending, timeout=remaining,
+                                         return_when=asyncio.FIRST_COMPLETED)
+            pending -= done
+            for task in done:
+                dispatch = task.result()
+                submit(on_complete(dispatch))
+                if dispatch.error is None and dispatch.result is not None:
+                    successes += 1
+            if quorum and successes >= quorum:
+                break
+
+        # Stragglers: a rodada segue sem eles e o resultado tardio é descartado
+        for task in pending:
+            task.cancel()
+            cancels[id(tasks[task])]()
+        return [tasks[task] for task in pending]
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False)
@@ -0,0 +1,64 @@
+# /common/evaluation.py
+
+"""
+Avaliação do modelo global, opcionalmente fora do caminho crítico.
+
+No modo pipelined, a avaliação da rodada r roda em um worker próprio (com
+um modelo dedicado, para não disputar o modelo global) enquanto o
+orquestrador já despacha a rodada r+1; o custo da avaliação fica escondido
+atrás do treino dos clientes. O callback com a perda e a acurácia é
+chamado na thread do worker, na ordem das rodadas, e as métricas são
+registradas na rodada a que pertencem.
+"""
+
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+
+class PipelinedEvaluator:
+    """
+    Avalia pesos do modelo global com `model` (já compilado).
+
+    Sem pipeline, submit() avalia na hora e chama on_done antes de retornar;
+    com pipeline, `model` deve ser uma instância usada só pelo avaliador.
+    """
+
+    def __init__(self, model, x_test, y_test, pipelined: bool = False):
+        self.model = model
+        self.x_test = x_test
+        self.y_test = y_test
+        self.pipelined = pipelined
+        # Um único worker: as avaliações terminam na ordem em que foram submetidas
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='eval') if pipelined else None
+        self._futures = []
+
+    def _evaluate(self, weights, on_done):
+        start = time.time()
+        self.model.set_weights(weights)
+        loss, accuracy = self.model.evaluate(self.x_test, self.y_test, verbose=0)
+        on_done(float(loss), float(accuracy), time.time() - start)
+
+    def submit(self, weights, on_done):
+        """
+        Avalia `weights` e chama on_done(perda, acurácia, tempo de avaliação).
+        Os pesos são copiados, então o chamador pode alterá-los em seguida.
+        """
+        if not self.pipelined:
+            self._evaluate(weights, on_done)
+            return
+        snapshot = [np.array(w, copy=True) for w in weights]
+        self._futures = [f for f in self._futures if not f.done() or f.exception() is not None]
+        self._futures.append(self._executor.submit(self._evaluate, snapshot, on_done))
+
+    def drain(self):
+        """Espera as avaliações pendentes; repassa o primeiro erro de uma delas"""
+        futures, self._futures = self._futures, []
+        for future in futures:
+            future.result()
+
+    def shutdown(self):
+        self.drain()
+        if self._executor is not None:
+            self._executor.shutdown()
@@ -0,0 +1,99 @@
+# /common/fedbuff.py
+
+"""
+Treinamento assíncrono com buffer (FedBuff).
+
+Em vez de rodadas sincronizadas, cada cliente recebe o modelo global mais
+recente assim que termina o treino anterior. As atualizações chegam a
+qualquer momento e vão para um buffer; a cada `buffer_size` atualizações o
+servidor aplica um passo:
+
+    global += server_lr * sum(n_i * s(tau_i) * delta_i) / sum(n_i)
+
+onde tau_i é a defasagem (passos do servidor desde a versão usada pelo
+cliente) e s(tau) = 1 / (1 + tau) ** staleness_exponent.
+"""
+
+import threading
+import numpy as np
+
+from common.aggregation import (
+    ClientUpdate, UPDATE_DENSE, UPDATE_SPARSE_DELTA, _flat_layers, sparse_delta
+)
+from common.quantization import dequantize
+
+
+def staleness_weight(staleness: int, exponent: float = 0.5) -> float:
+    """Peso polinomial de uma atualização defasada em `staleness` passos"""
+    return 1.0 / (1.0 + staleness) ** exponent
+
+
+class FedBuffServer:
+    """
+    Estado do servidor assíncrono: modelo global, passo atual e o buffer de
+    atualizações ponderadas. Pode receber atualizações de várias threads.
+    """
+
+    def __init__(self, global_weights, buffer_size: int = 3, server_lr: float = 1.0,
+                 staleness_exponent: float = 0.5, max_staleness: int = None):
+        self.buffer_size = buffer_size
+        self.server_lr = server_lr
+        self.staleness_exponent = staleness_exponent
+        self.max_staleness = max_staleness
+        self.step = 0
+
+        self._global, self.global_weights = _flat_layers(global_weights)
+        for layer, w in zip(self.global_weights, global_weights):
+            layer[...] = w
+        self._delta_sum, self._delta_layers = _flat_layers(global_weights)
+        self._buffer_samples = 0
+        self._buffer_staleness = []
+        self._lock = threading.Lock()
+
+    def add(self, update: ClientUpdate, sample_count: int, base_step: int, base_weights=None) -> bool:
+        """
+        Soma uma atualização treinada a partir do passo `base_step`. Pesos
+        densos viram delta em relação a `base_weights` (a versão usada pelo
+        cliente). Retorna True se a atualização foi aceita.
+        """
+        if update.update_type == UPDATE_SPARSE_DELTA:
+            tensors = sparse_delta(update, self._delta_sum.size)
+        else:
+            tensors = dequantize(update.tensors, update.quantization)
+        with self._lock:
+            staleness = self.step - base_step
+            if self.max_staleness is not None and staleness > self.max_staleness:
+                return False
+            if update.update_type == UPDATE_DENSE and base_weights is None:
+                return False
+
+            factor = np.float32(sample_count * staleness_weight(staleness, self.staleness_exponent))
+            if update.update_type == UPDATE_SPARSE_DELTA:
+                indices, values = tensors
+                np.add.at(self._delta_sum, indices, values * factor)
+            else:
+                for i, (target, tensor) in enumerate(zip(self._delta_layers, tensors)):
+                    delta = tensor - base_weights[i] if update.update_type == UPDATE_DENSE else tensor
+                    target += delta * factor
+            self._buffer_samples += sample_count
+            self._buffer_staleness.append(staleness)
+            return True
+
+    def ready(self) -> bool:
+        with self._lock:
+            return len(self._buffer_staleness) >= self.buffer_size
+
+    def apply(self):
+        """
+        Aplica o passo do servidor com o que estiver no buffer e o esvazia.
+        Retorna: lista das defasagens das atualizações usadas no passo.
+        """
+        with self._lock:
+            staleness = self._buffer_staleness
+            if staleness:
+                self._global += self._delta_sum * np.float32(self.server_lr / self._buffer_samples)
+                self.step += 1
+            self._delta_sum.fill(0)
+            self._buffer_samples = 0
+            self._buffer_staleness = []
+            return staleness
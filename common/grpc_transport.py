@@ -0,0 +1,253 @@
+# /common/grpc_transport.py
+
+"""
+Transporte gRPC das tarefas (TASK_PROTOCOL=grpc).
+
+Cada cliente abre um único stream bidirecional de longa duração com o
+orquestrador (/sdfl.Transport/Session) e o mantém durante toda a sessão.
+Por ele passam as tarefas (o mesmo corpo do /fit), os resultados e
+heartbeats nos dois sentidos, multiplexados numa conexão HTTP/2 que o
+próprio cliente abriu; como no modo poll, o orquestrador não precisa de
+rota até o cliente.
+
+O GrpcTaskServer reaproveita as filas, o cancelamento e a leitura dos
+resultados do TaskServer, de modo que fit_task funciona igual nos dois
+transportes. O método é registrado com handlers genéricos e as mensagens
+são bytes crus (não há stubs gerados): um cabeçalho JSON pequeno seguido
+dos bytes do corpo, sem reencodar os tensores.
+
+    mensagem = tamanho do cabeçalho (uint32 LE) | cabeçalho JSON | corpo
+
+Tipos: 'hello' (cliente, primeira mensagem), 'manifest', 'task', 'result',
+'chunk' e 'heartbeat'.
+
+Um resultado vai como uma mensagem 'result' sem corpo, que anuncia o
+tamanho (content_length), seguida do corpo em mensagens 'chunk' de até
+RESULT_CHUNK_BYTES. O orquestrador reserva o orçamento de memória com o
+tamanho anunciado antes de puxar o primeiro pedaço, e os pedaços são lidos
+do stream direto para o destino (ex.: o slot da UpdateArena). Enquanto a
+reserva espera, o controle de fluxo do HTTP/2 segura o cliente, de modo
+que cada stream só mantém fora do orçamento a janela do HTTP/2 (e um pedaço).
+"""
+
+import json
+import struct
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from common.compression import IDENTITY
+from common.tasks import TaskServer, _RequestBody
+
+try:
+    import grpc
+except ImportError:
+    grpc = None
+
+SESSION_METHOD = '/sdfl.Transport/Session'
+
+# Sem limite de tamanho nas mensagens: o modelo vai inteiro numa tarefa
+CHANNEL_OPTIONS = [
+    ('grpc.max_send_message_length', -1),
+    ('grpc.max_receive_message_length', -1),
+]
+
+_HEADER_SIZE = struct.Struct('<I')
+
+# Tamanho de cada pedaço do corpo de um resultado
+RESULT_CHUNK_BYTES = 1024 * 1024
+
+# Erros de uma mensagem malformada: cabeçalho truncado, JSON ou campos inválidos
+MESSAGE_ERRORS = (struct.error, ValueError, KeyError, TypeError)
+
+
+def encode_message(header: dict, body: bytes = b'') -> bytes:
+    meta = json.dumps(header).encode('utf-8')
+    return b''.join((_HEADER_SIZE.pack(len(meta)), meta, body))
+
+
+def decode_message(data: bytes):
+    """Retorna (cabeçalho, corpo); o corpo é uma view sobre `data`"""
+    (size,) = _HEADER_SIZE.unpack_from(data)
+    view = memoryview(data)
+    header = json.loads(bytes(view[_HEADER_SIZE.size:_HEADER_SIZE.size + size]))
+    if not isinstance(header, dict):
+        raise ValueError("O cabeçalho da mensagem deve ser um objeto JSON")
+    return header, view[_HEADER_SIZE.size + size:]
+
+
+def result_messages(header: dict, body, chunk_bytes: int = RESULT_CHUNK_BYTES):
+    """Mensagens de um resultado: o cabeçalho (com content_length) e o corpo em pedaços"""
+    view = memoryview(body)
+    yield encode_message({**header, 'type': 'result', 'content_length': len(view)})
+    for start in range(0, len(view), chunk_bytes):
+        yield encode_message({'type': 'chunk'}, view[start:start + chunk_bytes])
+
+
+class _ChunkReader:
+    """
+    Corpo de um resultado com `length` bytes, puxado do stream em pedaços só
+    quando o leitor pede (readinto/read); `data` é o início já recebido.
+    """
+
+    def __init__(self, messages, length: int, data=b''):
+        self._messages = messages
+        self._remaining = length
+        self._chunk = memoryview(data)[:length]
+
+    def _next(self) -> memoryview:
+        while not self._chunk and self._remaining:
+            data = next(self._messages, None)
+            if data is None:
+                raise EOFError("Stream encerrado no meio de um resultado")
+            header, body = decode_message(data)
+            if header.get('type') == 'chunk':
+                self._chunk = body[:self._remaining]
+        return self._chunk
+
+    def _consume(self, n: int):
+        self._chunk = self._chunk[n:]
+        self._remaining -= n
+
+    def readinto(self, buffer) -> int:
+        chunk = self._next()
+        n = min(len(buffer), len(chunk))
+        buffer[:n] = chunk[:n]
+        self._consume(n)
+        return n
+
+    def read(self, size: int = -1) -> bytes:
+        parts = []
+        while self._remaining and size != 0:
+            chunk = self._next()
+            n = len(chunk) if size < 0 else min(size, len(chunk))
+            parts.append(bytes(chunk[:n]))
+            self._consume(n)
+            size = size - n if size > 0 else size
+        return b''.join(parts)
+
+    def drain(self):
+        """Descarta o que sobrou do corpo (resultado recusado ou lido pela metade)"""
+        while self._remaining:
+            self._consume(len(self._next()))
+
+
+class GrpcTaskServer(TaskServer):
+    """
+    TaskServer cujas tarefas vão pelo stream gRPC de cada cliente. Cada stream
+    ocupa uma thread do servidor enquanto está aberto (`max_streams`).
+    """
+
+    def __init__(self, host='0.0.0.0', port=50051, heartbeat_interval: float = 15.0,
+                 max_streams: int = 256, **kwargs):
+        super().__init__(host, port, poll_wait=heartbeat_interval, **kwargs)
+        self.max_streams = max_streams
+        self._server = None
+
+    def start(self):
+        if grpc is None:
+            raise RuntimeError("TASK_PROTOCOL=grpc requer o pacote grpcio")
+        self._server = grpc.server(
+            ThreadPoolExecutor(max_workers=self.max_streams, thread_name_prefix='grpc-session'),
+            options=CHANNEL_OPTIONS
+        )
+        handler = grpc.method_handlers_generic_handler(SESSION_METHOD.split('/')[1], {
+            SESSION_METHOD.split('/')[2]: grpc.stream_stream_rpc_method_handler(self._session)
+        })
+        self._server.add_generic_rpc_handlers((handler,))
+        # Porta 0: o sistema escolhe uma livre
+        self.port = self._server.add_insecure_port(f'{self.host}:{self.port}')
+        self._server.start()
+        print(f"Servidor gRPC de tarefas ouvindo em {self.host}:{self.port}")
+
+    def stop(self):
+        if self._server is not None:
+            self._server.stop(grace=None)
+
+    def _session(self, request_iterator, context):
+        """Stream de um cliente: entrega as tarefas da fila dele e recebe os resultados"""
+        try:
+            header, _ = decode_message(next(request_iterator))
+        except MESSAGE_ERRORS as e:
+            context.abort(grpc.StatusCode.INVALID_ARGUMENT, f"Mensagem ilegível: {e}")
+        client = header.get('client')
+        if header.get('type') != 'hello' or not client:
+            context.abort(grpc.StatusCode.INVALID_ARGUMENT, "A primeira mensagem deve ser hello")
+        threading.Thread(
+            target=self._receive, args=(client, request_iterator, context), daemon=True, name=f'grpc-{client}'
+        ).start()
+
+        manifest_sent = False
+        while context.is_active():
+            task = self.poll(client, self.poll_wait)
+            if task is None:
+                yield encode_message({'type': 'heartbeat'})
+                continue
+            if not manifest_sent and self.manifest is not None:
+                yield encode_message({'type': 'manifest', 'manifest': self.manifest.to_dict()})
+                manifest_sent = True
+            yield encode_message({
+                'type': 'task',
+                'task_id': task.task_id,
+                'content_type': task.headers.get('Content-Type'),
+                'content_encoding': task.headers.get('Content-Encoding', IDENTITY),
+                'accept': task.headers.get('Accept'),
+                'accept_encoding': task.headers.get('Accept-Encoding'),
+            }, task.body)
+
+    def _receive(self, client, request_iterator, context):
+        """
+        Lê os resultados e heartbeats que o cliente envia pelo stream. Uma
+        mensagem ilegível encerra o stream (o cliente reconecta) e termina com
+        erro as tarefas entregues a ele, em vez de deixá-las cair no timeout.
+        """
+        try:
+            for data in request_iterator:
+                header, body = decode_message(data)
+                if header.get('type') != 'result':
+                    continue
+                # Sem content_length, o corpo veio inteiro na própria mensagem
+                length = int(header.get('content_length', len(body)))
+                rfile = _ChunkReader(request_iterator, length, body)
+                try:
+                    self._finish(header, rfile, length)
+                finally:
+                    rfile.drain()
+        except (grpc.RpcError, EOFError):
+            pass  # Stream encerrado; as tarefas pendentes caem no timeout
+        except MESSAGE_ERRORS as e:
+            print(f"⚠️  Mensagem ilegível no stream gRPC de {client}; encerrando o stream: {e}")
+            context.cancel()
+            self.fail_client(client, f"Mensagem ilegível no stream gRPC: {e}")
+
+    def _finish(self, header, rfile, length: int):
+        """Entrega um resultado à tarefa; o corpo só é lido depois da reserva de memória"""
+        status = int(header.get('status', 200))
+        headers = {
+            'Content-Type': header.get('content_type'),
+            'Content-Encoding': header.get('content_encoding', IDENTITY),
+            'Content-Length': str(length),
+        }
+        reserved = 0
+        if self.admission is not None and status == 200 and self.pending(header.get('task_id', '')):
+            # Orçamento de memória cheio: o stream para de ser lido até liberar espaço
+            reserved = self.admission.cost(headers)
+            self.admission.acquire(reserved)
+
+        task = self.claim(header.get('task_id', ''))
+        if task is None:
+            if reserved:
+                self.admission.release(reserved)
+            return  # Cancelada (timeout ou quórum): o resultado tardio é descartado
+        task.reservation = reserved
+        task.content_type = header.get('content_type')
+        try:
+            if status == 200 and length > self.max_body_bytes:
+                self.release(task)
+                task.finish(413, error=f"Resultado com {length} bytes acima do limite")
+            elif status == 200:
+                task.finish(status, task.reader(_RequestBody(headers, rfile)))
+            else:
+                task.finish(status, error=header.get('error') or rfile.read().decode('utf-8', 'replace'))
+        except Exception as e:
+            self.release(task)
+            task.finish(400, error=f"Resultado ilegível: {e}")
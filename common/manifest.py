@@ -0,0 +1,169 @@
+# /common/manifest.py
+
+"""
+Manifesto do modelo, combinado uma única vez por sessão entre o
+orquestrador e cada cliente.
+
+O manifesto descreve as camadas (nome, shape, dtype e offset no vetor
+achatado) e traz o hash da arquitetura. Depois do handshake em POST
+/manifest, cada mensagem do /fit leva um único buffer plano e o
+`manifest_id`, em vez de um tensor por camada; quem recebe reconstrói as
+camadas como views desse buffer. Uma arquitetura diferente é recusada já
+no handshake, e não mais dentro do set_weights.
+"""
+
+import hashlib
+import json
+from typing import List, NamedTuple, Tuple
+import numpy as np
+import requests
+
+
+class ManifestMismatch(ValueError):
+    """Manifesto desconhecido ou incompatível com o modelo local"""
+
+
+class LayerEntry(NamedTuple):
+    name: str
+    shape: Tuple[int, ...]
+    dtype: str
+    offset: int  # Posição (em elementos) da camada no vetor achatado
+    size: int
+
+
+def architecture_hash(model) -> str:
+    """
+    Hash SHA-256 da arquitetura de um modelo Keras: tipo e configuração de
+    cada camada, sem os nomes gerados automaticamente pelo Keras.
+    """
+    layers = []
+    for layer in model.layers:
+        config = {k: v for k, v in layer.get_config().items() if k != 'name'}
+        layers.append([type(layer).__name__, config])
+    canonical = json.dumps(layers, sort_keys=True, default=str)
+    return hashlib.sha256(canonical.encode('utf-8')).hexdigest()
+
+
+class ModelManifest:
+    """Layout das camadas de um modelo dentro de um único vetor"""
+
+    def __init__(self, layers: List[LayerEntry], architecture: str):
+        self.layers = [LayerEntry(l.name, tuple(l.shape), l.dtype, l.offset, l.size) for l in layers]
+        self.architecture = architecture
+        self.total_size = sum(l.size for l in self.layers)
+        canonical = json.dumps(self.to_dict(include_id=False), sort_keys=True)
+        self.manifest_id = hashlib.sha256(canonical.encode('utf-8')).hexdigest()[:16]
+
+    @classmethod
+    def from_model(cls, model) -> 'ModelManifest':
+        """Monta o manifesto a partir de um modelo Keras (na ordem do get_weights)"""
+        layers, offset = [], 0
+        for index, variable in enumerate(model.weights):
+            shape = tuple(int(d) for d in variable.shape)
+            size = int(np.prod(shape, dtype=np.int64))
+            short_name = variable.name.split('/')[-1].split(':')[0]
+            dtype = np.dtype(getattr(variable.dtype, 'name', variable.dtype)).name
+            layers.append(LayerEntry(f"{index}:{short_name}", shape, dtype, offset, size))
+            offset += size
+        return cls(layers, architecture_hash(model))
+
+    @classmethod
+    def from_dict(cls, data) -> 'ModelManifest':
+        try:
+            layers = [LayerEntry(l['name'], tuple(l['shape']), l['dtype'], l['offset'], l['size'])
+                      for l in data['layers']]
+            manifest = cls(layers, data['architecture'])
+        except (KeyError, TypeError) as e:
+            raise ManifestMismatch(f"Manifesto malformado: {e}") from e
+        if data.get('manifest_id', manifest.manifest_id) != manifest.manifest_id:
+            raise ManifestMismatch("manifest_id não corresponde ao conteúdo do manifesto")
+        return manifest
+
+    def to_dict(self, include_id=True) -> dict:
+        data = {
+            'architecture': self.architecture,
+            'layers': [
+                {'name': l.name, 'shape': list(l.shape), 'dtype': l.dtype,
+                 'offset': l.offset, 'size': l.size}
+                for l in self.layers
+            ],
+        }
+        if include_id:
+            data['manifest_id'] = self.manifest_id
+        return data
+
+    def check(self, other: 'ModelManifest'):
+        """Falha logo se o manifesto recebido não descreve o mesmo modelo"""
+        if other.architecture != self.architecture:
+            raise ManifestMismatch("Arquitetura do modelo diferente da local")
+        if other.manifest_id != self.manifest_id:
+            raise ManifestMismatch("Layout das camadas diferente do local")
+
+    def flatten(self, tensors) -> np.ndarray:
+        """Concatena as camadas em um único buffer (mantém o dtype, ex.: int8 quantizado)"""
+        if len(tensors) != len(self.layers):
+            raise ManifestMismatch(f"{len(tensors)} tensores para um manifesto de {len(self.layers)} camadas")
+        dtypes = {np.asarray(t).dtype for t in tensors}
+        if len(dtypes) != 1:
+            raise ManifestMismatch(f"Camadas com dtypes diferentes não podem ser achatadas: {dtypes}")
+        flat = np.empty(self.total_size, dtype=dtypes.pop())
+        for entry, tensor in zip(self.layers, tensors):
+            if tensor.shape != entry.shape:
+                raise ManifestMismatch(f"Camada {entry.name} com shape {tensor.shape}, esperado {entry.shape}")
+            flat[entry.offset:entry.offset + entry.size] = tensor.reshape(-1)
+        return flat
+
+    def unflatten(self, flat) -> list:
+        """Camadas como views (sem cópia) de um buffer plano"""
+        if flat.ndim != 1 or flat.size != self.total_size:
+            raise ManifestMismatch(f"Buffer com {flat.size} elementos, esperado {self.total_size}")
+        return [flat[e.offset:e.offset + e.size].reshape(e.shape) for e in self.layers]
+
+
+def flatten_payload(tensors, metadata, manifest: ModelManifest):
+    """
+    Troca as camadas por um único buffer plano e marca o `manifest_id` nos
+    metadados. Sem manifesto, ou se os tensores não seguem o layout do
+    manifesto (ex.: delta esparso), o payload passa inalterado.
+    Retorna: (tensores, metadados)
+    """
+    if manifest is None or len(tensors) != len(manifest.layers):
+        return tensors, metadata
+    if any(np.shape(t) != entry.shape for t, entry in zip(tensors, manifest.layers)):
+        return tensors, metadata
+    if len({np.asarray(t).dtype for t in tensors}) != 1:
+        return tensors, metadata
+    return [manifest.flatten(tensors)], {**metadata, 'manifest_id': manifest.manifest_id}
+
+
+def expand_flat_payload(metadata, tensors, manifest: ModelManifest):
+    """
+    Reconstrói as camadas de um payload plano (com `manifest_id`); payloads
+    sem manifesto (ex.: deltas esparsos) passam inalterados.
+    """
+    manifest_id = metadata.get('manifest_id')
+    if manifest_id is None:
+        return tensors
+    if manifest is None or manifest_id != manifest.manifest_id:
+        raise ManifestMismatch(f"Manifesto {manifest_id} não foi combinado nesta sessão")
+    if len(tensors) != 1:
+        raise ManifestMismatch("Payload com manifesto deve ter um único buffer")
+    return manifest.unflatten(tensors[0])
+
+
+def manifest_url(fit_endpoint: str) -> str:
+    """Endpoint de handshake do cliente, ao lado do /fit"""
+    return fit_endpoint.rsplit('/', 1)[0] + '/manifest'
+
+
+def handshake_manifest(fit_endpoint: str, manifest: ModelManifest, timeout: float, session=requests):
+    """
+    Combina o manifesto com um cliente (POST /manifest), pela `session` dada
+    (ex.: o ClientChannel do cliente). Levanta ManifestMismatch se o cliente
+    tiver outra arquitetura e requests.RequestException se não for possível
+    contatá-lo.
+    """
+    response = session.post(manifest_url(fit_endpoint), json=manifest.to_dict(), timeout=timeout)
+    if response.status_code == 409:
+        raise ManifestMismatch(response.json().get('error', 'Manifesto recusado pelo cliente'))
+    response.raise_for_status()
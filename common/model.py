@@ -18,4 +18,14 @@ def create_simple_model():
         tf.keras.layers.Dense(10, activation='softmax')
     ])
      
-    return model
\ No newline at end of file
+    return model
+
+
+def create_evaluation_model():
+    """
+    Modelo global do orquestrador, compilado só para a avaliação (perda e
+    acurácia); o treino acontece nos clientes.
+    """
+    model = create_simple_model()
+    model.compile(loss='sparse_categorical_crossentropy', metrics=['accuracy'])
+    return model
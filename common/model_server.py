@@ -0,0 +1,183 @@
+# /common/model_server.py
+
+"""
+Servidor HTTP do orquestrador que publica cada versão do modelo global
+em GET /model/<sha256>.
+
+Como o endereço é o próprio hash dos pesos, o conteúdo é imutável: as
+respostas levam ETag forte e Cache-Control immutable, e quem já tem o corpo
+(ex.: um cache HTTP no caminho) recebe 304 com If-None-Match. Com
+`?base=<sha256>` o servidor devolve apenas o diff em relação à versão base,
+se ela ainda estiver no histórico.
+
+A compressão é negociada por requisição, como no /fit: o codec configurado
+vai para quem o aceita no Accept-Encoding; os demais clientes recebem outro
+codec que aceitem ou o modelo sem compressão. Cada codec gera bytes
+diferentes, então o codec faz parte do ETag.
+"""
+
+import re
+import threading
+from collections import OrderedDict
+from dataclasses import replace
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+
+from common.compression import IDENTITY, negotiate_encoding
+
+_MODEL_PATH = re.compile(r'^/model/([0-9a-f]{64})$')
+
+
+def version_encoder(model_store, encoding):
+    """
+    encode_version para o ModelServer: codifica uma versão (ou o diff sobre
+    base_version) do `model_store` com o DownlinkEncoding dado, no codec `codec`
+    """
+    def encode_version(version, base_version, codec):
+        if base_version is None:
+            tensors = model_store.get(version)
+        else:
+            tensors = model_store.diff(base_version, version)
+        if tensors is None:
+            return None
+        return replace(encoding, compression=codec).encode(
+            tensors, {'model_version': version, 'base_version': base_version}
+        )
+    return encode_version
+
+
+class ModelServer:
+    """
+    Publica as versões de um ModelVersionStore.
+
+    encode_version(version, base_version, codec) deve retornar o corpo já
+    serializado e comprimido com `codec` do modelo completo (base_version=None)
+    ou do diff, ou None se a versão saiu do histórico nesse meio-tempo (ver
+    version_encoder). `content_encoding` é o codec preferido. Com diffs=False, o
+    `?base=` é ignorado e a versão completa é sempre devolvida.
+    """
+
+    def __init__(self, model_store, encode_version, content_type, content_encoding=IDENTITY,
+                 host='0.0.0.0', port=5000, cache_size=8, diffs=True):
+        self.model_store = model_store
+        self.encode_version = encode_version
+        self.content_type = content_type
+        self.content_encoding = content_encoding
+        self.host = host
+        self.port = port
+        self.cache_size = cache_size
+        self.diffs = diffs
+        self._cache = OrderedDict()
+        self._lock = threading.Lock()
+        self._httpd = None
+
+    def start(self):
+        """Inicia o servidor em uma thread daemon"""
+        self._httpd = ThreadingHTTPServer((self.host, self.port), _ModelRequestHandler)
+        self._httpd.daemon_threads = True
+        self._httpd.model_server = self
+        threading.Thread(target=self._httpd.serve_forever, daemon=True).start()
+        print(f"Servidor de modelos ouvindo em {self.host}:{self.port}")
+
+    def stop(self):
+        if self._httpd is not None:
+            self._httpd.shutdown()
+            self._httpd.server_close()
+
+    def response_encoding(self, accept_header) -> str:
+        """Codec configurado, se o cliente o aceitar; senão, o que negotiate_encoding escolher"""
+        if self.content_encoding == IDENTITY:
+            return IDENTITY
+        accepted = [item.split(';')[0].strip().lower() for item in (accept_header or '').split(',')]
+        if self.content_encoding in accepted:
+            return self.content_encoding
+        return negotiate_encoding(accept_header)
+
+    def resolve(self, version, base_version=None, codec=IDENTITY):
+        """
+        Retorna (base_version efetiva, etag) do corpo que get_body devolveria, ou
+        None se a versão não estiver no histórico. Sem codificar nada: basta para
+        responder 304.
+        """
+        if version not in self.model_store:
+            return None
+        if not self.diffs or (base_version is not None and base_version not in self.model_store):
+            base_version = None
+        tag = version if base_version is None else f'{base_version}..{version}'
+        return base_version, f'"{tag}.{codec}"'
+
+    def get_body(self, version, base_version=None, codec=IDENTITY):
+        """Retorna (corpo, etag) de uma versão, ou None se ela não estiver no histórico"""
+        resolved = self.resolve(version, base_version, codec)
+        if resolved is None:
+            return None
+        base_version, etag = resolved
+
+        key = (version, base_version, codec)
+        with self._lock:
+            if key in self._cache:
+                self._cache.move_to_end(key)
+                return self._cache[key]
+
+        body = self.encode_version(version, base_version, codec)
+        if body is None:
+            return None
+        with self._lock:
+            self._cache[key] = (body, etag)
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+        return body, etag
+
+
+def etag_matches(if_none_match, etag) -> bool:
+    """If-None-Match casa com o ETag? (comparação fraca, como manda a RFC 9110)"""
+    if not if_none_match:
+        return False
+    candidates = [item.strip() for item in if_none_match.split(',')]
+    return '*' in candidates or etag in [c[2:] if c.startswith('W/') else c for c in candidates]
+
+
+class _ModelRequestHandler(BaseHTTPRequestHandler):
+    # Conexões keep-alive: todas as respostas levam Content-Length
+    protocol_version = 'HTTP/1.1'
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        match = _MODEL_PATH.match(url.path)
+        if not match:
+            self.send_error(404)
+            return
+
+        server = self.server.model_server
+        base_version = parse_qs(url.query).get('base', [None])[0]
+        codec = server.response_encoding(self.headers.get('Accept-Encoding'))
+        resolved = server.resolve(match.group(1), base_version, codec)
+        if resolved is not None and etag_matches(self.headers.get('If-None-Match'), resolved[1]):
+            self.send_response(304)
+            self._send_cache_headers(resolved[1])
+            self.end_headers()
+            return
+
+        found = server.get_body(match.group(1), base_version, codec)
+        if found is None:
+            self.send_error(404, "Versão do modelo fora do histórico")
+            return
+
+        body, etag = found
+        self.send_response(200)
+        self.send_header('Content-Type', server.content_type)
+        if codec != IDENTITY:
+            self.send_header('Content-Encoding', codec)
+        self.send_header('Content-Length', str(len(body)))
+        self._send_cache_headers(etag)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _send_cache_headers(self, etag):
+        self.send_header('Vary', 'Accept-Encoding')
+        self.send_header('ETag', etag)
+        self.send_header('Cache-Control', 'public, max-age=31536000, immutable')
+
+    def log_message(self, format, *args):
+        # Silencia o log padrão de cada requisição
+        pass
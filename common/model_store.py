@@ -0,0 +1,64 @@
+# /common/model_store.py
+
+"""
+Histórico das últimas versões do modelo global.
+
+Cada versão é identificada pelo hash SHA-256 dos seus pesos. Com o
+histórico, o orquestrador pode enviar apenas `global_r - global_base` para
+clientes que já possuem a versão base, em vez do modelo completo.
+"""
+
+import hashlib
+import threading
+from collections import OrderedDict
+import numpy as np
+
+
+def weights_hash(weights) -> str:
+    """Hash SHA-256 dos pesos (shapes + buffers float32 little-endian)"""
+    digest = hashlib.sha256()
+    for w in weights:
+        w = np.ascontiguousarray(w, dtype='<f4')
+        digest.update(str(w.shape).encode('ascii'))
+        digest.update(w.data)
+    return digest.hexdigest()
+
+
+class ModelVersionStore:
+    """
+    Guarda as `max_versions` versões mais recentes do modelo global.
+    Pode ser lido por outras threads (ex.: o servidor de modelos).
+    """
+
+    def __init__(self, max_versions: int = 3):
+        self.max_versions = max_versions
+        self._versions = OrderedDict()
+        self._lock = threading.Lock()
+
+    def add(self, weights) -> str:
+        """Registra uma versão e retorna seu hash"""
+        version = weights_hash(weights)
+        copy = [np.array(w, dtype=np.float32) for w in weights]
+        with self._lock:
+            self._versions[version] = copy
+            self._versions.move_to_end(version)
+            while len(self._versions) > self.max_versions:
+                self._versions.popitem(last=False)
+        return version
+
+    def get(self, version):
+        with self._lock:
+            return self._versions.get(version)
+
+    def __contains__(self, version):
+        with self._lock:
+            return version in self._versions
+
+    def diff(self, base_version: str, target_version: str):
+        """Retorna `target - base` por camada, ou None se alguma versão não estiver no histórico"""
+        with self._lock:
+            base = self._versions.get(base_version)
+            target = self._versions.get(target_version)
+        if base is None or target is None:
+            return None
+        return [t - b for t, b in zip(target, base)]
@@ -0,0 +1,92 @@
+# /common/quantization.py
+
+"""
+Quantização dos tensores trocados no /fit.
+
+Modos suportados:
+    'none' - float32 sem alteração
+    'fp16' - meia precisão (2x menor)
+    'int8' - inteiros de 8 bits por camada, com escala e zero-point (4x menor),
+             opcionalmente com arredondamento estocástico (não enviesado)
+
+Somente tensores float são quantizados; índices inteiros (ex.: das
+atualizações esparsas) passam sem alteração. Os parâmetros de cada tensor
+vão nos metadados da mensagem, na chave 'quantization'.
+"""
+
+import numpy as np
+
+QUANTIZATION_MODES = ('none', 'fp16', 'int8')
+
+_INT8_MIN = -128
+_INT8_MAX = 127
+
+
+def _quantize_int8(tensor, stochastic, rng):
+    """Quantização afim por tensor: x ~ (q - zero_point) * scale"""
+    tensor = np.asarray(tensor, dtype=np.float32)
+    if tensor.size == 0:
+        return tensor.astype(np.int8), [1.0, 0]
+
+    low = min(float(tensor.min()), 0.0)
+    high = max(float(tensor.max()), 0.0)
+    scale = (high - low) / (_INT8_MAX - _INT8_MIN) or 1.0
+    zero_point = int(round(_INT8_MIN - low / scale))
+
+    scaled = tensor / np.float32(scale)
+    if stochastic:
+        scaled = np.floor(scaled + rng.random(tensor.shape, dtype=np.float32))
+    else:
+        scaled = np.rint(scaled)
+    scaled += zero_point
+    np.clip(scaled, _INT8_MIN, _INT8_MAX, out=scaled)
+    return scaled.astype(np.int8), [scale, zero_point]
+
+
+def quantize(tensors, mode='none', stochastic=False, rng=None):
+    """
+    Quantiza uma lista de tensores.
+    Retorna: (tensores quantizados, metadados de quantização ou None)
+    """
+    if mode not in QUANTIZATION_MODES:
+        raise ValueError(f"Modo de quantização desconhecido: {mode}")
+    if mode == 'none':
+        return tensors, None
+
+    rng = rng or np.random.default_rng()
+    quantized, params = [], []
+    for tensor in tensors:
+        tensor = np.asarray(tensor)
+        if not np.issubdtype(tensor.dtype, np.floating):
+            quantized.append(tensor)
+            params.append(None)
+        elif mode == 'fp16':
+            quantized.append(tensor.astype(np.float16))
+            params.append(None)
+        else:
+            q, p = _quantize_int8(tensor, stochastic, rng)
+            quantized.append(q)
+            params.append(p)
+
+    return quantized, {'mode': mode, 'params': params}
+
+
+def dequantize_tensor(tensor, params=None):
+    """Reconstrói um tensor float32 (operação vetorizada sobre a camada inteira)"""
+    if tensor.dtype == np.int8:
+        scale, zero_point = params
+        out = tensor.astype(np.float32)
+        out -= zero_point
+        out *= np.float32(scale)
+        return out
+    if tensor.dtype == np.float16:
+        return tensor.astype(np.float32)
+    return tensor
+
+
+def dequantize(tensors, quantization=None):
+    """Reconstrói a lista de tensores a partir dos metadados de quantização"""
+    if not quantization or quantization.get('mode', 'none') == 'none':
+        return tensors
+    params = quantization.get('params') or [None] * len(tensors)
+    return [dequantize_tensor(t, p) for t, p in zip(tensors, params)]
@@ -0,0 +1,333 @@
+# /common/robust_aggregation.py
+
+"""
+Regras de agregação robustas a atualizações corrompidas ou maliciosas.
+
+    'fedavg'        média ponderada incremental (StreamingAverage), a regra original
+    'median'        mediana coordenada a coordenada
+    'trimmed_mean'  média aparada: em cada coordenada, descarta a fração
+                    `trim_fraction` dos maiores e dos menores valores
+    'krum'          a atualização com a menor soma das distâncias às suas
+                    n - f - 2 vizinhas mais próximas (f = `byzantine`)
+    'multi_krum'    média ponderada das m atualizações com menor escore Krum
+    'norm_bounded'  média ponderada com o delta de cada cliente limitado à norma
+                    `norm_bound` (0 = mediana das normas da rodada)
+
+Ao contrário da FedAvg, essas regras precisam de todas as atualizações da
+rodada. Cada uma é guardada, ao chegar, como delta em relação ao modelo
+global numa linha de uma matriz clientes × parâmetros, e o buffer em que foi
+recebida é liberado em seguida. Os kernels percorrem a matriz em blocos de
+colunas de no máximo `block_bytes`: seleção com np.partition (mediana e
+média aparada) e produto de Gram bloco a bloco (distâncias do Krum), de modo
+que o custo cresce quase linearmente com o tamanho do modelo e a memória de
+trabalho, além das próprias atualizações, fica limitada pelo bloco.
+
+O bloco não limita as atualizações guardadas: a matriz ocupa clientes ×
+parâmetros × 4 bytes (ex.: 1000 clientes de um modelo de 10M parâmetros são
+40 GB). Com essas regras, o número de clientes por rodada (seleção de
+clientes ou agregadores de borda) é o que mantém a memória sob controle.
+
+Todas as operações sobre a matriz são por coluna: ou escrevem as colunas
+correspondentes do resultado em `out` (mediana, média aparada, combinação
+ponderada das linhas), ou devolvem somas parciais, sem `out` (matriz de
+Gram, normas ao quadrado). Por isso a mesma regra roda inteira num processo (SerialExecutor)
+ou fatiada entre vários núcleos (ShardedExecutor, em sharded_aggregation).
+"""
+
+import threading
+import numpy as np
+
+from common.aggregation import (
+    ClientUpdate, StreamingAverage, UPDATE_DENSE, UPDATE_SPARSE_DELTA,
+    _flat_layers, dense_vector, layer_offsets, parse_client_update, sparse_delta
+)
+
+AGGREGATION_RULES = ('fedavg', 'median', 'trimmed_mean', 'krum', 'multi_krum', 'norm_bounded')
+
+# Memória de trabalho dos kernels (um bloco de colunas de todas as atualizações)
+DEFAULT_BLOCK_BYTES = 64 * 1024 * 1024
+
+
+def column_blocks(num_rows: int, num_cols: int, block_bytes: int = DEFAULT_BLOCK_BYTES):
+    """Intervalos [início, fim) de colunas cujo bloco num_rows × colunas (float32) cabe em `block_bytes`"""
+    width = max(1, block_bytes // (4 * max(num_rows, 1)))
+    for start in range(0, num_cols, width):
+        yield start, min(start + width, num_cols)
+
+
+def coordinate_median(deltas: np.ndarray, out: np.ndarray, block_bytes: int = DEFAULT_BLOCK_BYTES):
+    """Mediana de cada coluna de `deltas` (clientes × parâmetros), escrita em `out`"""
+    n = len(deltas)
+    kth = sorted({(n - 1) // 2, n // 2})
+    for start, stop in column_blocks(n, deltas.shape[1], block_bytes):
+        block = np.partition(deltas[:, start:stop], kth, axis=0)
+        np.add(block[(n - 1) // 2], block[n // 2], out=out[start:stop])
+        out[start:stop] *= np.float32(0.5)
+    return out
+
+
+def trim_count(n: int, trim_fraction: float) -> int:
+    """
+    Valores descartados em cada ponta da média aparada. Com trim_fraction > 0 e
+    ao menos 3 atualizações, descarta pelo menos um de cada lado: em rodadas
+    pequenas, int(trim_fraction * n) seria 0 e a regra viraria uma média comum.
+    """
+    k = int(trim_fraction * n)
+    if trim_fraction > 0 and n >= 3:
+        k = max(1, k)
+    return min(k, (n - 1) // 2)
+
+
+def trimmed_mean(deltas: np.ndarray, out: np.ndarray, trim_fraction: float = 0.1,
+                 block_bytes: int = DEFAULT_BLOCK_BYTES):
+    """Média de cada coluna sem os trim_count(n, trim_fraction) maiores e menores valores"""
+    n = len(deltas)
+    k = trim_count(n, trim_fraction)
+    for start, stop in column_blocks(n, deltas.shape[1], block_bytes):
+        block = deltas[:, start:stop]
+        if k:
+            block = np.partition(block, (k, n - k - 1), axis=0)
+        np.mean(block[k:n - k], axis=0, out=out[start:stop])
+    return out
+
+
+def weighted_rows(deltas: np.ndarray, out: np.ndarray, coefficients=None,
+                  block_bytes: int = DEFAULT_BLOCK_BYTES):
+    """out = coefficients @ deltas (combinação ponderada das linhas), bloco a bloco"""
+    coefficients = np.asarray(coefficients, dtype=np.float32)
+    for start, stop in column_blocks(len(deltas), deltas.shape[1], block_bytes):
+        np.dot(coefficients, deltas[:, start:stop], out=out[start:stop])
+    return out
+
+
+def gram_matrix(deltas: np.ndarray, block_bytes: int = DEFAULT_BLOCK_BYTES):
+    """Produtos internos entre as linhas de `deltas` (n × n, float64), acumulados bloco a bloco"""
+    n = len(deltas)
+    gram = np.zeros((n, n), dtype=np.float64)
+    for start, stop in column_blocks(n, deltas.shape[1], block_bytes):
+        block = deltas[:, start:stop]
+        gram += block @ block.T
+    return gram
+
+
+def sq_row_norms(deltas: np.ndarray, block_bytes: int = DEFAULT_BLOCK_BYTES):
+    """Norma ao quadrado de cada linha (float64), acumulada bloco a bloco"""
+    norms = np.zeros(len(deltas), dtype=np.float64)
+    for start, stop in column_blocks(len(deltas), deltas.shape[1], block_bytes):
+        block = deltas[:, start:stop]
+        norms += np.einsum('ij,ij->i', block, block)
+    return norms
+
+
+# Operações por coluna que um executor sabe rodar (pelo nome, nos processos do pool)
+COLUMN_KERNELS = {
+    'median': coordinate_median,
+    'trimmed_mean': trimmed_mean,
+    'weighted_rows': weighted_rows,
+    'gram': gram_matrix,
+    'sq_norms': sq_row_norms,
+}
+
+
+def distances_from_gram(gram: np.ndarray) -> np.ndarray:
+    """
+    Distâncias euclidianas ao quadrado entre as linhas (n × n) a partir da
+    matriz de Gram: ||a - b||² = a·a + b·b - 2 a·b
+    """
+    sq_norms = np.diag(gram).copy()
+    distances = sq_norms[:, None] + sq_norms[None, :] - 2 * gram
+    np.maximum(distances, 0, out=distances)
+    np.fill_diagonal(distances, 0)
+    return distances
+
+
+def krum_scores(distances: np.ndarray, byzantine: int) -> np.ndarray:
+    """Escore Krum: soma das distâncias de cada atualização às n - f - 2 vizinhas mais próximas"""
+    n = len(distances)
+    if n == 1:
+        return np.zeros(1)
+    neighbours = min(n - 1, max(1, n - byzantine - 2))
+    others = distances + np.diag(np.full(n, np.inf))  # Exclui a distância de cada uma a si mesma
+    return np.partition(others, neighbours - 1, axis=1)[:, :neighbours].sum(axis=1)
+
+
+def krum_select(distances: np.ndarray, byzantine: int, count: int = 1) -> np.ndarray:
+    """Índices das `count` atualizações com menor escore Krum, do melhor para o pior"""
+    scores = krum_scores(distances, byzantine)
+    count = min(max(count, 1), len(scores))
+    chosen = np.argpartition(scores, count - 1)[:count]
+    return chosen[np.argsort(scores[chosen])]
+
+
+class SerialExecutor:
+    """Roda as operações por coluna no próprio processo, sobre a matriz inteira"""
+
+    num_shards = 1
+
+    def empty(self, shape) -> np.ndarray:
+        return np.empty(shape, dtype=np.float32)
+
+    def free(self, array: np.ndarray):
+        """Devolve um array alocado por empty() (aqui, basta o coletor de lixo)"""
+
+    def run(self, kernel: str, deltas: np.ndarray, out: np.ndarray = None, **params):
+        """Aplica COLUMN_KERNELS[kernel]; retorna o resultado parcial da operação, se houver"""
+        if out is not None:
+            params['out'] = out
+        return COLUMN_KERNELS[kernel](deltas, **params)
+
+    def shutdown(self):
+        pass
+
+
+SERIAL_EXECUTOR = SerialExecutor()
+
+
+class RobustAggregator:
+    """
+    Agregador de uma rodada com uma regra robusta; mesma interface do
+    StreamingAverage (add/add_stream/result), inclusive entre threads.
+
+    capacity: linhas pré-alocadas (clientes esperados na rodada); a matriz
+    dobra de tamanho se chegarem mais atualizações. A memória é de
+    capacity × parâmetros × 4 bytes, independente de `block_bytes`.
+    executor: onde a matriz é alocada e as operações rodam (padrão: SERIAL_EXECUTOR)
+    """
+
+    def __init__(self, global_weights, rule: str, capacity: int = 8, trim_fraction: float = 0.1,
+                 byzantine: int = 0, multi_krum_select: int = 0, norm_bound: float = 0.0,
+                 block_bytes: int = DEFAULT_BLOCK_BYTES, executor=None):
+        if rule not in AGGREGATION_RULES or rule == 'fedavg':
+            raise ValueError(f"Regra de agregação robusta desconhecida: {rule}")
+        self.rule = rule
+        self.trim_fraction = trim_fraction
+        self.byzantine = byzantine
+        self.multi_krum_select = multi_krum_select
+        self.norm_bound = norm_bound
+        self.block_bytes = block_bytes
+        self._executor = executor or SERIAL_EXECUTOR
+
+        self.global_weights = global_weights
+        self._global, layers = _flat_layers(global_weights)
+        for layer, w in zip(layers, global_weights):
+            layer[...] = w
+        self._offsets = layer_offsets(global_weights)
+        self._deltas = self._executor.empty((max(capacity, 1), self._global.size))
+        self._samples = []
+        self.total_samples = 0
+        self.excluded = 0  # Atualizações descartadas (Krum) ou limitadas (norm_bounded) pela regra
+        self.trimmed = 0  # Valores descartados em cada ponta de cada coordenada (trimmed_mean)
+        self.clients = {}  # Índice do cliente -> amostras guardadas na matriz
+        self._lock = threading.Lock()
+        self._closed = False
+
+    def add(self, update: ClientUpdate, sample_count, client: int = None):
+        """Guarda o delta de uma atualização já recebida por completo (ValueError depois de seal())"""
+        with self._lock:
+            if self._closed:
+                raise ValueError("Rodada já agregada; atualização tardia descartada")
+            count = len(self._samples)
+            if count == len(self._deltas):
+                grown = self._executor.empty((2 * count, self._global.size))
+                grown[:count] = self._deltas
+                self._executor.free(self._deltas)
+                self._deltas = grown
+            row = self._deltas[count]
+            if update.update_type == UPDATE_SPARSE_DELTA:
+                indices, values = sparse_delta(update, row.size)
+                row.fill(0)
+                np.add.at(row, indices, values)
+            else:
+                vector = dense_vector(update, self._offsets, row)
+                if vector is not row:
+                    row[...] = vector
+                if update.update_type == UPDATE_DENSE:
+                    row -= self._global
+            self._samples.append(sample_count)
+            self.total_samples += sample_count
+            if client is not None:
+                self.clients[client] = self.clients.get(client, 0) + sample_count
+
+    def add_stream(self, metadata, layers, out: np.ndarray = None, client: int = None):
+        """
+        Atualização recebida em streaming: as camadas são lidas (fora do lock) e
+        guardadas inteiras; `out` é ignorado, já que a linha da matriz é o destino
+        """
+        self.add(parse_client_update(metadata, list(layers)), metadata['sample_count'], client)
+
+    def seal(self):
+        """Fecha a entrada de atualizações; result() agrega as linhas já guardadas"""
+        with self._lock:
+            self._closed = True
+
+    def close(self):
+        """Encerra a rodada sem resultado e devolve a matriz ao executor"""
+        with self._lock:
+            self._closed = True
+            if self._deltas is not None:
+                self._executor.free(self._deltas)
+            self._deltas = None
+
+    def result(self):
+        """
+        Novos pesos globais (views de um único vetor), com as atualizações
+        guardadas até seal(). Encerra a rodada, se ainda estiver aberta.
+        """
+        self.seal()
+        try:
+            return self._aggregate()
+        finally:
+            self._executor.free(self._deltas)
+            self._deltas = None
+
+    def summary(self) -> str:
+        """Efeito da regra na última agregação, para os logs da rodada"""
+        if self.rule == 'trimmed_mean':
+            return (f"{self.trimmed} de {len(self._samples)} valores descartados em cada ponta "
+                    f"de cada coordenada")
+        return f"{self.excluded} atualizações descartadas ou limitadas"
+
+    def _aggregate(self):
+        n = len(self._samples)
+        deltas = self._deltas[:n]
+        weights = np.asarray(self._samples, dtype=np.float64) / self.total_samples
+        new_flat, new_weights = _flat_layers(self.global_weights)
+        # Fatiado, o resultado é escrito pelos processos do pool na memória compartilhada
+        out = new_flat if self._executor.num_shards == 1 else self._executor.empty(new_flat.shape)
+        run = self._executor.run
+
+        if self.rule == 'median':
+            run('median', deltas, out, block_bytes=self.block_bytes)
+        elif self.rule == 'trimmed_mean':
+            self.trimmed = trim_count(n, self.trim_fraction)
+            run('trimmed_mean', deltas, out, trim_fraction=self.trim_fraction, block_bytes=self.block_bytes)
+        elif self.rule in ('krum', 'multi_krum'):
+            count = 1 if self.rule == 'krum' else (self.multi_krum_select or n - self.byzantine)
+            distances = distances_from_gram(run('gram', deltas, block_bytes=self.block_bytes))
+            chosen = krum_select(distances, self.byzantine, count)
+            self.excluded = n - len(chosen)
+            coefficients = np.zeros(n)
+            coefficients[chosen] = weights[chosen] / weights[chosen].sum()
+            run('weighted_rows', deltas, out, coefficients=coefficients, block_bytes=self.block_bytes)
+        else:
+            norms = np.sqrt(run('sq_norms', deltas, block_bytes=self.block_bytes))
+            bound = self.norm_bound or float(np.median(norms))
+            scale = np.minimum(1.0, bound / np.maximum(norms, 1e-12))
+            self.excluded = int(np.count_nonzero(norms > bound))
+            run('weighted_rows', deltas, out, coefficients=weights * scale, block_bytes=self.block_bytes)
+
+        if out is not new_flat:
+            new_flat[...] = out
+            self._executor.free(out)
+        new_flat += self._global
+        return new_weights
+
+
+def make_aggregator(rule: str, global_weights, capacity: int = 8, **params):
+    """
+    Agregador da rodada para a regra `rule`. A FedAvg é somada de forma
+    incremental (StreamingAverage) e não usa os parâmetros das regras robustas.
+    """
+    if rule == 'fedavg':
+        return StreamingAverage(global_weights)
+    return RobustAggregator(global_weights, rule, capacity, **params)
@@ -0,0 +1,94 @@
+# /common/sampling.py
+
+"""
+Seleção dos clientes de cada rodada.
+
+Em vez de contatar todos os clientes registrados, cada rodada sorteia uma
+fração C deles, de modo que o trabalho e a memória da rodada acompanham o
+número de selecionados e não o tamanho da população. Estratégias:
+
+    'all'        todos os clientes elegíveis (comportamento original)
+    'uniform'    amostra uniforme sem reposição
+    'stratified' estratos por número de amostras (quantis), com alocação
+                 proporcional; clientes ainda sem contagem formam um estrato
+    'speed'      sorteio sem reposição com probabilidade proporcional a
+                 1 / avg_rtt ** speed_exponent (estimativas do timeout adaptativo);
+                 clientes lentos continuam tendo chance de ser escolhidos
+"""
+
+import math
+import numpy as np
+
+SAMPLING_STRATEGIES = ('all', 'uniform', 'stratified', 'speed')
+
+
+class ClientSampler:
+    """Escolhe os índices dos clientes de cada rodada"""
+
+    def __init__(self, strategy: str = 'all', fraction: float = 1.0, min_clients: int = 1,
+                 num_strata: int = 4, speed_exponent: float = 1.0, seed: int = None):
+        if strategy not in SAMPLING_STRATEGIES:
+            raise ValueError(f"Estratégia de seleção desconhecida: {strategy}")
+        self.strategy = strategy
+        self.fraction = fraction
+        self.min_clients = min_clients
+        self.num_strata = num_strata
+        self.speed_exponent = speed_exponent
+        self._rng = np.random.default_rng(seed)
+
+    def clients_per_round(self, population: int) -> int:
+        """Quantos clientes uma rodada seleciona, para uma população de `population`"""
+        if self.strategy == 'all':
+            return population
+        return min(population, max(self.min_clients, math.ceil(self.fraction * population)))
+
+    def select(self, eligible, sample_counts=None, rtt_estimates=None, k: int = None) -> list:
+        """
+        eligible: índices dos clientes que podem participar da rodada
+        sample_counts: índice -> amostras informadas pelo cliente (estratégia 'stratified')
+        rtt_estimates: índice -> avg_rtt estimado (estratégia 'speed')
+        k: quantos selecionar (padrão: a fração C dos elegíveis)
+        Retorna: os índices selecionados, em ordem crescente
+        """
+        eligible = list(eligible)
+        k = min(len(eligible), self.clients_per_round(len(eligible)) if k is None else k)
+        if k == len(eligible):
+            return eligible
+        if self.strategy == 'stratified':
+            chosen = self._stratified(eligible, k, sample_counts or {})
+        elif self.strategy == 'speed':
+            chosen = self._speed_weighted(eligible, k, rtt_estimates or {})
+        else:
+            chosen = self._rng.choice(eligible, size=k, replace=False).tolist()
+        return sorted(chosen)
+
+    def _stratified(self, eligible, k, sample_counts):
+        unknown = [i for i in eligible if i not in sample_counts]
+        known = sorted((i for i in eligible if i in sample_counts), key=lambda i: sample_counts[i])
+        strata = []
+        if known:
+            strata = [s.tolist() for s in np.array_split(known, min(self.num_strata, len(known)))]
+        if unknown:
+            strata.append(unknown)
+
+        # Alocação proporcional ao tamanho de cada estrato (maiores restos)
+        quotas = [k * len(s) / len(eligible) for s in strata]
+        allocation = [int(q) for q in quotas]
+        by_remainder = sorted(range(len(strata)), key=lambda j: quotas[j] - allocation[j], reverse=True)
+        for j in by_remainder[:k - sum(allocation)]:
+            allocation[j] += 1
+
+        chosen = []
+        for stratum, n in zip(strata, allocation):
+            if n:
+                chosen += self._rng.choice(stratum, size=n, replace=False).tolist()
+        return chosen
+
+    def _speed_weighted(self, eligible, k, rtt_estimates):
+        rtts = np.array([max(rtt_estimates.get(i, 0.0), 1e-3) for i in eligible], dtype=np.float64)
+        # Clientes sem estimativa recebem a mediana, para serem explorados
+        known = np.array([i in rtt_estimates for i in eligible])
+        if known.any() and not known.all():
+            rtts[~known] = np.median(rtts[known])
+        weights = rtts ** -self.speed_exponent
+        return self._rng.choice(eligible, size=k, replace=False, p=weights / weights.sum()).tolist()
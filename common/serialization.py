@@ -0,0 +1,192 @@
+# /common/serialization.py
+
+"""
+Protocolo de transferência de pesos usado pelo endpoint /fit.
+
+O formato binário envia cada tensor como um buffer bruto little-endian,
+evitando a conversão para listas aninhadas de floats do JSON. O JSON
+continua disponível como fallback, escolhido via Content-Type/Accept.
+
+Layout do payload binário:
+    magic (4 bytes) | tamanho dos metadados (u32) | metadados (JSON utf-8)
+    | número de tensores (u32)
+    | para cada tensor: dtype (u8) | ndim (u8) | shape (ndim x u32)
+                        | tamanho em bytes (u64) | buffer bruto
+"""
+
+import json
+import struct
+import numpy as np
+
+CONTENT_TYPE_BINARY = 'application/x-fl-weights'
+CONTENT_TYPE_JSON = 'application/json'
+
+MAGIC = b'FLW1'
+
+# Códigos de dtype transmitidos no cabeçalho de cada tensor
+_DTYPE_CODES = {
+    np.dtype('float32'): 0,
+    np.dtype('float16'): 1,
+    np.dtype('int8'): 2,
+    np.dtype('uint8'): 3,
+    np.dtype('int32'): 4,
+    np.dtype('int64'): 5,
+    np.dtype('float64'): 6,
+}
+_CODE_DTYPES = {code: dtype for dtype, code in _DTYPE_CODES.items()}
+
+_U32 = struct.Struct('<I')
+_TENSOR_HEADER = struct.Struct('<BB')
+_U64 = struct.Struct('<Q')
+
+
+class PayloadError(ValueError):
+    """Payload malformado ou em formato não suportado"""
+
+
+def encode_weights(weights, metadata=None) -> bytes:
+    """
+    Serializa uma lista de arrays numpy (e metadados opcionais) no formato binário.
+    """
+    meta_bytes = json.dumps(metadata or {}).encode('utf-8')
+    parts = [MAGIC, _U32.pack(len(meta_bytes)), meta_bytes, _U32.pack(len(weights))]
+
+    for w in weights:
+        w = np.asarray(w)
+        dtype_code = _DTYPE_CODES.get(w.dtype.newbyteorder('='))
+        if dtype_code is None:
+            raise PayloadError(f"dtype não suportado no protocolo binário: {w.dtype}")
+        # Garante buffer contíguo e little-endian (sem promover escalares a 1-D)
+        w = np.asarray(w, dtype=w.dtype.newbyteorder('<'), order='C')
+        parts.append(_TENSOR_HEADER.pack(dtype_code, w.ndim))
+        parts.append(struct.pack(f'<{w.ndim}I', *w.shape))
+        parts.append(_U64.pack(w.nbytes))
+        parts.append(w.data)
+
+    return b''.join(parts)
+
+
+def decode_weights(body):
+    """
+    Desserializa um payload binário.
+    Retorna: (metadados, lista de arrays)
+
+    Os arrays são views somente-leitura sobre o buffer recebido (sem cópia).
+    Qualquer inconsistência no payload é levantada como PayloadError.
+    """
+    view = memoryview(body)
+    if bytes(view[:4]) != MAGIC:
+        raise PayloadError("Payload binário sem o cabeçalho esperado")
+
+    def unpack(fmt: struct.Struct, offset):
+        if offset + fmt.size > len(view):
+            raise PayloadError("Payload binário truncado")
+        return fmt.unpack_from(view, offset)
+
+    offset = 4
+    (meta_len,) = unpack(_U32, offset)
+    offset += _U32.size
+    if offset + meta_len > len(view):
+        raise PayloadError("Payload binário truncado")
+    metadata = _load_metadata(bytes(view[offset:offset + meta_len]))
+    offset += meta_len
+
+    (num_tensors,) = unpack(_U32, offset)
+    offset += _U32.size
+
+    weights = []
+    for _ in range(num_tensors):
+        dtype_code, ndim = unpack(_TENSOR_HEADER, offset)
+        offset += _TENSOR_HEADER.size
+        shape = unpack(struct.Struct(f'<{ndim}I'), offset)
+        offset += 4 * ndim
+        (nbytes,) = unpack(_U64, offset)
+        offset += _U64.size
+
+        if dtype_code not in _CODE_DTYPES:
+            raise PayloadError(f"Código de dtype desconhecido: {dtype_code}")
+        dtype = _CODE_DTYPES[dtype_code].newbyteorder('<')
+        if offset + nbytes > len(view):
+            raise PayloadError("Payload binário truncado")
+        if nbytes != int(np.prod(shape, dtype=np.int64)) * dtype.itemsize:
+            raise PayloadError(f"Tensor com shape {shape} não corresponde aos {nbytes} bytes informados")
+
+        array = np.frombuffer(view, dtype=dtype, count=nbytes // dtype.itemsize, offset=offset)
+        weights.append(array.reshape(shape))
+        offset += nbytes
+
+    return metadata, weights
+
+
+def _load_metadata(data) -> dict:
+    """Objeto JSON dos metadados (ou do payload JSON inteiro)"""
+    try:
+        metadata = json.loads(data)
+    except (UnicodeDecodeError, ValueError) as e:
+        raise PayloadError(f"JSON inválido no payload: {e}") from e
+    if not isinstance(metadata, dict):
+        raise PayloadError("O JSON do payload deve ser um objeto")
+    return metadata
+
+
+def encode_payload(weights, metadata=None, content_type=CONTENT_TYPE_BINARY) -> bytes:
+    """Serializa pesos e metadados no formato indicado pelo Content-Type"""
+    if content_type == CONTENT_TYPE_BINARY:
+        return encode_weights(weights, metadata)
+    if content_type == CONTENT_TYPE_JSON:
+        payload = dict(metadata or {})
+        weights = [np.asarray(w) for w in weights]
+        payload['weights'] = [w.tolist() for w in weights]
+        # Tensores que não são float32 (ex.: índices esparsos) levam o dtype junto
+        if any(w.dtype != np.float32 for w in weights):
+            payload['dtypes'] = [w.dtype.name for w in weights]
+        return json.dumps(payload).encode('utf-8')
+    raise PayloadError(f"Content-Type não suportado: {content_type}")
+
+
+def decode_payload(body, content_type):
+    """
+    Desserializa um payload de acordo com o Content-Type.
+    Retorna: (metadados, lista de arrays)
+    """
+    # Remove parâmetros como "; charset=utf-8"
+    content_type = (content_type or '').split(';')[0].strip()
+
+    if content_type == CONTENT_TYPE_BINARY:
+        return decode_weights(body)
+    if content_type == CONTENT_TYPE_JSON:
+        payload = _load_metadata(body)
+        tensors = payload.pop('weights', [])
+        dtypes = payload.pop('dtypes', None)
+        if not isinstance(tensors, list) or not isinstance(dtypes, (list, type(None))):
+            raise PayloadError("Campos weights/dtypes do payload JSON devem ser listas")
+        if dtypes is None:
+            dtypes = ['float32'] * len(tensors)
+        if len(dtypes) != len(tensors):
+            raise PayloadError(f"{len(dtypes)} dtypes para {len(tensors)} tensores no payload JSON")
+        # Mesmos dtypes do protocolo binário (nada de object, str, etc.)
+        allowed = {dtype.name: dtype for dtype in _DTYPE_CODES}
+        unknown = [dtype for dtype in dtypes if not isinstance(dtype, str) or dtype not in allowed]
+        if unknown:
+            raise PayloadError(f"dtype não suportado no payload JSON: {unknown[0]!r}")
+        try:
+            weights = [np.array(w, dtype=allowed[dtype]) for w, dtype in zip(tensors, dtypes)]
+        except (TypeError, ValueError, OverflowError) as e:
+            raise PayloadError(f"Tensor inválido no payload JSON: {e}") from e
+        return payload, weights
+    raise PayloadError(f"Content-Type não suportado: {content_type}")
+
+
+def negotiate_content_type(accept_header) -> str:
+    """Escolhe o formato da resposta a partir do cabeçalho Accept (JSON por padrão)"""
+    if accept_header and CONTENT_TYPE_BINARY in accept_header:
+        return CONTENT_TYPE_BINARY
+    return CONTENT_TYPE_JSON
+
+
+def request_headers(content_type) -> dict:
+    """Cabeçalhos de uma requisição /fit que aceita resposta binária ou JSON"""
+    return {
+        'Content-Type': content_type,
+        'Accept': f'{CONTENT_TYPE_BINARY}, {CONTENT_TYPE_JSON};q=0.5',
+    }
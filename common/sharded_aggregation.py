@@ -0,0 +1,158 @@
+# /common/sharded_aggregation.py
+
+"""
+Agregação em vários núcleos, por fatias do vetor de parâmetros.
+
+O ShardedExecutor aloca a matriz clientes × parâmetros das regras robustas
+(e o vetor de saída) em memória compartilhada (multiprocessing.shared_memory)
+e divide as colunas em `num_shards` fatias contíguas. Cada processo do pool
+se conecta aos segmentos pelo nome e roda, sobre a sua fatia, a mesma
+operação por coluna do SerialExecutor (COLUMN_KERNELS): as atualizações não
+são copiadas entre processos, os resultados por coluna são escritos direto
+no vetor de saída e as somas parciais (Gram, normas) voltam pelo pool e são
+somadas. O RobustAggregator é o mesmo nos dois casos; só muda o executor.
+
+Os processos são criados por fork quando a plataforma permite, logo na
+construção do executor: eles só rodam numpy, e o módulo principal do
+orquestrador (que carrega os dados de teste) não é reimportado. Por isso o
+executor tem de ser criado antes de importar o TensorFlow, cujas threads e
+locks não sobrevivem a um fork; depois disso a construção falha.
+"""
+
+import multiprocessing
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import resource_tracker, shared_memory
+import numpy as np
+
+from common.robust_aggregation import COLUMN_KERNELS, SERIAL_EXECUTOR
+
+# Largura das fatias arredondada para este número de elementos (múltiplo das linhas de cache)
+SHARD_ALIGNMENT = 1024
+
+
+def shard_ranges(num_cols: int, num_shards: int, alignment: int = SHARD_ALIGNMENT):
+    """Intervalos [início, fim) de colunas de cada fatia"""
+    width = -(-num_cols // max(num_shards, 1))
+    width = max(alignment, -(-width // alignment) * alignment)
+    return [(start, min(start + width, num_cols)) for start in range(0, num_cols, width)]
+
+
+def _run_shard(kernel, deltas_spec, rows, out_spec, start, stop, params):
+    """Roda COLUMN_KERNELS[kernel] sobre as colunas [start, stop) (num processo do pool)"""
+    segments = [shared_memory.SharedMemory(name=deltas_spec[0])]
+    if out_spec is not None:
+        segments.append(shared_memory.SharedMemory(name=out_spec[0]))
+    try:
+        return _apply_shard(kernel, segments, deltas_spec[1], rows, out_spec, start, stop, params)
+    finally:
+        for segment in segments:
+            segment.close()
+
+
+def _apply_shard(kernel, segments, shape, rows, out_spec, start, stop, params):
+    # As views sobre os segmentos morrem com este frame, antes do close()
+    matrix = np.ndarray(shape, dtype=np.float32, buffer=segments[0].buf)
+    out = None
+    if out_spec is not None:
+        out = np.ndarray(out_spec[1], dtype=np.float32, buffer=segments[1].buf)[start:stop]
+    if out is not None:
+        params = {**params, 'out': out}
+    result = COLUMN_KERNELS[kernel](matrix[:rows, start:stop], **params)
+    return None if out is not None else result
+
+
+def _ready():
+    return True
+
+
+class ShardedExecutor:
+    """
+    Executor das regras robustas com `num_shards` processos. Mesma interface do
+    SerialExecutor (empty/free/run/shutdown); os arrays passados a run() têm de
+    ter sido alocados por empty() (ou ser um prefixo de linhas deles).
+    """
+
+    def __init__(self, num_shards: int):
+        self.num_shards = num_shards
+        self._segments = {}  # Endereço dos dados -> (segmento, shape)
+        self._retired = []  # Segmentos já removidos cujo mapeamento ainda tem views vivas
+        # Os processos herdam o rastreador de recursos do pai, que passa a ser o
+        # único a responder pelos segmentos (sem avisos de vazamento na saída)
+        resource_tracker.ensure_running()
+        start_method = 'fork' if 'fork' in multiprocessing.get_all_start_methods() else None
+        if start_method == 'fork' and 'tensorflow' in sys.modules:
+            raise RuntimeError("Crie o ShardedExecutor antes de importar o TensorFlow (fork inseguro)")
+        self._pool = ProcessPoolExecutor(
+            max_workers=num_shards, mp_context=multiprocessing.get_context(start_method)
+        )
+        self._pool.submit(_ready).result()  # Cria os processos agora, antes do treinamento
+
+    def empty(self, shape) -> np.ndarray:
+        """Array float32 em memória compartilhada"""
+        self._collect()
+        nbytes = max(int(np.prod(shape, dtype=np.int64)) * 4, 1)
+        segment = shared_memory.SharedMemory(create=True, size=nbytes)
+        array = np.ndarray(shape, dtype=np.float32, buffer=segment.buf)
+        self._segments[array.__array_interface__['data'][0]] = (segment, tuple(shape))
+        return array
+
+    def free(self, array: np.ndarray):
+        """
+        Remove o segmento de um array de empty(). O mapeamento só é desfeito
+        quando não restarem views dele (verificado nas próximas alocações).
+        """
+        if array is None:
+            return
+        entry = self._segments.pop(array.__array_interface__['data'][0], None)
+        if entry is not None:
+            entry[0].unlink()
+            self._retired.append(entry[0])
+
+    def _collect(self):
+        for segment in list(self._retired):
+            try:
+                segment.close()
+                self._retired.remove(segment)
+            except BufferError:
+                pass  # Ainda há views do array; tenta de novo depois
+
+    def _spec(self, array: np.ndarray):
+        entry = self._segments.get(array.__array_interface__['data'][0])
+        if entry is None or array.shape[1:] != entry[1][1:] or not array.flags.c_contiguous:
+            raise ValueError("O array não foi alocado por este executor")
+        return entry[0].name, entry[1]
+
+    def run(self, kernel: str, deltas: np.ndarray, out: np.ndarray = None, **params):
+        """
+        Aplica COLUMN_KERNELS[kernel] em paralelo, uma fatia de colunas por
+        tarefa; retorna a soma dos resultados parciais, se houver.
+        """
+        deltas_spec = self._spec(deltas)
+        out_spec = self._spec(out) if out is not None else None
+        if 'block_bytes' in params:
+            # O limite de memória de trabalho vale para o conjunto dos processos
+            params['block_bytes'] = max(params['block_bytes'] // self.num_shards, 1)
+        futures = [
+            self._pool.submit(_run_shard, kernel, deltas_spec, len(deltas), out_spec, start, stop, params)
+            for start, stop in shard_ranges(deltas.shape[1], self.num_shards)
+        ]
+        partials = [future.result() for future in futures]
+        if out is not None:
+            return out
+        return sum(partials[1:], partials[0])
+
+    def shutdown(self):
+        self._pool.shutdown(wait=True)
+        for segment, _ in self._segments.values():
+            segment.unlink()
+            self._retired.append(segment)
+        self._segments.clear()
+        self._collect()
+
+
+def create_executor(num_shards: int):
+    """SerialExecutor para 1 fatia (ou menos); ShardedExecutor caso contrário"""
+    if num_shards <= 1:
+        return SERIAL_EXECUTOR
+    return ShardedExecutor(num_shards)
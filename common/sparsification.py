@@ -0,0 +1,56 @@
+# /common/sparsification.py
+
+"""
+Esparsificação top-k das atualizações enviadas pelos clientes.
+
+O cliente envia apenas as k maiores coordenadas (em módulo) de
+`novos_pesos - pesos_globais`, como pares (índice, valor) sobre o vetor
+achatado de todas as camadas. O que não foi enviado fica acumulado no
+resíduo (error feedback) e é somado à atualização da rodada seguinte.
+"""
+
+from typing import List, NamedTuple
+import numpy as np
+
+
+class SparseDelta(NamedTuple):
+    """Atualização esparsa: índices no vetor achatado do modelo e seus valores"""
+    indices: np.ndarray
+    values: np.ndarray
+
+
+def flatten(weights) -> np.ndarray:
+    """Concatena todas as camadas em um único vetor float32"""
+    return np.concatenate([np.ravel(w) for w in weights]).astype(np.float32, copy=False)
+
+
+def topk_sparsify(vector: np.ndarray, density: float) -> SparseDelta:
+    """Seleciona as k = density * tamanho coordenadas de maior módulo"""
+    k = max(1, int(round(vector.size * density)))
+    if k >= vector.size:
+        indices = np.arange(vector.size)
+    else:
+        indices = np.argpartition(np.abs(vector), -k)[-k:]
+    indices = np.sort(indices).astype(np.uint32)
+    return SparseDelta(indices, vector[indices].astype(np.float32))
+
+
+class ErrorFeedback:
+    """Mantém o resíduo não transmitido de um cliente entre as rodadas"""
+
+    def __init__(self):
+        self.residual = None
+
+    def compress(self, delta: List[np.ndarray], density: float) -> SparseDelta:
+        """Soma o resíduo ao delta, esparsifica e guarda o que sobrou"""
+        corrected = flatten(delta)
+        if self.residual is not None and self.residual.shape == corrected.shape:
+            corrected += self.residual
+
+        sparse = topk_sparsify(corrected, density)
+        corrected[sparse.indices] = 0.0
+        self.residual = corrected
+        return sparse
+
+    def reset(self):
+        self.residual = None
@@ -0,0 +1,126 @@
+# /common/streaming.py
+
+"""
+Transferência do modelo em streaming, camada por camada.
+
+Em vez de montar o payload inteiro em memória (e de só começar a usá-lo
+depois de recebê-lo por completo), o emissor gera os bytes de uma camada
+por vez e o receptor consome cada camada assim que ela chega: o cliente
+carrega a camada direto na variável do Keras e o orquestrador a soma na
+média em andamento. O pico de memória fica perto do tamanho de uma camada.
+
+Layout do stream (enviado com Transfer-Encoding: chunked):
+    magic (4 bytes) | tamanho dos metadados (u32) | metadados (JSON utf-8)
+    | para cada camada: dtype (u8) | ndim (u8) | shape (ndim x u32)
+                        | tamanho em bytes (u64) | buffer bruto
+    | marcador de fim (u8 = 0xFF)
+
+Os buffers de cada camada são emitidos em pedaços de até STREAM_CHUNK_BYTES.
+"""
+
+import json
+import struct
+import numpy as np
+
+from common.serialization import PayloadError, _CODE_DTYPES, _DTYPE_CODES, _load_metadata
+
+CONTENT_TYPE_STREAM = 'application/x-fl-weights-stream'
+
+STREAM_MAGIC = b'FLS1'
+STREAM_CHUNK_BYTES = 1024 * 1024
+
+_END_OF_STREAM = 0xFF
+
+_U32 = struct.Struct('<I')
+_U64 = struct.Struct('<Q')
+
+
+class LayerStream:
+    """
+    Corpo iterável (aceito pelo requests e pelo Flask) que serializa as
+    camadas sob demanda. `tensors` pode ser um gerador, para que cada camada
+    só seja materializada quando for enviada.
+    """
+
+    def __init__(self, tensors, metadata=None):
+        self.tensors = tensors
+        self.metadata = metadata or {}
+        self.nbytes = 0  # Bytes já emitidos
+
+    def __iter__(self):
+        for chunk in self._chunks():
+            self.nbytes += len(chunk)
+            yield chunk
+
+    def _chunks(self):
+        meta_bytes = json.dumps(self.metadata).encode('utf-8')
+        yield STREAM_MAGIC + _U32.pack(len(meta_bytes)) + meta_bytes
+
+        for w in self.tensors:
+            w = np.asarray(w)
+            dtype_code = _DTYPE_CODES.get(w.dtype.newbyteorder('='))
+            if dtype_code is None:
+                raise PayloadError(f"dtype não suportado no stream: {w.dtype}")
+            w = np.asarray(w, dtype=w.dtype.newbyteorder('<'), order='C')
+            yield (bytes([dtype_code, w.ndim]) + struct.pack(f'<{w.ndim}I', *w.shape)
+                   + _U64.pack(w.nbytes))
+            data = memoryview(w.reshape(-1)).cast('B')
+            for start in range(0, len(data), STREAM_CHUNK_BYTES):
+                yield bytes(data[start:start + STREAM_CHUNK_BYTES])
+
+        yield bytes([_END_OF_STREAM])
+
+
+def _read_exact(stream, nbytes: int) -> np.ndarray:
+    """Lê exatamente `nbytes` de um arquivo/stream para um buffer novo"""
+    buffer = np.empty(nbytes, dtype=np.uint8)
+    view = memoryview(buffer)
+    received = 0
+    while received < nbytes:
+        end = min(nbytes, received + STREAM_CHUNK_BYTES)
+        if hasattr(stream, 'readinto'):
+            n = stream.readinto(view[received:end])
+        else:
+            data = stream.read(end - received)
+            n = len(data)
+            view[received:received + n] = data
+        if not n:
+            raise PayloadError("Stream de pesos truncado")
+        received += n
+    return buffer
+
+
+def read_stream(stream, max_layer_bytes: int):
+    """
+    Lê o cabeçalho de um stream de camadas.
+    Retorna: (metadados, gerador das camadas), onde cada camada é lida do
+    stream só quando o gerador avança. O gerador levanta PayloadError se o
+    stream terminar antes do marcador de fim.
+    """
+    header = _read_exact(stream, len(STREAM_MAGIC) + _U32.size).tobytes()
+    if header[:4] != STREAM_MAGIC:
+        raise PayloadError("Stream de pesos sem o cabeçalho esperado")
+    (meta_len,) = _U32.unpack_from(header, 4)
+    if meta_len > max_layer_bytes:
+        raise PayloadError("Metadados do stream excedem o limite")
+    metadata = _load_metadata(_read_exact(stream, meta_len).tobytes())
+
+    def layers():
+        while True:
+            dtype_code = int(_read_exact(stream, 1)[0])
+            if dtype_code == _END_OF_STREAM:
+                return
+            if dtype_code not in _CODE_DTYPES:
+                raise PayloadError(f"Código de dtype desconhecido: {dtype_code}")
+            ndim = int(_read_exact(stream, 1)[0])
+            shape = struct.unpack(f'<{ndim}I', _read_exact(stream, 4 * ndim).tobytes())
+            (nbytes,) = _U64.unpack(_read_exact(stream, _U64.size).tobytes())
+            if nbytes > max_layer_bytes:
+                raise PayloadError(f"Camada de {nbytes} bytes excede o limite de {max_layer_bytes}")
+
+            dtype = _CODE_DTYPES[dtype_code].newbyteorder('<')
+            if nbytes != int(np.prod(shape, dtype=np.int64)) * dtype.itemsize:
+                raise PayloadError("Tamanho da camada não corresponde ao shape")
+            yield _read_exact(stream, nbytes).view(dtype).reshape(shape)
+
+    return metadata, layers()
@@ -0,0 +1,414 @@
+# /common/tasks.py
+
+"""
+Protocolo de tarefas com long-polling (modo poll).
+
+Em vez de o orquestrador abrir uma conexão para o /fit de cada cliente (o
+que exige uma rota até ele e prende uma requisição durante todo o treino
+local), cada cliente consulta GET /task no orquestrador e fica esperando
+até `poll_wait` segundos por uma tarefa. A tarefa é o mesmo corpo que iria
+no /fit (modelo ou hash + configuração); o cliente treina e devolve a
+resposta que o /fit daria em POST /task/<id>/result. O orquestrador só
+mantém uma fila por cliente, e nenhum cliente precisa aceitar conexões.
+
+O resultado é lido direto do socket pelo `reader` da tarefa (ex.: para um
+slot da UpdateArena), com o mesmo código que lê as respostas do /fit.
+Tarefas canceladas (timeout ou quórum) saem da fila, e um resultado que
+chegar depois é recusado com 410. Com um AdmissionController, um resultado
+que não cabe no orçamento de memória recebe 429 + Retry-After.
+"""
+
+import json
+import math
+import re
+import threading
+import time
+import uuid
+from collections import deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+
+import requests
+
+from common.compression import DEFAULT_MAX_DECOMPRESSED_BYTES, IDENTITY
+
+_RESULT_PATH = re.compile(r'^/task/([0-9a-f]{32})/result$')
+
+# Estados de uma tarefa
+QUEUED = 'queued'
+RUNNING = 'running'  # Entregue ao cliente, em treino
+RECEIVING = 'receiving'  # Resultado sendo lido
+DONE = 'done'
+CANCELLED = 'cancelled'
+
+# Tamanho máximo lido do corpo de um resultado com erro
+_MAX_ERROR_BYTES = 64 * 1024
+
+# Leituras do corpo de um resultado recusado, descartado em pedaços
+_DRAIN_CHUNK = 1024 * 1024
+
+
+def task_client_name(endpoint: str) -> str:
+    """Nome com que o cliente consulta a fila: o host do endpoint (ex.: 'client-1')"""
+    return urlparse(endpoint).hostname or endpoint
+
+
+class TaskTimeout(requests.exceptions.Timeout):
+    """O cliente não devolveu o resultado da tarefa dentro do timeout"""
+
+
+class _RequestBody:
+    """Corpo de um POST recebido, com a interface de resposta do requests usada por UpdateArena.read"""
+
+    def __init__(self, headers, rfile):
+        self.headers = headers
+        self.raw = self
+        self._rfile = rfile
+        self._remaining = int(headers.get('Content-Length') or 0)
+
+    def readinto(self, buffer) -> int:
+        n = self._rfile.readinto(buffer[:self._remaining]) if self._remaining else 0
+        self._remaining -= n or 0
+        return n
+
+    def read(self, decode_content=False) -> bytes:
+        data = self._rfile.read(self._remaining)
+        self._remaining = 0
+        return data
+
+    def close(self):
+        pass
+
+
+class Task:
+    """Uma chamada do /fit entregue pela fila"""
+
+    def __init__(self, client: str, body: bytes, headers: dict, reader):
+        self.task_id = uuid.uuid4().hex
+        self.client = client
+        self.body = body
+        self.headers = headers
+        self.reader = reader  # reader(corpo recebido) -> (corpo, tamanho na rede, tempo de CPU)
+        self.state = QUEUED
+        self.status = None  # Status HTTP que o /fit do cliente retornou
+        self.result = None  # Retorno do reader (status 200)
+        self.content_type = None  # Content-Type do resultado
+        self.reservation = 0  # Bytes reservados no orçamento de memória até a decodificação
+        self.error = None  # Mensagem de erro do cliente (outros status)
+        self._done = threading.Event()
+
+    def wait(self, timeout: float) -> bool:
+        return self._done.wait(timeout)
+
+    def finish(self, status: int, result=None, error: str = None):
+        self.status, self.result, self.error = status, result, error
+        self.state = DONE
+        self._done.set()
+
+
+class TaskServer:
+    """
+    Filas de tarefas por cliente, servidas por HTTP:
+
+        GET  /task?client=<nome>&wait=<s>   próxima tarefa (204 se nada chegar)
+        POST /task/<id>/result              resposta do /fit (status em X-Fit-Status)
+        GET  /manifest                      manifesto da sessão
+    """
+
+    def __init__(self, host='0.0.0.0', port=5001, poll_wait: float = 30.0, manifest=None,
+                 max_body_bytes: int = DEFAULT_MAX_DECOMPRESSED_BYTES, upload_timeout: float = 60.0,
+                 admission=None, admission_wait: float = 5.0, retry_after: int = 1):
+        self.host = host
+        self.port = port
+        self.poll_wait = poll_wait
+        self.manifest = manifest
+        self.max_body_bytes = max_body_bytes
+        self.upload_timeout = upload_timeout
+        # Orçamento de memória dos resultados: espera até `admission_wait` segundos
+        # por espaço e, se não houver, pede ao cliente que reenvie em `retry_after`
+        self.admission = admission
+        self.admission_wait = admission_wait
+        self.retry_after = retry_after
+        self._queues = {}  # Cliente -> deque de tarefas
+        self._tasks = {}  # task_id -> tarefa entregue e ainda sem resultado
+        self._waiting = {}  # Cliente -> consultas em andamento
+        self._last_seen = {}  # Cliente -> fim da última consulta
+        self._lock = threading.Lock()
+        # Uma condição por cliente: uma tarefa nova só acorda a consulta do próprio
+        # cliente; `_polled` acorda quem espera os clientes se conectarem
+        self._arrivals = {}  # Cliente -> Condition (sobre _lock)
+        self._polled = threading.Condition(self._lock)
+        self._httpd = None
+
+    def start(self):
+        """Inicia o servidor em uma thread daemon"""
+        self._httpd = ThreadingHTTPServer((self.host, self.port), _TaskRequestHandler)
+        self._httpd.daemon_threads = True
+        self._httpd.task_server = self
+        threading.Thread(target=self._httpd.serve_forever, daemon=True).start()
+        print(f"Servidor de tarefas ouvindo em {self.host}:{self.port}")
+
+    def stop(self):
+        if self._httpd is not None:
+            self._httpd.shutdown()
+            self._httpd.server_close()
+
+    def submit(self, endpoint: str, body: bytes, headers: dict, reader) -> Task:
+        """Põe uma tarefa na fila do cliente e acorda a consulta dele, se houver"""
+        task = Task(task_client_name(endpoint), body, headers, reader)
+        with self._lock:
+            self._queues.setdefault(task.client, deque()).append(task)
+            self._arrival(task.client).notify()
+        return task
+
+    def _arrival(self, client: str) -> threading.Condition:
+        """Condição em que as consultas do cliente esperam (chamar com _lock)"""
+        if client not in self._arrivals:
+            self._arrivals[client] = threading.Condition(self._lock)
+        return self._arrivals[client]
+
+    def cancel(self, task: Task) -> bool:
+        """Retira a tarefa da fila; False se o resultado já chegou ou está sendo lido"""
+        with self._lock:
+            if task.state in (RECEIVING, DONE):
+                return False
+            if task.state == QUEUED:
+                queue = self._queues.get(task.client)
+                if queue is not None and task in queue:
+                    queue.remove(task)
+            self._tasks.pop(task.task_id, None)
+            task.state = CANCELLED
+            return True
+
+    def run(self, endpoint: str, body: bytes, headers: dict, reader, timeout: float) -> Task:
+        """
+        Publica a tarefa e espera o resultado por até `timeout` segundos.
+        Levanta TaskTimeout (e cancela a tarefa) se ele não chegar.
+        """
+        task = self.submit(endpoint, body, headers, reader)
+        if task.wait(timeout):
+            return task
+        if not self.cancel(task):
+            # O resultado já está sendo lido; a leitura é limitada por upload_timeout
+            # e sempre termina a tarefa (com sucesso ou erro)
+            task.wait(None)
+            return task
+        raise TaskTimeout(f"Tarefa {task.task_id} sem resultado de {task.client} em {timeout:.0f}s")
+
+    def poll(self, client: str, wait: float):
+        """Próxima tarefa do cliente, esperando até `wait` segundos; None se nada chegar"""
+        deadline = time.monotonic() + wait
+        with self._lock:
+            self._waiting[client] = self._waiting.get(client, 0) + 1
+            self._polled.notify_all()
+            arrival = self._arrival(client)
+            try:
+                while True:
+                    queue = self._queues.get(client)
+                    if queue:
+                        task = queue.popleft()
+                        task.state = RUNNING
+                        self._tasks[task.task_id] = task
+                        return task
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        return None
+                    arrival.wait(remaining)
+            finally:
+                self._waiting[client] -= 1
+                self._last_seen[client] = time.monotonic()
+
+    def fail_client(self, client: str, error: str):
+        """
+        Termina com erro (status 400) as tarefas já entregues ao cliente e ainda
+        sem resultado, ex.: quando o stream dele trouxe uma mensagem ilegível
+        """
+        with self._lock:
+            tasks = [task for task in self._tasks.values() if task.client == client]
+            for task in tasks:
+                del self._tasks[task.task_id]
+                task.state = RECEIVING
+        for task in tasks:
+            task.finish(400, error=error)
+
+    def pending(self, task_id: str) -> bool:
+        """A tarefa ainda espera o resultado?"""
+        with self._lock:
+            return task_id in self._tasks
+
+    def release(self, task: Task):
+        """Devolve ao orçamento a memória reservada para o resultado da tarefa"""
+        if task.reservation:
+            self.admission.release(task.reservation)
+            task.reservation = 0
+
+    def claim(self, task_id: str):
+        """Tarefa cujo resultado vai ser lido agora; None se ela foi cancelada ou não existe"""
+        with self._lock:
+            task = self._tasks.pop(task_id, None)
+            if task is not None:
+                task.state = RECEIVING
+            return task
+
+    def connected(self, endpoints) -> list:
+        """Clientes consultando a fila agora (ou que consultaram há pouco)"""
+        now = time.monotonic()
+        with self._lock:
+            return [
+                endpoint for endpoint in endpoints
+                if self._waiting.get(task_client_name(endpoint))
+                or now - self._last_seen.get(task_client_name(endpoint), float('-inf')) < self.poll_wait
+            ]
+
+    def wait_for_clients(self, endpoints, deadline: float, min_ready: int = None) -> list:
+        """Espera até `min_ready` (padrão: todos) clientes consultarem a fila ou o prazo acabar"""
+        endpoints = list(endpoints)
+        min_ready = len(endpoints) if min_ready is None else min_ready
+        deadline_at = time.monotonic() + deadline
+        with self._polled:
+            while True:
+                seen = [
+                    endpoint for endpoint in endpoints
+                    if self._waiting.get(task_client_name(endpoint))
+                    or task_client_name(endpoint) in self._last_seen
+                ]
+                remaining = deadline_at - time.monotonic()
+                if len(seen) >= min_ready or remaining <= 0:
+                    return seen
+                self._polled.wait(remaining)
+
+
+class _TaskRequestHandler(BaseHTTPRequestHandler):
+    # Conexões keep-alive: todas as respostas levam Content-Length
+    protocol_version = 'HTTP/1.1'
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        server = self.server.task_server
+        if url.path == '/manifest' and server.manifest is not None:
+            self._send_json(200, server.manifest.to_dict())
+            return
+        if url.path != '/task':
+            self.send_error(404)
+            return
+
+        query = parse_qs(url.query)
+        client = query.get('client', [None])[0]
+        if not client:
+            self.send_error(400, "Parâmetro client ausente")
+            return
+        try:
+            wait = float(query.get('wait', [server.poll_wait])[0])
+        except ValueError:
+            wait = math.nan
+        if not 0 <= wait:  # Também recusa NaN
+            self.send_error(400, "Parâmetro wait inválido")
+            return
+        task = server.poll(client, min(wait, server.poll_wait))
+        if task is None:
+            self.send_response(204)
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+            return
+
+        self.send_response(200)
+        self.send_header('Content-Type', task.headers.get('Content-Type', 'application/octet-stream'))
+        if task.headers.get('Content-Encoding', IDENTITY) != IDENTITY:
+            self.send_header('Content-Encoding', task.headers['Content-Encoding'])
+        # Formato e compressão que o orquestrador aceita no resultado
+        for name in ('Accept', 'Accept-Encoding'):
+            if name in task.headers:
+                self.send_header(f'X-{name}', task.headers[name])
+        self.send_header('X-Task-Id', task.task_id)
+        self.send_header('Content-Length', str(len(task.body)))
+        self.end_headers()
+        self.wfile.write(task.body)
+
+    def do_POST(self):
+        match = _RESULT_PATH.match(urlparse(self.path).path)
+        if not match:
+            self.send_error(404)
+            self.close_connection = True
+            return
+        server = self.server.task_server
+        length = self.headers.get('Content-Length')
+        if length is None:
+            self.send_error(411)
+            self.close_connection = True
+            return
+        try:
+            length = int(length)
+            status = int(self.headers.get('X-Fit-Status', 200))
+        except ValueError:
+            self.send_error(400, "Content-Length ou X-Fit-Status inválido")
+            self.close_connection = True
+            return
+        if not 0 <= length <= server.max_body_bytes:
+            self.send_error(413 if length > 0 else 400)
+            self.close_connection = True
+            return
+
+        task_id = match.group(1)
+        reserved = 0
+        if server.admission is not None and status == 200 and server.pending(task_id):
+            # Orçamento de memória cheio: o cliente reenvia depois
+            reserved = server.admission.cost(self.headers)
+            if not server.admission.acquire(reserved, server.admission_wait):
+                # O corpo é descartado em pedaços, para a resposta chegar ao cliente
+                # e a conexão continuar utilizável
+                remaining = length
+                while remaining > 0:
+                    remaining -= len(self.rfile.read(min(remaining, _DRAIN_CHUNK))) or remaining
+                self.send_response(429)
+                self.send_header('Retry-After', str(server.retry_after))
+                self.send_header('Content-Length', '0')
+                self.end_headers()
+                return
+
+        task = server.claim(task_id)
+        if task is None:
+            # Cancelada (timeout ou quórum): o resultado tardio é descartado
+            if reserved:
+                server.admission.release(reserved)
+            self.send_error(410, "Tarefa cancelada ou desconhecida")
+            self.close_connection = True
+            return
+
+        task.reservation = reserved
+        task.content_type = self.headers.get('Content-Type')
+        self.connection.settimeout(server.upload_timeout)
+        try:
+            if status == 200:
+                task.finish(status, task.reader(_RequestBody(self.headers, self.rfile)))
+            else:
+                error = self.rfile.read(min(length, _MAX_ERROR_BYTES)).decode('utf-8', 'replace')
+                try:
+                    error = json.loads(error).get('error', error)
+                except (ValueError, AttributeError):
+                    pass
+                task.finish(status, error=error)
+                self.close_connection = length > _MAX_ERROR_BYTES
+        except Exception as e:
+            server.release(task)
+            task.finish(400, error=f"Resultado ilegível: {e}")
+            self.send_error(400, str(e))
+            self.close_connection = True
+            return
+        finally:
+            self.connection.settimeout(None)
+
+        self.send_response(204)
+        self.send_header('Content-Length', '0')
+        self.end_headers()
+
+    def _send_json(self, status, data):
+        body = json.dumps(data).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        # Silencia o log padrão de cada requisição
+        pass
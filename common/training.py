@@ -0,0 +1,1044 @@
+# /common/training.py
+
+"""
+Condução do treinamento federado: rodadas síncronas e o laço assíncrono
+FedBuff, compartilhados pelo orquestrador e pelo orquestrador de testes.
+
+TrainingConfig reúne as configurações da sessão, com uma sub-configuração
+por recurso (codificação, transferência do modelo, rodadas, FedBuff, canais,
+seleção, tarefas, admissão e agregação); o orquestrador as lê das variáveis
+de ambiente. Os transportes opcionais (fila de tarefas, gRPC e servidor de
+modelos) só são importados quando a sessão os usa. O
+FederatedTrainer executa as rodadas e, para cada uma (ou cada passo do
+servidor no FedBuff), monta um registro com os campos de RoundMetrics, que
+chega a finish_round quando a avaliação do modelo termina.
+
+Os pontos de extensão begin_round, client_failure, client_delay,
+round_status e finish_round não fazem nada (ou só imprimem) por padrão; o
+orquestrador de testes os sobrescreve para simular falhas e coletar
+métricas sem duplicar o laço das rodadas.
+"""
+
+import os
+import resource
+import time
+from dataclasses import dataclass, field, fields, is_dataclass
+from functools import partial
+from typing import List, NamedTuple, Optional, get_args
+
+import numpy as np
+import requests
+
+from common.admission import AdmissionController
+from common.arena import UpdateArena
+from common.broadcast import DownlinkEncoding, RoundBroadcast
+from common.channel import ChannelPool
+from common.compression import DEFAULT_MAX_DECOMPRESSED_BYTES, encoding_headers
+from common.dispatch import AsyncDispatcher, FitResult, RoundContext, fit_client
+from common.evaluation import PipelinedEvaluator
+from common.fedbuff import FedBuffServer
+from common.manifest import ManifestMismatch, ModelManifest, handshake_manifest
+from common.model_store import ModelVersionStore
+from common.robust_aggregation import AGGREGATION_RULES, make_aggregator
+from common.sampling import ClientSampler
+from common.serialization import CONTENT_TYPE_BINARY, CONTENT_TYPE_JSON, PayloadError, request_headers
+from common.sharded_aggregation import create_executor
+from common.streaming import CONTENT_TYPE_STREAM
+
+DEFAULT_CLIENT_ENDPOINTS = [
+    "http://client-1:5000/fit",
+    "http://client-2:5000/fit",
+    "http://client-3:5000/fit",
+]
+
+
+@dataclass
+class EncodingConfig:
+    """Formato, compressão e quantização dos payloads do /fit"""
+    ENV_PREFIX = ''
+    # Formato dos pesos no /fit: 'binary' (float32 bruto) ou 'json' (fallback)
+    wire_format: str = 'binary'
+    # Atualização enviada pelos clientes: 'dense' (pesos completos) ou 'topk' (delta esparso)
+    update_mode: str = 'dense'
+    topk_density: float = 0.05
+    # Quantização de cada sentido do /fit: 'none', 'fp16' ou 'int8'
+    downlink_quantization: str = 'none'
+    uplink_quantization: str = 'none'
+    stochastic_rounding: bool = False
+    # Compressão negociada dos payloads: 'identity', 'gzip', 'zstd' ou 'lz4'
+    compression: str = 'identity'
+    compression_level: Optional[int] = None
+    max_decompressed_bytes: int = DEFAULT_MAX_DECOMPRESSED_BYTES
+    # Transfere o modelo camada por camada (Transfer-Encoding: chunked), somando cada
+    # camada recebida na média em andamento; ignora quantização, compressão e diffs
+    streaming: bool = False
+
+    @property
+    def content_type(self) -> str:
+        return CONTENT_TYPE_BINARY if self.wire_format == 'binary' else CONTENT_TYPE_JSON
+
+    def downlink(self, manifest: ModelManifest = None) -> DownlinkEncoding:
+        """Formato, quantização e compressão do modelo enviado aos clientes"""
+        return DownlinkEncoding(
+            self.content_type, self.downlink_quantization, self.stochastic_rounding,
+            self.compression, self.compression_level, manifest
+        )
+
+    def fit_config(self, model_version: str) -> dict:
+        """Configuração de treino enviada com o modelo da versão `model_version`"""
+        return {
+            'update_mode': self.update_mode,
+            'density': self.topk_density,
+            'uplink_quantization': self.uplink_quantization,
+            'stochastic_rounding': self.stochastic_rounding,
+            'compression_level': self.compression_level,
+            'model_version': model_version,
+        }
+
+
+@dataclass
+class ModelTransferConfig:
+    """Como o modelo global chega aos clientes"""
+    ENV_PREFIX = 'MODEL_'
+    # 'push': o modelo vai no corpo do /fit; 'pull': o /fit leva só o hash e o cliente
+    # baixa o modelo de GET /model/<sha256> quando não o tem em cache
+    transfer: str = 'push'
+    # Envia só global_r - global_base a clientes que já têm uma versão recente do modelo.
+    # Desligado com quantização no downlink: o cliente guardaria base + Q(diff) sob o
+    # hash exato da versão, e o erro da quantização se acumularia de um diff para outro
+    diffs: bool = True
+    history: int = 3  # Versões globais mantidas para os diffs
+    server_port: int = 5000
+    server_url: str = ''  # Vazio = http://orchestrator:<server_port>
+
+    def __post_init__(self):
+        if not self.server_url:
+            self.server_url = f'http://orchestrator:{self.server_port}'
+
+
+@dataclass
+class RoundConfig:
+    """Fim das rodadas síncronas"""
+    ENV_PREFIX = 'ROUND_'
+    # A rodada agrega assim que `quorum` clientes responderem (0 = todos) ou quando
+    # `deadline` segundos passarem (0 = sem prazo); os stragglers são cancelados
+    quorum: int = 0
+    deadline: float = 0.0
+
+
+@dataclass
+class FedBuffConfig:
+    """
+    Modo 'fedbuff': cada cliente recebe o modelo mais recente assim que termina e o
+    servidor dá um passo a cada `buffer_size` atualizações, ponderadas pela defasagem
+    """
+    ENV_PREFIX = 'FEDBUFF_'
+    buffer_size: int = 3
+    server_lr: float = 1.0
+    staleness_exponent: float = 0.5
+    server_steps: int = 0  # 0 = num_rounds
+
+
+@dataclass
+class ChannelConfig:
+    """Conexões persistentes e circuit breaker de cada cliente"""
+    ENV_PREFIX = 'CHANNEL_'
+    # Conexões keep-alive mantidas por cliente e timeout da abertura/sondagem das
+    # conexões antes de cada rodada
+    pool_size: int = 2
+    warmup_timeout: float = 2.0
+    # Após breaker_failure_threshold falhas seguidas o cliente fica fora por
+    # breaker_backoff segundos (dobrando a cada reabertura, até breaker_max_backoff)
+    # e depois é sondado antes de voltar a receber o /fit
+    breaker_failure_threshold: int = 3
+    breaker_backoff: float = 30.0
+    breaker_max_backoff: float = 300.0
+
+
+@dataclass
+class SamplingConfig:
+    """
+    Seleção dos clientes de cada rodada: 'all', 'uniform', 'stratified' (por número
+    de amostras) ou 'speed' (favorece RTT baixo); seleciona a fração `fraction` dos
+    clientes elegíveis, com no mínimo `min_clients`
+    """
+    ENV_PREFIX = 'SAMPLING_'
+    strategy: str = 'all'
+    fraction: float = 1.0
+    min_clients: int = 1
+    seed: Optional[int] = None
+
+
+@dataclass
+class TaskConfig:
+    """
+    Protocolo das tarefas: 'push' (o orquestrador chama o /fit de cada cliente),
+    'poll' (os clientes consultam GET /task no orquestrador e devolvem o resultado;
+    não precisam aceitar conexões) ou 'grpc' (cada cliente mantém um stream
+    bidirecional com o orquestrador). Os nomes da fila são os hosts dos endpoints
+    """
+    ENV_PREFIX = 'TASK_'
+    protocol: str = 'push'
+    server_port: int = 5001
+    poll_wait: float = 30.0
+    grpc_port: int = 50051
+    grpc_heartbeat_interval: float = 15.0
+    grpc_max_streams: int = 256  # Um stream (e uma thread) por cliente
+
+
+@dataclass
+class AdmissionConfig:
+    """
+    Orçamento de memória (MB) para as respostas sendo lidas e decodificadas ao mesmo
+    tempo (0 = sem limite); quem não cabe espera (push/grpc) ou recebe 429 (poll)
+    """
+    ENV_PREFIX = 'ADMISSION_'
+    budget_mb: float = 0.0
+    retry_after: int = 1
+
+
+@dataclass
+class AggregationConfig:
+    """
+    Regra de agregação: 'fedavg', 'median', 'trimmed_mean' (descarta trim_fraction de
+    cada ponta), 'krum' / 'multi_krum' (supõe até byzantine_clients maliciosos; o
+    Multi-Krum média as multi_krum_select melhores, 0 = n - f) ou 'norm_bounded'
+    (limita o delta de cada cliente a norm_bound, 0 = mediana das normas). As regras
+    robustas guardam as atualizações da rodada e processam blocos de block_mb; o
+    bloco limita só a memória de trabalho: as atualizações guardadas ocupam
+    clientes por rodada × parâmetros × 4 bytes
+    """
+    ENV_PREFIX = 'AGGREGATION_'
+    rule: str = 'fedavg'
+    trim_fraction: float = 0.1
+    byzantine_clients: int = 0
+    multi_krum_select: int = 0
+    norm_bound: float = 0.0
+    block_mb: float = 64.0
+    # Processos que reduzem fatias do vetor de parâmetros em paralelo, sobre memória
+    # compartilhada, nas regras robustas (1 = no próprio processo)
+    workers: int = 1
+
+    def __post_init__(self):
+        if self.rule not in AGGREGATION_RULES:
+            raise ValueError(f"Regra de agregação desconhecida: {self.rule}")
+
+    @property
+    def shards(self) -> int:
+        """Fatias da agregação (a FedAvg é somada ao chegar, no próprio processo)"""
+        return self.workers if self.rule != 'fedavg' else 1
+
+
+def _config_values(cls, lookup, prefix: str = '') -> dict:
+    """
+    Valores dos campos de `cls` (e das sub-configurações, com o ENV_PREFIX de
+    cada uma) encontrados por lookup(NOME); textos são convertidos para o tipo do
+    campo e booleanos são ligados com '1'. Nomes ausentes ficam com o padrão.
+    """
+    values = {}
+    for f in fields(cls):
+        if is_dataclass(f.type):
+            values[f.name] = f.type(**_config_values(f.type, lookup, f.type.ENV_PREFIX))
+            continue
+        raw = lookup(prefix + f.name.upper())
+        if isinstance(raw, str):
+            raw = raw.strip()
+            if not raw:
+                continue
+            kind = next((t for t in get_args(f.type) if t is not type(None)), f.type)
+            raw = raw == '1' if kind is bool else kind(raw)
+        if raw is not None:
+            values[f.name] = raw
+    return values
+
+
+@dataclass
+class TrainingConfig:
+    """
+    Configurações de uma sessão de treinamento, com uma sub-configuração por
+    recurso. Fora de código, cada campo tem um nome em maiúsculas com o prefixo
+    da sub-configuração (ex.: AGGREGATION_RULE, ROUND_QUORUM, TASK_PROTOCOL), lido
+    das variáveis de ambiente (from_env) ou das constantes de um módulo (from_module).
+    """
+    # Endpoints /fit dos clientes (ou agregadores de borda); no ambiente, separados
+    # por vírgula em CLIENT_ENDPOINTS ou um por linha em CLIENT_ENDPOINTS_FILE
+    client_endpoints: List[str] = field(default_factory=lambda: list(DEFAULT_CLIENT_ENDPOINTS))
+    num_rounds: int = 10
+    # 'sync': rodadas sincronizadas; 'fedbuff': treinamento assíncrono com buffer
+    training_mode: str = 'sync'
+    # Máximo de chamadas /fit simultâneas (uma thread de I/O por chamada em andamento)
+    max_concurrent_fits: int = 64
+    # Avalia o modelo global da rodada r em um worker enquanto a rodada r+1 já é
+    # despachada, tirando a avaliação (e a pausa entre rodadas) do caminho crítico
+    pipelined_evaluation: bool = False
+    # Prazo para os clientes reportarem prontidão em GET /health no início da sessão
+    startup_deadline: float = 120.0
+    encoding: EncodingConfig = field(default_factory=EncodingConfig)
+    model: ModelTransferConfig = field(default_factory=ModelTransferConfig)
+    round: RoundConfig = field(default_factory=RoundConfig)
+    fedbuff: FedBuffConfig = field(default_factory=FedBuffConfig)
+    channels: ChannelConfig = field(default_factory=ChannelConfig)
+    sampling: SamplingConfig = field(default_factory=SamplingConfig)
+    tasks: TaskConfig = field(default_factory=TaskConfig)
+    admission: AdmissionConfig = field(default_factory=AdmissionConfig)
+    aggregation: AggregationConfig = field(default_factory=AggregationConfig)
+
+    def __post_init__(self):
+        if self.tasks.protocol != 'push' and self.encoding.streaming:
+            print(f"⚠️  Streaming não é usado no modo {self.tasks.protocol}; as atualizações vão no formato normal.")
+            self.encoding.streaming = False
+        if self.encoding.downlink_quantization != 'none' and self.model.diffs:
+            print(f"⚠️  Diffs do modelo desligados com a quantização {self.encoding.downlink_quantization} no downlink.")
+            self.model.diffs = False
+
+    @classmethod
+    def from_env(cls, environ=os.environ) -> 'TrainingConfig':
+        """
+        Configuração a partir das variáveis de ambiente (ex.: AGGREGATION_RULE=median);
+        variáveis ausentes ou vazias ficam com o padrão.
+        """
+        endpoints = [endpoint.strip() for endpoint in environ.get('CLIENT_ENDPOINTS', '').split(',')]
+        if environ.get('CLIENT_ENDPOINTS_FILE'):
+            # Populações grandes: um endpoint /fit por linha
+            with open(environ['CLIENT_ENDPOINTS_FILE']) as f:
+                endpoints = [line.strip() for line in f]
+        values = _config_values(cls, lambda name: None if name == 'CLIENT_ENDPOINTS' else environ.get(name))
+        endpoints = [endpoint for endpoint in endpoints if endpoint]
+        if endpoints:
+            values['client_endpoints'] = endpoints
+        return cls(**values)
+
+    @classmethod
+    def from_module(cls, module) -> 'TrainingConfig':
+        """
+        Configuração a partir das constantes de um módulo, com os mesmos nomes das
+        variáveis de ambiente (ex.: node_failure_tests/config.py)
+        """
+        return cls(**_config_values(cls, lambda name: getattr(module, name, None)))
+
+    @property
+    def server_steps(self) -> int:
+        """Passos do servidor no modo FedBuff"""
+        return self.fedbuff.server_steps or self.num_rounds
+
+
+class ClientFailure(NamedTuple):
+    """Falha simulada de um cliente em uma rodada (ver FederatedTrainer.client_failure)"""
+    reason: str
+    kind: str  # 'timeout', 'slow' (responde depois de `delay` segundos) ou 'down'
+    delay: float = 0.0
+
+
+@dataclass
+class RoundStats:
+    """Contadores acumulados durante uma rodada (ou um passo do servidor no FedBuff)"""
+    start_time: float
+    deferred_before: int = 0  # Leituras adiadas pela admissão antes da rodada
+    failed: list = field(default_factory=list)
+    slow: list = field(default_factory=list)
+    response_times: list = field(default_factory=list)
+    contributions: dict = field(default_factory=dict)  # Índice do cliente -> amostras
+    samples: int = 0
+    bytes_sent: int = 0
+    bytes_received: int = 0
+    diff_sends: int = 0
+    timeouts: int = 0
+    discarded: int = 0  # Stragglers cancelados ou atualizações com a versão base fora do histórico
+
+    def fail(self, index: int, response_time: float = 0.0):
+        self.failed.append(index)
+        self.response_times.append(response_time)
+
+    def record_traffic(self, fit: FitResult):
+        self.bytes_sent += fit.bytes_sent
+        self.bytes_received += fit.bytes_received
+        self.diff_sends += fit.diff_sent
+
+    def record_samples(self, index: int, sample_count: int):
+        self.samples += sample_count
+        self.contributions[index] = self.contributions.get(index, 0) + sample_count
+
+
+def aggregation_executor(config: TrainingConfig):
+    """
+    Executor da agregação para a configuração (processos só nas regras robustas).
+    Os processos nascem por fork: crie-o antes de importar o TensorFlow.
+    """
+    return create_executor(config.aggregation.shards)
+
+
+def idle_clients(endpoints, channels: ChannelPool, dispatcher: AsyncDispatcher, excluded=()) -> list:
+    """
+    Índices dos clientes que podem ser chamados agora: fora de `excluded`
+    (ex.: arquitetura incompatível), sem chamada cancelada em andamento e com o
+    circuito fechado (ou com o backoff vencido)
+    """
+    busy = dispatcher.in_flight()
+    return [
+        i for i, endpoint in enumerate(endpoints)
+        if endpoint not in excluded and endpoint not in busy and channels.available(endpoint)
+    ]
+
+
+def release_arena(arena: UpdateArena, dispatcher: AsyncDispatcher, endpoint_index: dict):
+    """Libera os slots da arena, menos os dos stragglers que ainda estão lendo"""
+    arena.release_all(keep={endpoint_index[endpoint] for endpoint in dispatcher.in_flight()})
+
+
+def _delayed_fit(delay: float, *args) -> FitResult:
+    """fit_client precedido do atraso simulado de um cliente lento"""
+    if delay > 0:
+        time.sleep(delay)
+    return fit_client(*args)
+
+
+def _after_delay(delay: float, fn):
+    """Chamada adiada (ex.: nova tentativa depois do backoff do circuit breaker)"""
+    time.sleep(delay)
+    return fn()
+
+
+def _simulated_failure(delay: float, reason: str):
+    """Cliente fora do ar por `delay` segundos (modo FedBuff)"""
+    time.sleep(delay)
+    raise requests.exceptions.ConnectionError(f"Falha simulada: {reason}")
+
+
+class FederatedTrainer:
+    """
+    Executa sessões de treinamento com uma TrainingConfig. Canais, dispatcher,
+    estatísticas de RTT e servidores persistem entre sessões (run); modelo,
+    manifesto, arena e histórico de versões são recriados a cada uma.
+
+    `model_factory()` deve retornar um modelo Keras já compilado para a
+    avaliação em (x_test, y_test).
+    """
+
+    # Timeout adaptativo de cada cliente: avg_rtt + 4 * dev_rtt, dentro dos limites
+    MIN_TIMEOUT = 10
+    MAX_TIMEOUT = 180
+    ALPHA = 0.125  # Fator de ponderação para a média
+    BETA = 0.25  # Fator de ponderação para o desvio padrão
+
+    def __init__(self, config: TrainingConfig, model_factory, x_test, y_test, executor=None):
+        self.config = config
+        self.model_factory = model_factory
+        self.x_test = x_test
+        self.y_test = y_test
+        endpoints = config.client_endpoints
+        # Sessões persistentes e circuit breakers, um canal por cliente
+        self.channels = ChannelPool(
+            endpoints, config.channels.pool_size, config.channels.breaker_failure_threshold, config.channels.breaker_backoff,
+            config.channels.breaker_max_backoff, config.channels.warmup_timeout
+        )
+        self.dispatcher = AsyncDispatcher(config.max_concurrent_fits)
+        # Clientes de cada rodada; com seleção, a rodada (e a arena) escala com os
+        # selecionados e não com a população registrada
+        self.sampler = ClientSampler(config.sampling.strategy, config.sampling.fraction,
+                                     config.sampling.min_clients, seed=config.sampling.seed)
+        self.clients_per_round = self.sampler.clients_per_round(len(endpoints))
+        self.client_sample_counts = {}  # Índice -> amostras informadas pelo cliente
+        self.endpoint_index = {endpoint: i for i, endpoint in enumerate(endpoints)}
+        self.client_timing_stats = {endpoint: {"avg_rtt": 30.0, "dev_rtt": 5.0} for endpoint in endpoints}
+        # Processos da agregação fatiada, reaproveitados por todas as sessões; um
+        # executor recebido pronto (criado antes do TensorFlow) é de quem o criou
+        self._owns_executor = executor is None
+        self.executor = aggregation_executor(config) if executor is None else executor
+        self.task_server = None
+        self.model_server = None
+        self.admission = None
+        self.scenario_name = None  # Cenário registrado nas métricas das rodadas
+
+    # --- Pontos de extensão ---
+
+    def begin_round(self, step: int):
+        """Chamado no início de cada rodada (ou passo do servidor no FedBuff)"""
+
+    def client_failure(self, index: int, step: int) -> Optional[ClientFailure]:
+        """Falha simulada do cliente `index` nesta rodada (None = sem falha)"""
+        return None
+
+    def client_delay(self, index: int) -> float:
+        """Atraso simulado (s) antes do /fit do cliente `index`"""
+        return 0.0
+
+    def round_status(self):
+        """Estado capturado quando a rodada termina e repassado a finish_round"""
+        return None
+
+    def finish_round(self, record: dict, status, loss: float, accuracy: float, evaluation_time: float):
+        """Imprime o resultado de uma rodada quando a avaliação dela termina"""
+        if record['training_mode'] == 'fedbuff':
+            print(f"📊 RESULTADOS DO PASSO DO SERVIDOR {record['round_number']}:")
+        else:
+            print(f"📊 RESULTADOS DA RODADA {record['round_number']}:")
+        print(f"   • Acurácia: {accuracy:.4f} | Perda: {loss:.4f} | Avaliação: {evaluation_time:.2f}s")
+        print(f"   • Clientes responderam: {record['responding_clients']}/{record['total_clients']}")
+        print(f"   • Falhas: {len(record['failed_clients'])} | Timeouts: {record['timeout_count']}")
+        if record['response_times']:
+            print(f"   • Tempo médio resposta: {np.mean(record['response_times']):.2f}s")
+        print(f"   • Tráfego: {record['bytes_sent'] / 1e6:.2f} MB enviados | "
+              f"{record['bytes_received'] / 1e6:.2f} MB recebidos")
+        print(f"   • Serialização do modelo: {record['serialization_time'] * 1000:.1f}ms")
+        print(f"   • Compressão ({record['compression_codec']}): {record['compression_ratio']:.2f}x | "
+              f"CPU {record['compression_cpu_time']:.3f}s")
+        print(f"   • Diffs do modelo enviados: {record['downlink_diffs']}")
+        print(f"   • Descartados (stragglers ou versão base antiga): {record['late_discarded']}")
+        if record.get('circuit_open_clients'):
+            print(f"   • Circuitos abertos: {record['circuit_open_clients']}")
+        if record['admission_peak_mb']:
+            print(f"   • Admissão: {record['admission_deferred']} leituras adiadas | "
+                  f"pico reservado {record['admission_peak_mb']:.1f} MB")
+        if record.get('aggregation_rule', 'fedavg') != 'fedavg':
+            print(f"   • Regra {record['aggregation_rule']}: "
+                  f"{record['robust_excluded']} atualizações descartadas ou limitadas")
+        print(f"   • Pico de RSS: {record['peak_rss_mb']:.1f} MB")
+        if record['training_mode'] == 'fedbuff':
+            print(f"   • Defasagem: média {record['mean_staleness']:.2f} | máx. {record['max_staleness']}")
+
+    # --- Infraestrutura da sessão ---
+
+    def adaptive_timeout(self, endpoint: str) -> float:
+        """Timeout da próxima chamada: avg_rtt + 4 * dev_rtt, dentro dos limites"""
+        stats = self.client_timing_stats[endpoint]
+        return max(self.MIN_TIMEOUT, min(stats["avg_rtt"] + 4 * stats["dev_rtt"], self.MAX_TIMEOUT))
+
+    def update_timing(self, endpoint: str, response_time: float):
+        """Atualiza as estatísticas de RTT após uma chamada bem-sucedida"""
+        stats = self.client_timing_stats[endpoint]
+        delta = abs(response_time - stats["avg_rtt"])
+        stats["dev_rtt"] = (1 - self.BETA) * stats["dev_rtt"] + self.BETA * delta
+        stats["avg_rtt"] = (1 - self.ALPHA) * stats["avg_rtt"] + self.ALPHA * response_time
+
+    def select_clients(self, eligible, k: int = None) -> list:
+        """Índices dos clientes selecionados entre os elegíveis"""
+        eligible = list(eligible)
+        rtt_estimates = None
+        if self.sampler.strategy == 'speed':
+            endpoints = self.config.client_endpoints
+            rtt_estimates = {i: self.client_timing_stats[endpoints[i]]["avg_rtt"] for i in eligible}
+        return self.sampler.select(eligible, self.client_sample_counts, rtt_estimates, k)
+
+    def start_task_server(self):
+        """Publica a fila de tarefas (modos poll e grpc); o mesmo servidor atende todas as sessões"""
+        config = self.config
+        if self.task_server is not None:
+            return
+        # Transportes opcionais: importados só quando a sessão os usa (o gRPC nem
+        # precisa estar instalado no modo push)
+        if config.tasks.protocol == 'grpc':
+            from common.grpc_transport import GrpcTaskServer
+            self.task_server = GrpcTaskServer(
+                port=config.tasks.grpc_port, heartbeat_interval=config.tasks.grpc_heartbeat_interval,
+                max_streams=config.tasks.grpc_max_streams, max_body_bytes=config.encoding.max_decompressed_bytes
+            )
+        else:
+            from common.tasks import TaskServer
+            self.task_server = TaskServer(port=config.tasks.server_port, poll_wait=config.tasks.poll_wait,
+                                          max_body_bytes=config.encoding.max_decompressed_bytes)
+        self.task_server.start()
+
+    def wait_for_clients(self) -> list:
+        """
+        Espera os clientes carregarem dados e modelo (GET /health) ou, nos modos
+        poll e grpc, começarem a consultar a fila, até o prazo; com seleção, basta
+        ter clientes prontos para uma rodada
+        """
+        endpoints = self.config.client_endpoints
+        print(f"🩺 Aguardando a prontidão dos clientes (até {self.config.startup_deadline:.0f}s)...")
+        wait_start = time.time()
+        if self.task_server is not None:
+            ready = self.task_server.wait_for_clients(endpoints, self.config.startup_deadline,
+                                                      self.clients_per_round)
+        else:
+            ready = self.channels.wait_until_ready(endpoints, self.config.startup_deadline,
+                                                   min_ready=self.clients_per_round)
+        print(f"🩺 {len(ready)}/{len(endpoints)} clientes prontos em {time.time() - wait_start:.1f}s "
+              f"({self.config.sampling.strategy}: {self.clients_per_round} clientes por rodada)")
+        return ready
+
+    def handshake_manifests(self, manifest: ModelManifest):
+        """
+        Combina o manifesto com todos os clientes no início da sessão; com
+        seleção por rodada, cada cliente combina quando for selecionado
+        (fit_client), e nos modos poll e grpc o próprio cliente busca o manifesto.
+        Retorna: (clientes que combinaram, clientes com outra arquitetura)
+        """
+        manifest_clients, incompatible_clients = set(), set()
+        if self.task_server is not None:
+            self.task_server.manifest = manifest
+        eager = self.sampler.strategy == 'all' and self.task_server is None
+        for endpoint in (self.config.client_endpoints if eager else ()):
+            try:
+                handshake_manifest(endpoint, manifest, self.MIN_TIMEOUT, self.channels[endpoint])
+                manifest_clients.add(endpoint)
+            except ManifestMismatch as e:
+                print(f"❌ {endpoint} tem outra arquitetura e será ignorado. {e}")
+                incompatible_clients.add(endpoint)
+            except requests.exceptions.RequestException as e:
+                print(f"⚠️  Handshake com {endpoint} adiado para a primeira rodada. {e}")
+        print(f"🤝 Manifesto {manifest.manifest_id}: {len(manifest.layers)} camadas, "
+              f"{manifest.total_size} parâmetros")
+        return manifest_clients, incompatible_clients
+
+    def create_admission(self, manifest: ModelManifest):
+        """Controle de admissão da sessão (None sem orçamento de memória)"""
+        self.admission = None
+        if self.config.admission.budget_mb > 0:
+            self.admission = AdmissionController(int(self.config.admission.budget_mb * 1e6),
+                                                 manifest.total_size * 4)
+            print(f"Orçamento de memória das leituras: {self.config.admission.budget_mb:.0f} MB")
+        if self.task_server is not None:
+            self.task_server.admission = self.admission
+            self.task_server.retry_after = self.config.admission.retry_after
+
+    def admission_stats(self):
+        """(leituras adiadas até agora, pico de memória reservada em MB)"""
+        if self.admission is None:
+            return 0, 0.0
+        return self.admission.deferred, self.admission.peak / 1e6
+
+    def start_model_server(self, model_store: ModelVersionStore, encoding: DownlinkEncoding):
+        """Publica as versões do modelo em GET /model/<sha256> (modo pull)"""
+        from common.model_server import ModelServer, version_encoder
+        if self.model_server is not None:
+            self.model_server.stop()
+        self.model_server = ModelServer(
+            model_store, version_encoder(model_store, encoding), encoding.content_type, encoding.compression,
+            port=self.config.model.server_port, diffs=self.config.model.diffs
+        )
+        self.model_server.start()
+
+    def create_aggregator(self, global_weights):
+        """Agregador da rodada com a regra configurada (as atualizações entram ao chegar)"""
+        config = self.config
+        return make_aggregator(
+            config.aggregation.rule, global_weights, self.clients_per_round,
+            trim_fraction=config.aggregation.trim_fraction, byzantine=config.aggregation.byzantine_clients,
+            multi_krum_select=config.aggregation.multi_krum_select, norm_bound=config.aggregation.norm_bound,
+            block_bytes=int(config.aggregation.block_mb * 1024 * 1024), executor=self.executor
+        )
+
+    def close(self):
+        """Encerra os servidores, o dispatcher, os canais e os processos da agregação"""
+        for server in (self.model_server, self.task_server):
+            if server is not None:
+                server.stop()
+        self.model_server = self.task_server = None
+        self.dispatcher.shutdown()
+        self.channels.close()
+        if self._owns_executor:
+            self.executor.shutdown()
+
+    # --- Sessão de treinamento ---
+
+    def run(self):
+        """Executa uma sessão (rodadas síncronas ou passos do FedBuff) a partir de um modelo novo"""
+        config = self.config
+        print("--- Iniciando Treinamento Federado ---")
+        if config.tasks.protocol != 'push':
+            self.start_task_server()
+        self.wait_for_clients()
+
+        self.global_model = self.model_factory()
+        # No modo pipelined a avaliação usa um modelo próprio, já que o global segue
+        # sendo usado pela rodada seguinte
+        eval_model = self.model_factory() if config.pipelined_evaluation else self.global_model
+        self.evaluator = PipelinedEvaluator(eval_model, self.x_test, self.y_test, config.pipelined_evaluation)
+
+        # Versões recentes do modelo global e a última versão que cada cliente confirmou ter
+        self.model_store = ModelVersionStore(config.model.history)
+        self.client_model_versions = {}
+
+        # Handshake do manifesto, uma vez por sessão: a partir daí o modelo e as
+        # atualizações densas trafegam como um único buffer plano + manifest_id
+        self.manifest = ModelManifest.from_model(self.global_model)
+        self.manifest_clients, self.incompatible_clients = self.handshake_manifests(self.manifest)
+        self.downlink_encoding = config.encoding.downlink(self.manifest)
+
+        # Arena pré-alocada onde as respostas binárias são lidas e decodificadas sem
+        # cópia; reaproveitada em todas as rodadas. Cada slot só fica ocupado da
+        # leitura até a soma ao agregador, então basta um por chamada simultânea
+        self.arena = UpdateArena(self.manifest.layers, min(self.clients_per_round, config.max_concurrent_fits))
+        print(f"Arena de recepção: {self.arena.nbytes / 1e6:.2f} MB ({self.arena.num_slots} slots)")
+        self.create_admission(self.manifest)
+        if config.model.transfer == 'pull':
+            self.start_model_server(self.model_store, self.downlink_encoding)
+
+        try:
+            if config.training_mode == 'fedbuff':
+                self.run_fedbuff()
+            else:
+                for round_num in range(config.num_rounds):
+                    self.run_round(round_num)
+                print("\n--- Treinamento Federado Concluído ---")
+        finally:
+            self.evaluator.shutdown()
+
+    def _full_body(self, broadcast: RoundBroadcast, version: str) -> bytes:
+        """Corpo do /fit; no modo pull, só o hash e a configuração (o cliente baixa o modelo se não o tiver em cache)"""
+        if self.config.model.transfer == 'pull':
+            return broadcast.full_body(model_url=f"{self.config.model.server_url}/model/{version}")
+        return broadcast.full_body()
+
+    def _round_context(self, broadcast, full_body, headers, global_weights, fit_config,
+                       streaming: bool = False, aggregator=None) -> RoundContext:
+        config = self.config
+        return RoundContext(
+            broadcast, full_body, headers, global_weights, fit_config, self.manifest, self.arena,
+            config.encoding.max_decompressed_bytes, streaming, aggregator,
+            use_diffs=config.model.diffs and config.model.transfer == 'push',
+            manifest_clients=self.manifest_clients, channels=self.channels, tasks=self.task_server,
+            admission=self.admission
+        )
+
+    def _dispatch_failed(self, dispatch, stats: RoundStats) -> bool:
+        """Registra o erro de uma chamada; retorna False se ela foi bem-sucedida"""
+        i, endpoint = dispatch.index, dispatch.endpoint
+        if isinstance(dispatch.error, ManifestMismatch):
+            print(f"❌ Cliente {i+1} tem outra arquitetura e será ignorado. {dispatch.error}")
+            self.incompatible_clients.add(endpoint)
+            stats.fail(i)
+            return True
+        if isinstance(dispatch.error, requests.exceptions.Timeout):
+            print(f"⏰ TIMEOUT: Cliente {i+1} não respondeu no tempo limite")
+            stats.timeouts += 1
+            stats.fail(i, dispatch.timeout)
+            return True
+        if dispatch.error is not None:
+            print(f"❌ ERRO: Não foi possível contatar o cliente {i+1}. {dispatch.error}")
+            stats.fail(i, dispatch.elapsed)
+            return True
+        return False
+
+    def _round_record(self, round_number: int, stats: RoundStats, broadcast: RoundBroadcast,
+                      aggregation_time: float, **extra) -> dict:
+        """Registro da rodada com os campos de RoundMetrics (perda e acurácia entram depois da avaliação)"""
+        config = self.config
+        deferred, peak_mb = self.admission_stats()
+        return dict(
+            round_number=round_number,
+            scenario_name=self.scenario_name,
+            total_clients=len(config.client_endpoints),
+            responding_clients=len(stats.contributions),
+            failed_clients=stats.failed,
+            slow_clients=stats.slow,
+            response_times=stats.response_times,
+            timeout_count=stats.timeouts,
+            aggregation_time=aggregation_time,
+            total_samples=stats.samples,
+            client_contributions=stats.contributions,
+            bytes_sent=stats.bytes_sent,
+            bytes_received=stats.bytes_received,
+            quantization_mode=f"{config.encoding.downlink_quantization}/{config.encoding.uplink_quantization}",
+            compression_codec=config.encoding.compression,
+            compression_ratio=broadcast.compression_stats.ratio,
+            compression_cpu_time=broadcast.compression_stats.cpu_time,
+            serialization_time=broadcast.serialization_time,
+            downlink_diffs=stats.diff_sends,
+            peak_rss_mb=resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+            late_discarded=stats.discarded,
+            admission_deferred=deferred - stats.deferred_before,
+            admission_peak_mb=peak_mb,
+            training_mode=config.training_mode,
+            **extra
+        )
+
+    def run_round(self, round_num: int):
+        """Uma rodada síncrona: broadcast, fan-out do /fit, agregação e avaliação"""
+        config = self.config
+        endpoints = config.client_endpoints
+        print(f"\n--- RODADA {round_num + 1}/{config.num_rounds} ---")
+        stats = RoundStats(time.time(), self.admission_stats()[0])
+        self.begin_round(round_num)
+
+        global_weights = self.global_model.get_weights()
+        model_version = self.model_store.add(global_weights)
+        fit_config = config.encoding.fit_config(model_version)
+        # Estágio de broadcast: cada variante do modelo é codificada uma única vez
+        # e o mesmo buffer é reaproveitado em todos os envios e reenvios da rodada
+        broadcast = RoundBroadcast(self.downlink_encoding, self.model_store, model_version, fit_config)
+        # Cada atualização entra no agregador assim que chega e o buffer dela é liberado
+        aggregator = self.create_aggregator(global_weights)
+        if config.encoding.streaming:
+            # As camadas são geradas sob demanda para cada cliente
+            full_body = None
+            headers = {'Content-Type': CONTENT_TYPE_STREAM, 'Accept': CONTENT_TYPE_STREAM}
+        else:
+            full_body = self._full_body(broadcast, model_version)
+            headers = {**request_headers(config.encoding.content_type), **encoding_headers(config.encoding.compression)}
+        context = self._round_context(
+            broadcast, full_body, headers, global_weights, fit_config, config.encoding.streaming, aggregator
+        )
+
+        # Elegíveis: compatíveis, sem chamada cancelada em andamento e com o circuito
+        # fechado (ou com o backoff vencido); só os selecionados são contatados
+        circuit_open = {endpoint for endpoint in endpoints if not self.channels.available(endpoint)}
+        busy = self.dispatcher.in_flight()
+        selected = set(self.select_clients(idle_clients(
+            endpoints, self.channels, self.dispatcher, self.incompatible_clients
+        )))
+        if self.sampler.strategy != 'all':
+            print(f"🎯 {len(selected)} clientes selecionados ({self.sampler.strategy})")
+        # Conexões dos selecionados abertas (ou sondadas) em paralelo antes do envio;
+        # nos modos poll e grpc, basta o cliente estar consultando a fila
+        candidates = [endpoints[i] for i in sorted(selected)]
+        if self.task_server is not None:
+            reachable = set(self.task_server.connected(candidates))
+        else:
+            reachable = set(self.channels.warm_up(candidates))
+
+        # Monta as chamadas da rodada; todas são disparadas ao mesmo tempo, cada uma
+        # com o timeout adaptativo do seu cliente. Sem seleção, os clientes fora da
+        # rodada (circuito aberto, incompatíveis ou ocupados) contam como falhas
+        jobs = []
+        simulated_slow = {}  # Índice -> atraso dos clientes com resposta lenta simulada
+        for i, endpoint in enumerate(endpoints):
+            if i not in selected and self.sampler.strategy != 'all':
+                continue  # Fora da amostra desta rodada
+
+            failure = self.client_failure(i, round_num)
+            if failure is not None:
+                print(f"💥 Cliente {i+1} simulando falha: {failure.reason}")
+                if failure.kind == 'timeout':
+                    stats.timeouts += 1
+                    stats.fail(i, self.MAX_TIMEOUT)
+                elif failure.kind == 'slow':
+                    # Simula a resposta lenta sem bloquear os demais clientes
+                    stats.failed.append(i)
+                    stats.slow.append(i)
+                    simulated_slow[i] = failure.delay
+                    jobs.append((i, endpoint, failure.delay, partial(time.sleep, failure.delay)))
+                else:
+                    stats.fail(i)  # Falha imediata
+                continue
+
+            if endpoint in self.incompatible_clients or endpoint in busy or endpoint not in reachable:
+                if endpoint in circuit_open:
+                    print(f"🔌 Cliente {i+1} com o circuito aberto "
+                          f"(nova sondagem em {self.channels.retry_after(endpoint):.0f}s)")
+                elif i in selected and self.task_server is not None:
+                    print(f"🔌 Cliente {i+1} não está consultando a fila de tarefas")
+                elif i in selected:
+                    print(f"🔌 Cliente {i+1} não respondeu ao warm-up")
+                stats.fail(i)
+                continue
+
+            delay = self.client_delay(i)
+            if delay > 0:
+                print(f"🐌 Cliente {i+1} com resposta lenta (+{delay:.1f}s)")
+                stats.slow.append(i)
+            timeout = self.adaptive_timeout(endpoint)
+            print(f"📤 Enviando modelo para o cliente {i+1} ({endpoint})...")
+            jobs.append((i, endpoint, timeout, partial(self.channels.call, endpoint, partial(
+                _delayed_fit, delay, context, i, endpoint, self.client_model_versions.get(endpoint), timeout
+            ))))
+
+        def on_complete(dispatch):
+            i, endpoint = dispatch.index, dispatch.endpoint
+            if i in simulated_slow:
+                stats.response_times.append(simulated_slow[i] + 5.0)  # Tempo base + atraso
+                return
+            if self._dispatch_failed(dispatch, stats):
+                return
+            fit = dispatch.result
+            stats.response_times.append(dispatch.elapsed)
+            self.update_timing(endpoint, dispatch.elapsed)
+            stats.record_traffic(fit)
+            stats.record_samples(i, fit.sample_count)
+            broadcast.compression_stats.record(fit.uncompressed_bytes, fit.bytes_received, fit.cpu_time)
+            self.client_model_versions[endpoint] = fit.metadata.get('model_version')
+            self.client_sample_counts[i] = fit.sample_count
+            print(f"✅ Cliente {i+1} respondeu com sucesso ({dispatch.elapsed:.2f}s)")
+
+        stragglers = self.dispatcher.run(
+            jobs, on_complete, config.round.quorum or None, config.round.deadline or None
+        )
+        # As threads dos stragglers continuam rodando: a partir daqui o agregador
+        # recusa o que elas tentarem somar
+        aggregator.seal()
+        for dispatch in stragglers:
+            i = dispatch.index
+            stats.response_times.append(time.time() - stats.start_time)
+            if i in aggregator.clients:
+                # Somada entre o quórum/prazo e o seal: já está na média
+                print(f"✅ Cliente {i+1} respondeu no limite do quórum/prazo")
+                stats.record_samples(i, aggregator.clients[i])
+                continue
+            print(f"✂️  Cliente {i+1} cancelado (quórum/prazo); resposta tardia será descartada")
+            if i not in simulated_slow:
+                stats.failed.append(i)
+            stats.discarded += 1
+
+        aggregation_start_time = time.time()
+        if not aggregator.total_samples:
+            print("⚠️  Nenhum cliente respondeu. Pulando a agregação.")
+            aggregator.close()
+            new_weights = global_weights
+        else:
+            # Na FedAvg as atualizações já foram somadas (ponderadas pelo número de amostras)
+            # ao chegar; as regras robustas processam agora as atualizações guardadas
+            print(f"🔄 Agregando pesos de {len(stats.contributions)} clientes...")
+            new_weights = aggregator.result()
+            if config.aggregation.rule != 'fedavg':
+                print(f"🛡️  Regra {config.aggregation.rule}: {aggregator.summary()}")
+            self.global_model.set_weights(new_weights)
+            print("✅ Modelo global atualizado")
+        release_arena(self.arena, self.dispatcher, self.endpoint_index)
+        aggregation_time = time.time() - aggregation_start_time
+
+        record = self._round_record(
+            round_num + 1, stats, broadcast, aggregation_time,
+            selected_clients=len(selected),
+            quorum=config.round.quorum,
+            deadline=config.round.deadline,
+            circuit_open_clients=len(circuit_open),
+            aggregation_rule=config.aggregation.rule,
+            robust_excluded=getattr(aggregator, 'excluded', 0)
+        )
+        # Avalia o novo modelo global (no modo pipelined, durante a próxima rodada)
+        self.evaluator.submit(new_weights, partial(self.finish_round, record, self.round_status()))
+
+    def run_fedbuff(self):
+        """
+        Treinamento assíncrono (FedBuff): cada cliente é chamado de novo assim que
+        responde, sempre com a versão mais recente do modelo global, e o servidor
+        aplica um passo a cada fedbuff_buffer_size atualizações; cada passo é
+        registrado como uma rodada. Com seleção de clientes, ficam em treino ao
+        mesmo tempo tantos clientes quanto numa rodada, e cada um que termina cede
+        a vez a um novo cliente sorteado.
+        """
+        config = self.config
+        endpoints = config.client_endpoints
+        steps = config.server_steps
+        print(f"⚡ Modo FedBuff: buffer de {config.fedbuff.buffer_size} atualizações, "
+              f"{steps} passos do servidor")
+        if config.encoding.streaming:
+            print("⚠️  Streaming não é usado no modo FedBuff; as atualizações vão no formato normal.")
+        if config.aggregation.rule != 'fedavg':
+            print(f"⚠️  A regra {config.aggregation.rule} não é usada no modo FedBuff; "
+                  f"o buffer faz a média ponderada.")
+        server = FedBuffServer(
+            self.global_model.get_weights(), config.fedbuff.buffer_size, config.fedbuff.server_lr,
+            config.fedbuff.staleness_exponent
+        )
+        headers = {**request_headers(config.encoding.content_type), **encoding_headers(config.encoding.compression)}
+        version_steps = {}  # Versão do modelo global -> passo do servidor em que foi publicada
+        state = {}
+
+        def publish():
+            """Registra a versão atual do modelo global e prepara o corpo enviado aos clientes"""
+            version = self.model_store.add(server.global_weights)
+            version_steps[version] = server.step
+            fit_config = config.encoding.fit_config(version)
+            broadcast = RoundBroadcast(self.downlink_encoding, self.model_store, version, fit_config)
+            state["broadcast"] = broadcast
+            state["context"] = self._round_context(
+                broadcast, self._full_body(broadcast, version), headers, self.model_store.get(version), fit_config
+            )
+
+        def new_step():
+            """Zera as métricas acumuladas até o próximo passo do servidor"""
+            self.begin_round(server.step)
+            state["stats"] = RoundStats(time.time(), self.admission_stats()[0])
+
+        def next_job(i, delay=0.0):
+            """Próxima chamada de um cliente, com o modelo publicado mais recente"""
+            endpoint = endpoints[i]
+            failure = self.client_failure(i, server.step)
+            if failure is not None:
+                # O cliente fica fora por um tempo e depois volta a ser chamado
+                print(f"💥 Cliente {i+1} simulando falha: {failure.reason}")
+                delay = failure.delay or self.MIN_TIMEOUT
+                return (i, endpoint, delay, partial(_simulated_failure, delay, failure.reason))
+            extra_delay = self.client_delay(i)
+            if extra_delay > 0:
+                state["stats"].slow.append(i)
+            timeout = self.adaptive_timeout(endpoint)
+            # Sem warm-up por rodada: um cliente com o circuito aberto é sondado antes do /fit
+            # (nos modos poll e grpc não há como sondá-lo; a tarefa fica na fila até o timeout)
+            call = partial(self.channels.call, endpoint, partial(
+                _delayed_fit, extra_delay, state["context"], i, endpoint,
+                self.client_model_versions.get(endpoint), timeout
+            ), probe=self.task_server is None)
+            if delay:
+                # Cliente com erro: tenta de novo depois de uma pausa, sem ocupar o laço
+                call = partial(_after_delay, delay, call)
+            return (i, endpoint, timeout, call)
+
+        def replacement(i):
+            """Quem treina em seguida no lugar do cliente `i` (ele mesmo, sem seleção)"""
+            if self.sampler.strategy == 'all':
+                return i
+            chosen = self.select_clients(idle_clients(
+                endpoints, self.channels, self.dispatcher, self.incompatible_clients
+            ), k=1)
+            return chosen[0] if chosen else i
+
+        def on_complete(dispatch):
+            i, endpoint = dispatch.index, dispatch.endpoint
+            stats = state["stats"]
+            if server.step >= steps:
+                return None
+            if self._dispatch_failed(dispatch, stats):
+                if endpoint in self.incompatible_clients:
+                    return None
+                j = replacement(i)
+                if j != i:
+                    return [next_job(j)]
+                # Com o circuito aberto, espera o backoff antes de sondar de novo
+                return [next_job(i, self.channels.retry_after(endpoint) or dispatch.timeout)]
+
+            fit = dispatch.result
+            stats.response_times.append(dispatch.elapsed)
+            self.update_timing(endpoint, dispatch.elapsed)
+            stats.record_traffic(fit)
+            state["broadcast"].compression_stats.record(fit.uncompressed_bytes, fit.bytes_received, fit.cpu_time)
+            version = fit.metadata.get('model_version')
+            self.client_model_versions[endpoint] = version
+            self.client_sample_counts[i] = fit.sample_count
+            base_step = version_steps.get(version)
+            try:
+                added = base_step is not None and server.add(
+                    fit.update, fit.sample_count, base_step, self.model_store.get(version)
+                )
+            except PayloadError as e:
+                print(f"🗑️  Atualização do cliente {i+1} descartada (malformada): {e}")
+                added = None
+            finally:
+                self.arena.release(i)  # A atualização já foi somada ao buffer (ou descartada)
+            if added is None:
+                stats.failed.append(i)
+            elif not added:
+                # Versão base desconhecida ou já fora do histórico
+                print(f"🗑️  Atualização do cliente {i+1} descartada (versão base indisponível)")
+                stats.discarded += 1
+            else:
+                stats.record_samples(i, fit.sample_count)
+                print(f"✅ Cliente {i+1} respondeu ({dispatch.elapsed:.2f}s, defasagem {server.step - base_step})")
+
+            if server.ready():
+                aggregation_start_time = time.time()
+                staleness = server.apply()
+                self.global_model.set_weights(server.global_weights)
+                record = self._round_record(
+                    server.step, stats, state["broadcast"], time.time() - aggregation_start_time,
+                    selected_clients=self.clients_per_round,
+                    mean_staleness=float(np.mean(staleness)),
+                    max_staleness=int(max(staleness))
+                )
+                print(f"⚡ PASSO DO SERVIDOR {server.step}/{steps} ({time.time() - stats.start_time:.2f}s)")
+                self.evaluator.submit(server.global_weights, partial(self.finish_round, record, self.round_status()))
+                if server.step >= steps:
+                    return None
+                publish()
+                new_step()
+            return [next_job(replacement(i))]
+
+        publish()
+        new_step()
+        jobs = [next_job(i) for i in self.select_clients(
+            i for i, endpoint in enumerate(endpoints) if endpoint not in self.incompatible_clients
+        )]
+        self.dispatcher.run(jobs, on_complete)
+        print("\n--- Treinamento Federado Assíncrono Concluído ---")
@@ -0,0 +1,378 @@
+# edge-aggregator/edge_app.py
+
+"""
+Agregador de borda: um nível intermediário entre o orquestrador e um
+subconjunto dos clientes.
+
+Para o orquestrador, a borda é um cliente como outro qualquer (GET /health,
+POST /manifest e POST /fit). A cada /fit ela repassa o modelo global aos
+seus clientes com o mesmo código de rodada do orquestrador (RoundBroadcast,
+fit_client, AsyncDispatcher) e soma as atualizações na StreamingAverage
+assim que chegam. A resposta é uma única atualização densa: a média
+ponderada dos clientes, com sample_count igual ao total de amostras, o que
+equivale a enviar a soma ponderada e o total. Como a FedAvg do orquestrador
+pondera cada resposta por sample_count, o resultado global é o mesmo de
+falar direto com os clientes, mas o fan-in, o tráfego e a CPU da raiz passam
+a crescer com o número de bordas e não com o de clientes.
+"""
+
+from flask import Flask, request, jsonify, Response
+from werkzeug.exceptions import RequestEntityTooLarge
+from werkzeug.serving import WSGIRequestHandler
+from collections import OrderedDict
+from functools import partial
+import requests
+import numpy as np
+from common.aggregation import StreamingAverage
+from common.arena import UpdateArena
+from common.broadcast import DownlinkEncoding, RoundBroadcast
+from common.channel import ChannelPool
+from common.dispatch import AsyncDispatcher, RoundContext, fit_client
+from common.model_store import ModelVersionStore
+from common.training import idle_clients, release_arena
+from common.serialization import (
+    decode_payload, encode_payload, negotiate_content_type, request_headers, PayloadError,
+    CONTENT_TYPE_BINARY
+)
+from common.streaming import CONTENT_TYPE_STREAM
+from common.manifest import ModelManifest, ManifestMismatch, expand_flat_payload, flatten_payload
+from common.quantization import quantize, dequantize
+from common.compression import (
+    available_codecs, compress, decompress, encoding_headers, max_wire_bytes, negotiate_encoding,
+    read_response_body, CompressionError, DEFAULT_MAX_DECOMPRESSED_BYTES, IDENTITY
+)
+import os
+import threading
+import time
+import traceback
+
+
+app = Flask(__name__)
+
+EDGE_NAME = os.environ.get('EDGE_NAME', 'edge-1')
+# Clientes atendidos por esta borda: endpoints /fit separados por vírgula
+EDGE_CLIENT_ENDPOINTS = [
+    endpoint.strip() for endpoint in os.environ.get('EDGE_CLIENT_ENDPOINTS', '').split(',') if endpoint.strip()
+]
+# Populações grandes: um endpoint /fit por linha
+EDGE_CLIENT_ENDPOINTS_FILE = os.environ.get('EDGE_CLIENT_ENDPOINTS_FILE')
+if EDGE_CLIENT_ENDPOINTS_FILE:
+    with open(EDGE_CLIENT_ENDPOINTS_FILE) as f:
+        EDGE_CLIENT_ENDPOINTS = [line.strip() for line in f if line.strip()]
+# A borda só se declara pronta (GET /health) com este número de clientes prontos
+EDGE_MIN_CLIENTS = int(os.environ.get('EDGE_MIN_CLIENTS', '1'))
+# Quórum e prazo da rodada da borda (0 = esperar todos / sem prazo); o prazo
+# deve ficar abaixo do timeout do orquestrador para a borda
+EDGE_ROUND_QUORUM = int(os.environ.get('EDGE_ROUND_QUORUM', '0'))
+EDGE_ROUND_DEADLINE = float(os.environ.get('EDGE_ROUND_DEADLINE', '0'))
+# Timeout de cada /fit repassado a um cliente
+CLIENT_TIMEOUT = float(os.environ.get('CLIENT_TIMEOUT', '120'))
+MAX_CONCURRENT_FITS = int(os.environ.get('MAX_CONCURRENT_FITS', '64'))
+# Limite para o tamanho descomprimido dos payloads recebidos (da raiz e dos clientes)
+MAX_DECOMPRESSED_BYTES = int(os.environ.get('MAX_DECOMPRESSED_BYTES', DEFAULT_MAX_DECOMPRESSED_BYTES))
+# O corpo na rede também é limitado: o Flask recusa (413) um Content-Length maior
+app.config['MAX_CONTENT_LENGTH'] = max_wire_bytes(MAX_DECOMPRESSED_BYTES)
+# Versões do modelo global mantidas para os diffs (recebidos da raiz e enviados aos clientes)
+MODEL_HISTORY = int(os.environ.get('MODEL_HISTORY', '3'))
+# Quantização do modelo repassado aos clientes ('none', 'fp16' ou 'int8')
+DOWNLINK_QUANTIZATION = os.environ.get('DOWNLINK_QUANTIZATION', 'none')
+# Diffs só sem quantização: o cliente guarda base + Q(diff) sob o hash exato da versão
+DOWNLINK_DIFFS = os.environ.get('DOWNLINK_DIFFS', '1') == '1' and DOWNLINK_QUANTIZATION == 'none'
+MODEL_FETCH_TIMEOUT = float(os.environ.get('MODEL_FETCH_TIMEOUT', '60'))
+# Codecs aceitos no download do modelo (modo pull), em ordem de preferência
+MODEL_ACCEPT_ENCODING = ', '.join(available_codecs() + [IDENTITY])
+STARTUP_DEADLINE = float(os.environ.get('STARTUP_DEADLINE', '120'))
+CHANNEL_POOL_SIZE = int(os.environ.get('CHANNEL_POOL_SIZE', '2'))
+WARMUP_TIMEOUT = float(os.environ.get('WARMUP_TIMEOUT', '2'))
+BREAKER_FAILURE_THRESHOLD = int(os.environ.get('BREAKER_FAILURE_THRESHOLD', '3'))
+BREAKER_BACKOFF = float(os.environ.get('BREAKER_BACKOFF', '30'))
+BREAKER_MAX_BACKOFF = float(os.environ.get('BREAKER_MAX_BACKOFF', '300'))
+
+# Configuração da rodada repassada aos clientes (o model_version é o da borda)
+FORWARDED_CONFIG = ('update_mode', 'density', 'uplink_quantization', 'stochastic_rounding', 'compression_level')
+
+# Sessões persistentes e circuit breakers, um canal por cliente da borda
+channels = ChannelPool(
+    EDGE_CLIENT_ENDPOINTS, CHANNEL_POOL_SIZE, BREAKER_FAILURE_THRESHOLD, BREAKER_BACKOFF,
+    BREAKER_MAX_BACKOFF, WARMUP_TIMEOUT
+)
+dispatcher = AsyncDispatcher(MAX_CONCURRENT_FITS)
+endpoint_index = {endpoint: i for i, endpoint in enumerate(EDGE_CLIENT_ENDPOINTS)}
+
+# Versões recentes do modelo global (repassadas aos clientes) e, para cada
+# versão da raiz, a versão correspondente guardada aqui (diferem se a raiz
+# quantizar o downlink); a última versão da raiz é a base dos diffs recebidos
+model_store = ModelVersionStore(MODEL_HISTORY)
+root_versions = OrderedDict()
+current_model = {"version": None}
+client_model_versions = {}
+incompatible_clients = set()
+# Sessão persistente (keep-alive) para baixar o modelo do orquestrador no modo pull
+model_server_session = requests.Session()
+
+# Manifesto combinado com o orquestrador; os clientes o combinam com a borda
+# na primeira rodada (fit_client). A arena depende dos shapes do manifesto
+session = {"manifest": None, "arena": None, "manifest_clients": set()}
+
+# Prontidão reportada em GET /health: clientes suficientes prontos
+readiness = {"clients": False}
+
+# Uma rodada por vez: a arena e o histórico são compartilhados
+round_lock = threading.Lock()
+
+
+class BaseVersionMissing(Exception):
+    """Diff recebido para uma versão base que não está no histórico da borda"""
+
+
+def load_global_model(metadata, weights):
+    """Dequantiza, aplica o diff (se houver) e guarda a versão da raiz no histórico"""
+    weights = expand_flat_payload(metadata, weights, session["manifest"])
+    weights = dequantize(weights, metadata.get('quantization'))
+
+    base_version = metadata.get('base_version')
+    if base_version is not None:
+        base = model_store.get(root_versions.get(base_version))
+        if base is None:
+            raise BaseVersionMissing(base_version)
+        weights = [b + diff for b, diff in zip(base, weights)]
+
+    weights = [np.asarray(w, dtype=np.float32) for w in weights]
+    remember_version(metadata.get('model_version'), model_store.add(weights))
+    return weights
+
+
+def remember_version(root_version, version):
+    current_model["version"] = root_version
+    if root_version is not None:
+        root_versions[root_version] = version
+        root_versions.move_to_end(root_version)
+        while len(root_versions) > MODEL_HISTORY:
+            root_versions.popitem(last=False)
+
+
+def fetch_global_model(model_url, version):
+    """Baixa do orquestrador uma versão que não está no histórico (diff, se possível)"""
+    params = {'base': current_model["version"]} if current_model["version"] in root_versions else None
+    response = model_server_session.get(
+        model_url,
+        params=params,
+        headers={**request_headers(CONTENT_TYPE_BINARY), 'Accept-Encoding': MODEL_ACCEPT_ENCODING},
+        timeout=MODEL_FETCH_TIMEOUT,
+        stream=True
+    )
+    response.raise_for_status()
+    body, wire_size, _ = read_response_body(response, MAX_DECOMPRESSED_BYTES)
+    metadata, weights = decode_payload(body, response.headers.get('Content-Type'))
+    if metadata.get('model_version') != version:
+        raise PayloadError(f"Modelo recebido não corresponde à versão {version}")
+    print(f"Borda {EDGE_NAME}: modelo {version[:12]} baixado ({wire_size / 1e6:.2f} MB)")
+    return load_global_model(metadata, weights)
+
+
+def run_edge_round(global_weights, config, content_type, compression):
+    """
+    Repassa o modelo aos clientes da borda e soma as atualizações que chegarem.
+    Retorna: (novos pesos, total de amostras, clientes que responderam), ou
+    None se nenhum cliente respondeu
+    """
+    version = model_store.add(global_weights)
+    fit_config = {key: config[key] for key in FORWARDED_CONFIG if key in config}
+    fit_config['model_version'] = version
+
+    # O modelo vai aos clientes no formato e na compressão usados pela raiz
+    encoding = DownlinkEncoding(
+        content_type, DOWNLINK_QUANTIZATION, config.get('stochastic_rounding', False), compression,
+        config.get('compression_level'), session["manifest"]
+    )
+    broadcast = RoundBroadcast(encoding, model_store, version, fit_config)
+    aggregator = StreamingAverage(global_weights)
+    context = RoundContext(
+        broadcast, broadcast.full_body(), {**request_headers(content_type), **encoding_headers(compression)},
+        global_weights, fit_config, session["manifest"], session["arena"], MAX_DECOMPRESSED_BYTES,
+        aggregator=aggregator, use_diffs=DOWNLINK_DIFFS, manifest_clients=session["manifest_clients"],
+        channels=channels
+    )
+
+    candidates = [
+        EDGE_CLIENT_ENDPOINTS[i]
+        for i in idle_clients(EDGE_CLIENT_ENDPOINTS, channels, dispatcher, incompatible_clients)
+    ]
+    jobs = []
+    for endpoint in channels.warm_up(candidates):
+        i = endpoint_index[endpoint]
+        jobs.append((i, endpoint, CLIENT_TIMEOUT, partial(channels.call, endpoint, partial(
+            fit_client, context, i, endpoint, client_model_versions.get(endpoint), CLIENT_TIMEOUT
+        ))))
+
+    round_stats = {"bytes_sent": 0, "bytes_received": 0}
+
+    def on_complete(dispatch):
+        i, endpoint = dispatch.index, dispatch.endpoint
+        if isinstance(dispatch.error, ManifestMismatch):
+            print(f"Borda {EDGE_NAME}: cliente {i+1} tem outra arquitetura e será ignorado. {dispatch.error}")
+            incompatible_clients.add(endpoint)
+            return
+        if dispatch.error is not None:
+            print(f"Borda {EDGE_NAME}: não foi possível contatar o cliente {i+1}. {dispatch.error}")
+            return
+        fit = dispatch.result
+        client_model_versions[endpoint] = fit.metadata.get('model_version')
+        round_stats["bytes_sent"] += fit.bytes_sent
+        round_stats["bytes_received"] += fit.bytes_received
+
+    start_time = time.time()
+    stragglers = dispatcher.run(jobs, on_complete, EDGE_ROUND_QUORUM or None, EDGE_ROUND_DEADLINE or None)
+    # As threads dos stragglers continuam rodando; o que tentarem somar daqui em diante é recusado
+    aggregator.seal()
+    discarded = sum(1 for dispatch in stragglers if dispatch.index not in aggregator.clients)
+    print(f"Borda {EDGE_NAME}: {len(aggregator.clients)}/{len(jobs)} clientes em {time.time() - start_time:.2f}s, "
+          f"{discarded} stragglers descartados, {round_stats['bytes_sent'] / 1e6:.2f} MB enviados, "
+          f"{round_stats['bytes_received'] / 1e6:.2f} MB recebidos")
+
+    if not aggregator.total_samples:
+        aggregator.close()
+        release_arena(session["arena"], dispatcher, endpoint_index)
+        return None
+    new_weights = aggregator.result()
+    release_arena(session["arena"], dispatcher, endpoint_index)
+    return new_weights, aggregator.total_samples, len(aggregator.clients)
+
+
+def wait_for_clients():
+    """Espera (GET /health) até EDGE_MIN_CLIENTS clientes da borda estarem prontos"""
+    while True:
+        start_time = time.time()
+        ready = channels.wait_until_ready(EDGE_CLIENT_ENDPOINTS, STARTUP_DEADLINE, min_ready=EDGE_MIN_CLIENTS)
+        print(f"Borda {EDGE_NAME}: {len(ready)}/{len(EDGE_CLIENT_ENDPOINTS)} clientes prontos "
+              f"em {time.time() - start_time:.1f}s")
+        if len(ready) >= EDGE_MIN_CLIENTS:
+            readiness["clients"] = True
+            return
+
+
+@app.route('/health', methods=['GET'])
+def health():
+    """Prontidão da borda: 200 quando há clientes prontos, 503 enquanto espera"""
+    ready = all(readiness.values())
+    body = {"ready": ready, "edge": EDGE_NAME, "clients": len(EDGE_CLIENT_ENDPOINTS), **readiness}
+    return jsonify(body), 200 if ready else 503
+
+
+@app.route('/manifest', methods=['POST'])
+def negotiate_manifest():
+    """
+    Handshake do manifesto com a raiz. A borda não tem modelo próprio: aceita
+    o manifesto e o repassa aos seus clientes, que recusam uma arquitetura diferente.
+    """
+    try:
+        remote = ModelManifest.from_dict(request.get_json(force=True))
+    except ManifestMismatch as e:
+        return jsonify({"error": str(e)}), 400
+
+    with round_lock:
+        manifest = session["manifest"]
+        if manifest is None or manifest.manifest_id != remote.manifest_id:
+            session["manifest"] = remote
+            slots = max(1, min(len(EDGE_CLIENT_ENDPOINTS), MAX_CONCURRENT_FITS))
+            session["arena"] = UpdateArena(remote.layers, slots)
+            # Novo manifesto: os clientes combinam de novo na próxima rodada
+            session["manifest_clients"] = set()
+            incompatible_clients.clear()
+            print(f"Borda {EDGE_NAME}: manifesto {remote.manifest_id} combinado "
+                  f"(arena de {session['arena'].nbytes / 1e6:.2f} MB)")
+    return jsonify({"manifest_id": remote.manifest_id})
+
+
+@app.route('/fit', methods=['POST'])
+def fit():
+    try:
+        if request.content_type == CONTENT_TYPE_STREAM:
+            return jsonify({"error": "A borda não aceita o modo streaming"}), 415
+
+        compression = request.headers.get('Content-Encoding', IDENTITY)
+        try:
+            body = decompress(request.get_data(), compression, MAX_DECOMPRESSED_BYTES)
+            config, weights = decode_payload(body, request.mimetype)
+        except (PayloadError, CompressionError) as e:
+            return jsonify({"error": str(e)}), 415
+        except RequestEntityTooLarge as e:
+            return jsonify({"error": e.description}), 413
+
+        with round_lock:
+            if session["manifest"] is None:
+                return jsonify({"error": "Manifesto não combinado com a borda"}), 412
+            try:
+                if 'model_url' in config:
+                    # Modo pull: o /fit traz só o hash; o modelo vem do histórico ou do orquestrador
+                    weights = model_store.get(root_versions.get(config['model_version']))
+                    if weights is None:
+                        weights = fetch_global_model(config['model_url'], config['model_version'])
+                    else:
+                        remember_version(config['model_version'], root_versions[config['model_version']])
+                else:
+                    weights = load_global_model(config, weights)
+            except BaseVersionMissing:
+                # Diff do modelo global sobre uma versão que não temos
+                return jsonify({
+                    "error": "Versão base do diff não está no histórico da borda",
+                    "model_version": current_model["version"]
+                }), 409
+            except ManifestMismatch as e:
+                # Manifesto não combinado (ex.: borda reiniciada); o orquestrador refaz o handshake
+                return jsonify({"error": str(e)}), 412
+
+            print(f"Borda {EDGE_NAME}: repassando o modelo {str(current_model['version'])[:12]} "
+                  f"a {len(EDGE_CLIENT_ENDPOINTS)} clientes...")
+            aggregate = run_edge_round(weights, config, request.mimetype, compression)
+            if aggregate is None:
+                return jsonify({"error": f"Nenhum cliente da borda {EDGE_NAME} respondeu"}), 503
+            new_weights, total_samples, clients = aggregate
+
+            # Uma única atualização com o peso de todas as amostras da borda
+            result = {
+                "sample_count": total_samples,
+                "model_version": current_model["version"],
+                "edge_clients": clients
+            }
+            uplink_quantization = config.get('uplink_quantization', 'none')
+            if uplink_quantization != 'none':
+                # Quantizar o delta preserva muito mais precisão do que quantizar os pesos
+                tensors = [new - old for new, old in zip(new_weights, weights)]
+                result["update_type"] = "dense_delta"
+            else:
+                tensors = new_weights
+
+            tensors, quantization = quantize(
+                tensors, uplink_quantization, config.get('stochastic_rounding', False)
+            )
+            if quantization:
+                result["quantization"] = quantization
+            tensors, result = flatten_payload(tensors, result, session["manifest"])
+
+        # Responde no formato e na compressão pedidos pelo orquestrador
+        response_type = negotiate_content_type(request.headers.get('Accept'))
+        encoding = negotiate_encoding(request.headers.get('Accept-Encoding'))
+        body = compress(
+            encode_payload(tensors, result, response_type),
+            encoding,
+            config.get('compression_level')
+        )
+        response = Response(body, mimetype=response_type)
+        if encoding != IDENTITY:
+            response.headers['Content-Encoding'] = encoding
+        return response
+
+    except Exception as e:
+        print(f"ERRO CRÍTICO na borda {EDGE_NAME}: {e}")
+        traceback.print_exc()
+        return jsonify({"error": str(e)}), 500
+
+
+if __name__ == '__main__':
+    if not EDGE_CLIENT_ENDPOINTS:
+        raise ValueError("Defina EDGE_CLIENT_ENDPOINTS (ou EDGE_CLIENT_ENDPOINTS_FILE) com os clientes da borda")
+    threading.Thread(target=wait_for_clients, daemon=True).start()
+    # HTTP/1.1 para o orquestrador reaproveitar a conexão entre as chamadas
+    WSGIRequestHandler.protocol_version = "HTTP/1.1"
+    app.run(host='0.0.0.0', port=5000, threaded=True)
@@ -19,6 +19,67 @@ MAX_TIMEOUT = 180       # Timeout máximo em segundos
 ALPHA = 0.125          # Fator de ponderação para média de RTT
 BETA = 0.25            # Fator de ponderação para desvio de RTT
 
+# Configurações da sessão, lidas por TrainingConfig.from_module: cada nome é o de um
+# campo de TrainingConfig em maiúsculas, com o prefixo da sub-configuração (como
+# nas variáveis de ambiente do orquestrador); nomes omitidos ficam com o padrão
+TRAINING_MODE = "sync"          # "sync" (rodadas) ou "fedbuff" (assíncrono com buffer)
+MAX_CONCURRENT_FITS = 64        # Chamadas /fit disparadas ao mesmo tempo por rodada
+PIPELINED_EVALUATION = False    # Avalia a rodada r durante o despacho da rodada r+1
+STARTUP_DEADLINE = 120.0        # Prazo para os clientes ficarem prontos (GET /health)
+
+# Codificação dos payloads
+WIRE_FORMAT = "binary"          # Formato dos pesos no /fit: "binary" ou "json"
+UPDATE_MODE = "dense"           # Atualização dos clientes: "dense" ou "topk"
+TOPK_DENSITY = 0.05             # Fração de coordenadas enviadas no modo "topk"
+DOWNLINK_QUANTIZATION = "none"  # Quantização do modelo global: "none", "fp16" ou "int8"
+UPLINK_QUANTIZATION = "none"    # Quantização das atualizações dos clientes
+STOCHASTIC_ROUNDING = False     # Arredondamento estocástico no modo "int8"
+COMPRESSION = "identity"        # Compressão dos payloads: "identity", "gzip", "zstd" ou "lz4"
+COMPRESSION_LEVEL = None        # Nível do codec (None = padrão do codec)
+STREAMING = False               # Transfere o modelo camada por camada (chunked)
+
+# Transferência do modelo global
+MODEL_TRANSFER = "push"         # "push" (modelo no /fit) ou "pull" (GET /model/<sha256>)
+MODEL_DIFFS = True              # Envia só o diff do modelo a clientes com versão recente (só sem DOWNLINK_QUANTIZATION)
+MODEL_HISTORY = 3               # Versões do modelo global mantidas para os diffs
+MODEL_SERVER_URL = "http://test-orchestrator:5000"  # Endereço do servidor de modelos visto pelos clientes
+
+# Rodadas síncronas e modo FedBuff
+ROUND_QUORUM = 0                # Respostas para agregar a rodada (0 = todos os clientes)
+ROUND_DEADLINE = 0.0            # Prazo da rodada em segundos (0 = sem prazo)
+FEDBUFF_BUFFER_SIZE = 3         # Atualizações por passo do servidor no modo "fedbuff"
+FEDBUFF_SERVER_LR = 1.0         # Taxa de aprendizado do servidor no modo "fedbuff"
+FEDBUFF_STALENESS_EXPONENT = 0.5  # Peso das atualizações defasadas: 1 / (1 + tau) ** expoente
+
+# Canais e circuit breaker
+CHANNEL_POOL_SIZE = 2           # Conexões keep-alive mantidas por cliente
+CHANNEL_WARMUP_TIMEOUT = 2.0    # Timeout da abertura das conexões antes de cada rodada
+CHANNEL_BREAKER_FAILURE_THRESHOLD = 3  # Falhas seguidas até o circuito do cliente abrir
+CHANNEL_BREAKER_BACKOFF = 30.0  # Segundos até a primeira sondagem (dobra a cada reabertura)
+CHANNEL_BREAKER_MAX_BACKOFF = 300.0  # Backoff máximo do circuit breaker
+
+# Seleção de clientes
+SAMPLING_STRATEGY = 'all'       # Seleção por rodada: 'all', 'uniform', 'stratified' ou 'speed'
+SAMPLING_FRACTION = 1.0         # Fração C dos clientes elegíveis selecionada por rodada
+SAMPLING_MIN_CLIENTS = 1        # Mínimo de clientes selecionados por rodada
+
+# Protocolo das tarefas
+TASK_PROTOCOL = 'push'          # 'push' (orquestrador chama o /fit), 'poll' (GET /task) ou 'grpc' (stream)
+TASK_SERVER_PORT = 5001         # Porta da fila de tarefas no modo poll
+TASK_POLL_WAIT = 30.0           # Espera máxima de cada consulta à fila (long-poll)
+TASK_GRPC_PORT = 50051          # Porta do transporte gRPC
+TASK_GRPC_HEARTBEAT_INTERVAL = 15.0  # Heartbeats do stream gRPC quando não há tarefas
+
+# Admissão e agregação
+ADMISSION_BUDGET_MB = 0.0       # Memória para leituras simultâneas das respostas (0 = sem limite)
+AGGREGATION_RULE = 'fedavg'     # 'fedavg', 'median', 'trimmed_mean', 'krum', 'multi_krum' ou 'norm_bounded'
+AGGREGATION_TRIM_FRACTION = 0.1  # Fração descartada de cada ponta na média aparada
+AGGREGATION_BYZANTINE_CLIENTS = 0  # Clientes maliciosos tolerados pelo Krum / Multi-Krum
+AGGREGATION_NORM_BOUND = 0.0    # Norma máxima do delta no 'norm_bounded' (0 = mediana das normas)
+AGGREGATION_BLOCK_MB = 64.0     # Memória de trabalho dos kernels das regras robustas (as atualizações
+                                # guardadas ocupam clientes × parâmetros × 4 bytes à parte)
+AGGREGATION_WORKERS = 1         # Processos da agregação fatiada (1 = no próprio processo)
+
 # Configurações de exportação
 RESULTS_DIR = "results"
 EXPORT_JSON = True     # Se deve exportar JSON além do Excel
@@ -29,6 +29,28 @@ class RoundMetrics:
     aggregation_time: float
     total_samples: int
     client_contributions: Dict[int, int]  # client_id -> sample_count
+    bytes_sent: int = 0  # Bytes enviados aos clientes (downlink)
+    bytes_received: int = 0  # Bytes recebidos dos clientes (uplink)
+    quantization_mode: str = 'none/none'  # Quantização downlink/uplink
+    compression_codec: str = 'identity'  # Codec negociado para os payloads
+    compression_ratio: float = 1.0  # Bytes originais / bytes na rede
+    compression_cpu_time: float = 0.0  # Tempo de CPU (s) gasto comprimindo/descomprimindo
+    downlink_diffs: int = 0  # Clientes que receberam só o diff do modelo global
+    serialization_time: float = 0.0  # Tempo (s) do estágio de broadcast: quantização + serialização
+    peak_rss_mb: float = 0.0  # Pico de memória residente do orquestrador até o fim da rodada
+    quorum: int = 0  # Respostas necessárias para agregar (0 = todos os clientes)
+    deadline: float = 0.0  # Prazo da rodada em segundos (0 = sem prazo)
+    late_discarded: int = 0  # Stragglers cancelados cuja resposta foi descartada
+    training_mode: str = "sync"  # "sync" (rodadas) ou "fedbuff" (uma linha por passo do servidor)
+    mean_staleness: float = 0.0  # Defasagem média (em passos) das atualizações agregadas
+    max_staleness: int = 0
+    circuit_open_clients: int = 0  # Clientes deixados de fora pelo circuit breaker
+    evaluation_time: float = 0.0  # Avaliação do modelo global (fora do aggregation_time)
+    selected_clients: int = 0  # Clientes selecionados para a rodada (seleção por rodada)
+    admission_deferred: int = 0  # Leituras adiadas (ou 429) pelo orçamento de memória
+    admission_peak_mb: float = 0.0  # Pico de memória reservada para leituras simultâneas
+    aggregation_rule: str = "fedavg"  # Regra de agregação da rodada
+    robust_excluded: int = 0  # Atualizações descartadas (Krum) ou limitadas (norm_bounded) pela regra
     
 @dataclass
 class ExperimentMetrics:
@@ -55,21 +77,14 @@ class MetricsCollector:
         self.rounds_data: List[RoundMetrics] = []
         self.scenarios_tested: List[str] = []
         
-    def record_round(self, 
-                    round_number: int,
-                    scenario_name: Optional[str],
-                    total_clients: int,
-                    responding_clients: int,
-                    failed_clients: List[int],
-                    slow_clients: List[int],
-                    response_times: List[float],
-                    timeout_count: int,
-                    global_loss: float,
-                    global_accuracy: float,
-                    aggregation_time: float,
-                    total_samples: int,
-                    client_contributions: Dict[int, int]):
-        """Registra as métricas de uma rodada"""
+    def record_round(self, record: Dict[str, Any], global_loss: float, global_accuracy: float,
+                     evaluation_time: float = 0.0):
+        """
+        Registra as métricas de uma rodada. `record` traz os campos de
+        RoundMetrics medidos durante a rodada (ver FederatedTrainer._round_record);
+        as métricas derivadas são calculadas aqui.
+        """
+        response_times = list(record['response_times'])
         
         # Calcula métricas derivadas
         avg_response_time = sum(response_times) / len(response_times) if response_times else 0.0
@@ -82,33 +97,33 @@ class MetricsCollector:
             prev_accuracy = self.rounds_data[-1].global_accuracy
             convergence_rate = global_accuracy - prev_accuracy
         
+        # Cópias: as listas e o dict da rodada pertencem ao orquestrador
+        measured = dict(
+            record,
+            failed_clients=list(record['failed_clients']),
+            slow_clients=list(record['slow_clients']),
+            response_times=response_times,
+            client_contributions=dict(record['client_contributions'])
+        )
         round_metrics = RoundMetrics(
-            round_number=round_number,
+            **measured,
             timestamp=datetime.now().isoformat(),
-            scenario_name=scenario_name,
-            total_clients=total_clients,
-            responding_clients=responding_clients,
-            failed_clients=failed_clients.copy(),
-            slow_clients=slow_clients.copy(),
-            response_times=response_times.copy(),
             avg_response_time=avg_response_time,
             max_response_time=max_response_time,
             min_response_time=min_response_time,
-            timeout_count=timeout_count,
             global_loss=global_loss,
             global_accuracy=global_accuracy,
             convergence_rate=convergence_rate,
-            aggregation_time=aggregation_time,
-            total_samples=total_samples,
-            client_contributions=client_contributions.copy()
+            evaluation_time=evaluation_time
         )
         
         self.rounds_data.append(round_metrics)
         
+        scenario_name = record.get('scenario_name')
         if scenario_name and scenario_name not in self.scenarios_tested:
             self.scenarios_tested.append(scenario_name)
         
-        print(f"📊 Métricas registradas para rodada {round_number}")
+        print(f"📊 Métricas registradas para rodada {round_metrics.round_number}")
     
     def calculate_resilience_score(self) -> float:
         """
@@ -257,7 +272,8 @@ class MetricsCollector:
                         'avg_accuracy': 0.0,
                         'avg_response_time': 0.0,
                         'total_failures': 0,
-                        'total_timeouts': 0
+                        'total_timeouts': 0,
+                        'total_bytes': 0
                     }
                 
                 stats = scenario_stats[scenario]
@@ -266,6 +282,7 @@ class MetricsCollector:
                 stats['avg_response_time'] += round_metrics.avg_response_time
                 stats['total_failures'] += len(round_metrics.failed_clients)
                 stats['total_timeouts'] += round_metrics.timeout_count
+                stats['total_bytes'] += round_metrics.bytes_sent + round_metrics.bytes_received
             
             # Calcula médias
             scenario_summary = []
@@ -278,7 +295,8 @@ class MetricsCollector:
                     'Tempo Resposta Médio (s)': round(stats['avg_response_time'] / rounds, 2),
                     'Total de Falhas': stats['total_failures'],
                     'Total de Timeouts': stats['total_timeouts'],
-                    'Falhas por Rodada': round(stats['total_failures'] / rounds, 2)
+                    'Falhas por Rodada': round(stats['total_failures'] / rounds, 2),
+                    'Tráfego por Rodada (MB)': round(stats['total_bytes'] / rounds / 1e6, 3)
                 })
             
             scenario_df = pd.DataFrame(scenario_summary)
@@ -151,9 +151,6 @@ def main():
             print(f'    ❌ Erro no cenário {name}: {str(e)}')
         
         print('=' * 80)
-        if i < len(scenarios):
-            print('⏳ Aguardando 5 segundos antes do próximo cenário...')
-            time.sleep(5)
         print()
 
     # Executa análise comparativa automática
@@ -200,11 +200,6 @@ def main():
         
         print("    " + "=" * 76)
         
-        # Pausa entre cenários (exceto no último)
-        if i < len(scenarios):
-            print("    ⏳ Aguardando 5 segundos antes do próximo cenário...")
-            time.sleep(5)
-        
         print()
     
     # Resumo final
@@ -108,10 +108,6 @@ def main():
             results_summary.append((scenario_config['name'], f"ERRO: {str(e)}", 0))
         
         print("=" * 60)
-        
-        if i < len(scenarios):
-            print("⏸️  Aguardando 3 segundos antes do próximo cenário...")
-            time.sleep(3)
         print()
     
     # Resumo final
@@ -0,0 +1,80 @@
+# tests/test_admission.py
+
+import threading
+import time
+
+import pytest
+import requests
+
+from common.admission import AdmissionController, AdmissionTimeout
+from common.serialization import CONTENT_TYPE_BINARY, CONTENT_TYPE_JSON
+from common.tasks import TaskServer
+
+
+def test_cost_estimates():
+    admission = AdmissionController(budget_bytes=10_000, dense_bytes=1000)
+    binary = {'Content-Type': CONTENT_TYPE_BINARY, 'Content-Length': '400'}
+    assert admission.cost(binary) == 400
+    # Comprimido: corpo na rede + ao menos uma atualização densa descomprimida
+    assert admission.cost({**binary, 'Content-Encoding': 'zstd'}) == 1400
+    # JSON: o texto fica em memória junto com os arrays
+    assert admission.cost({'Content-Type': CONTENT_TYPE_JSON, 'Content-Length': '400'}) == 1800
+    # Sem Content-Length: uma atualização densa
+    assert admission.cost({'Content-Type': CONTENT_TYPE_BINARY}) == 1000
+
+
+def test_acquire_waits_for_release():
+    admission = AdmissionController(budget_bytes=100, dense_bytes=10)
+    assert admission.acquire(60)
+    acquired = threading.Event()
+    waiter = threading.Thread(target=lambda: admission.acquire(60) and acquired.set())
+    waiter.start()
+    time.sleep(0.05)
+    assert not acquired.is_set()
+    admission.release(60)
+    waiter.join(2)
+    assert acquired.is_set()
+    assert admission.in_use == 60
+    assert admission.peak == 60
+    assert admission.deferred == 1
+
+
+def test_oversized_read_is_admitted_alone():
+    admission = AdmissionController(budget_bytes=100, dense_bytes=10)
+    assert admission.acquire(500)
+    assert not admission.acquire(1, timeout=0.01)
+    admission.release(500)
+    assert admission.acquire(1, timeout=0.01)
+
+
+def test_admit_raises_on_timeout():
+    admission = AdmissionController(budget_bytes=100, dense_bytes=10)
+    admission.acquire(100)
+    with pytest.raises(AdmissionTimeout):
+        admission.admit({'Content-Type': CONTENT_TYPE_BINARY, 'Content-Length': '10'}, timeout=0.01)
+    assert admission.in_use == 100
+
+
+def test_poll_result_over_budget_gets_429():
+    admission = AdmissionController(budget_bytes=100, dense_bytes=10)
+    server = TaskServer(host='127.0.0.1', port=0, admission=admission, admission_wait=0.05, retry_after=3)
+    server.start()
+    try:
+        url = f'http://127.0.0.1:{server._httpd.server_address[1]}'
+        task = server.submit('http://client-1:5000/fit', b'modelo', {}, lambda upload: upload.raw.read())
+        assert server.poll('client-1', 1.0) is task
+        headers = {'Content-Type': CONTENT_TYPE_BINARY}
+
+        admission.acquire(100)  # Orçamento ocupado por outra leitura
+        response = requests.post(f'{url}/task/{task.task_id}/result', data=b'x' * 50, headers=headers)
+        assert response.status_code == 429
+        assert response.headers['Retry-After'] == '3'
+        assert server.pending(task.task_id)
+
+        admission.release(100)
+        response = requests.post(f'{url}/task/{task.task_id}/result', data=b'x' * 50, headers=headers)
+        assert response.status_code == 204
+        assert task.result == b'x' * 50
+        assert task.reservation == 50
+    finally:
+        server.stop()
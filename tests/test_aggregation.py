@@ -0,0 +1,231 @@
+# tests/test_aggregation.py
+
+import threading
+
+import numpy as np
+import pytest
+
+from common.aggregation import (
+    ClientUpdate, StreamingAverage, UPDATE_DENSE, UPDATE_DENSE_DELTA, UPDATE_SPARSE_DELTA,
+    federated_average, weighted_sum
+)
+from common.quantization import quantize
+from common.serialization import PayloadError
+from common.sparsification import flatten
+
+
+def global_weights():
+    return [np.full((4, 3), 1.0, dtype=np.float32), np.full(3, -1.0, dtype=np.float32)]
+
+
+def reference_average(weights, contributions):
+    """FedAvg em float64, camada por camada (a implementação original)"""
+    total = sum(count for _, count in contributions)
+    return [sum(np.asarray(layers[i], dtype=np.float64) * count for layers, count in contributions) / total
+            for i in range(len(weights))]
+
+
+def mixed_updates(weights):
+    """Atualização densa, delta denso, delta esparso e densa em int8, com os novos pesos de cada uma"""
+    rng = np.random.default_rng(0)
+    dense = [w + rng.normal(size=w.shape).astype(np.float32) for w in weights]
+    delta = [rng.normal(size=w.shape).astype(np.float32) for w in weights]
+    indices = np.array([0, 5, 13], dtype=np.uint32)
+    values = np.array([0.5, -2.0, 3.0], dtype=np.float32)
+    sparse_new = flatten(weights).copy()
+    sparse_new[indices] += values
+    int8_layers, int8_params = quantize(dense, 'int8')
+    return [
+        (ClientUpdate(UPDATE_DENSE, dense), 10, dense),
+        (ClientUpdate(UPDATE_DENSE_DELTA, delta), 30, [w + d for w, d in zip(weights, delta)]),
+        (ClientUpdate(UPDATE_SPARSE_DELTA, [indices, values]), 20,
+         [sparse_new[:12].reshape(4, 3), sparse_new[12:]]),
+        (ClientUpdate(UPDATE_DENSE, int8_layers, int8_params), 40, None),
+    ]
+
+
+def test_weighted_sum_blocks_match_numpy():
+    rng = np.random.default_rng(1)
+    vectors = [rng.normal(size=1000).astype(np.float32) for _ in range(3)]
+    out = weighted_sum(vectors, [0.2, 0.5, 0.3], np.empty(1000, dtype=np.float32), block_size=64)
+    np.testing.assert_allclose(out, 0.2 * vectors[0] + 0.5 * vectors[1] + 0.3 * vectors[2], rtol=1e-5, atol=1e-6)
+    weighted_sum(vectors[:1], [1.0], out, accumulate=True, block_size=64)
+    np.testing.assert_allclose(out, 1.2 * vectors[0] + 0.5 * vectors[1] + 0.3 * vectors[2], rtol=1e-5, atol=1e-6)
+
+
+def test_streaming_average_matches_federated_average():
+    weights = global_weights()
+    updates = mixed_updates(weights)
+    average = StreamingAverage(weights)
+    for update, count, _ in updates:
+        average.add(update, count)
+    expected = federated_average(weights, [(update, count) for update, count, _ in updates])
+    for got, want in zip(average.result(), expected):
+        assert got.shape == want.shape
+        np.testing.assert_allclose(got, want, rtol=1e-5, atol=1e-6)
+
+
+def test_streaming_average_matches_reference_without_quantization():
+    weights = global_weights()
+    updates = mixed_updates(weights)[:3]
+    average = StreamingAverage(weights)
+    for update, count, _ in updates:
+        average.add(update, count)
+    expected = reference_average(weights, [(new, count) for _, count, new in updates])
+    for got, want in zip(average.result(), expected):
+        np.testing.assert_allclose(got, want, rtol=1e-5, atol=1e-6)
+
+
+def test_streamed_layers_match_complete_update():
+    weights = global_weights()
+    dense = [w * 3 for w in weights]
+    average = StreamingAverage(weights)
+    average.add_stream({'sample_count': 5, 'update_type': UPDATE_DENSE}, iter(dense))
+    average.add(ClientUpdate(UPDATE_DENSE, weights), 5)
+    for got, w in zip(average.result(), weights):
+        np.testing.assert_allclose(got, w * 2)
+
+
+def test_interrupted_stream_is_discarded():
+    weights = global_weights()
+
+    def truncated():
+        yield weights[0] * 100
+        raise ConnectionError("conexão perdida")
+
+    average = StreamingAverage(weights)
+    with pytest.raises(ConnectionError):
+        average.add_stream({'sample_count': 50}, truncated())
+    # Camadas a menos também não entram na média
+    with pytest.raises(ValueError):
+        average.add_stream({'sample_count': 50}, iter(weights[:1]))
+    average.add(ClientUpdate(UPDATE_DENSE, weights), 1)
+    assert average.total_samples == 1
+    for got, w in zip(average.result(), weights):
+        np.testing.assert_array_equal(got, w)
+
+
+def test_wrong_shape_is_rejected_before_summing():
+    weights = global_weights()
+    average = StreamingAverage(weights)
+    with pytest.raises(ValueError):
+        average.add(ClientUpdate(UPDATE_DENSE, [weights[0]]), 1)
+    with pytest.raises(ValueError):
+        average.add(ClientUpdate(UPDATE_DENSE, [weights[0], np.zeros(4, dtype=np.float32)]), 1)
+    average.add(ClientUpdate(UPDATE_DENSE, weights), 1)
+    for got, w in zip(average.result(), weights):
+        np.testing.assert_array_equal(got, w)
+
+
+def test_late_updates_are_refused():
+    weights = global_weights()
+    average = StreamingAverage(weights)
+    average.add(ClientUpdate(UPDATE_DENSE, weights), 1)
+    average.result()
+    with pytest.raises(ValueError):
+        average.add(ClientUpdate(UPDATE_DENSE, weights), 1)
+    with pytest.raises(ValueError):
+        average.add_stream({'sample_count': 1}, iter(weights))
+
+
+def test_concurrent_adds():
+    weights = global_weights()
+    average = StreamingAverage(weights)
+
+    def worker(k):
+        for _ in range(50):
+            if k % 2:
+                average.add_stream({'sample_count': 1}, iter([w + k for w in weights]))
+            else:
+                average.add(ClientUpdate(UPDATE_DENSE, [w + k for w in weights]), 1)
+
+    threads = [threading.Thread(target=worker, args=(k,)) for k in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert average.total_samples == 200
+    for got, w in zip(average.result(), weights):
+        np.testing.assert_allclose(got, w + 1.5, rtol=1e-5)
+
+
+def test_slow_stream_does_not_block_other_uploads():
+    weights = global_weights()
+    average = StreamingAverage(weights)
+    first_layer_read, release = threading.Event(), threading.Event()
+
+    def slow_client():
+        yield weights[0] + 2
+        first_layer_read.set()
+        release.wait(5)  # Socket parado no meio do upload
+        yield weights[1] + 2
+
+    slow = threading.Thread(target=average.add_stream, args=({'sample_count': 1}, slow_client()))
+    slow.start()
+    assert first_layer_read.wait(5)
+    fast = threading.Thread(target=average.add_stream, args=({'sample_count': 1}, iter(weights)))
+    fast.start()
+    fast.join(2)
+    assert not fast.is_alive(), "um upload lento segurou os demais"
+    assert average.total_samples == 1
+    release.set()
+    slow.join(5)
+    for got, w in zip(average.result(), weights):
+        np.testing.assert_allclose(got, w + 1)
+
+
+def test_stream_layers_are_written_to_the_given_buffer():
+    weights = global_weights()
+    out = np.full(100, np.nan, dtype=np.float32)
+    average = StreamingAverage(weights)
+    average.add_stream({'sample_count': 2}, iter([w + 3 for w in weights]), out)
+    np.testing.assert_array_equal(out[:15], flatten([w + 3 for w in weights]))
+    assert np.isnan(out[15:]).all()
+    for got, w in zip(average.result(), weights):
+        np.testing.assert_allclose(got, w + 3)
+
+
+def test_seal_refuses_stragglers_and_keeps_the_snapshot():
+    weights = global_weights()
+    average = StreamingAverage(weights)
+    average.add(ClientUpdate(UPDATE_DENSE, [w + 2 for w in weights]), 3, client=0)
+    average.add_stream({'sample_count': 1}, iter([w + 6 for w in weights]), client=4)
+    average.seal()
+    with pytest.raises(ValueError):
+        average.add(ClientUpdate(UPDATE_DENSE, [w + 100 for w in weights]), 10, client=1)
+    with pytest.raises(ValueError):
+        average.add_stream({'sample_count': 10}, iter(weights), client=2)
+    assert average.clients == {0: 3, 4: 1}
+    assert average.total_samples == 4
+    for got, w in zip(average.result(), weights):
+        np.testing.assert_allclose(got, w + 3)
+
+
+def test_repeated_sparse_indices_accumulate():
+    weights = global_weights()
+    update = ClientUpdate(UPDATE_SPARSE_DELTA, [np.array([2, 2, 7], dtype=np.uint32),
+                                                np.array([1.0, 2.0, 4.0], dtype=np.float32)])
+    expected = flatten(weights).copy()
+    expected[2] += 3.0
+    expected[7] += 4.0
+    average = StreamingAverage(weights)
+    average.add(update, 5)
+    np.testing.assert_allclose(flatten(average.result()), expected)
+    np.testing.assert_allclose(flatten(federated_average(weights, [(update, 5)])), expected)
+
+
+@pytest.mark.parametrize('indices, values', [
+    (np.array([0, 15], dtype=np.int64), np.array([1.0, 1.0], dtype=np.float32)),  # 15 = tamanho do modelo
+    (np.array([-1], dtype=np.int64), np.array([1.0], dtype=np.float32)),
+    (np.array([0, 1], dtype=np.uint32), np.array([1.0], dtype=np.float32)),
+    (np.array([0.5], dtype=np.float32), np.array([1.0], dtype=np.float32)),
+])
+def test_invalid_sparse_deltas_are_payload_errors(indices, values):
+    weights = global_weights()
+    update = ClientUpdate(UPDATE_SPARSE_DELTA, [indices, values])
+    average = StreamingAverage(weights)
+    with pytest.raises(PayloadError):
+        average.add(update, 1)
+    with pytest.raises(PayloadError):
+        federated_average(weights, [(update, 1)])
+    assert average.total_samples == 0
@@ -0,0 +1,29 @@
+# tests/test_arena.py
+
+import numpy as np
+
+from common.arena import UpdateArena
+from common.manifest import LayerEntry
+
+LAYERS = [LayerEntry('0:kernel', (5, 3), 'float32', 0, 15), LayerEntry('1:bias', (3,), 'float32', 15, 3)]
+
+
+def test_vector_is_a_float32_view_over_the_client_slot():
+    arena = UpdateArena(LAYERS, num_slots=2)
+    assert arena.slot_size % 64 == 0
+    first = arena.vector(7, 18)
+    second = arena.vector(9, 18)
+    assert first.dtype == np.float32 and first.size == 18
+    first[:] = 1.0
+    second[:] = 2.0
+    assert np.shares_memory(first, arena._buffer) and not np.shares_memory(first, second)
+    np.testing.assert_array_equal(first, np.ones(18, dtype=np.float32))
+    # Arena cheia: quem chamar cai na alocação normal
+    assert arena.vector(11, 18) is None
+    arena.release(7)
+    assert arena.vector(11, 18) is not None
+
+
+def test_vector_larger_than_a_slot_is_refused():
+    arena = UpdateArena(LAYERS, num_slots=1, metadata_bytes=0)
+    assert arena.vector(0, arena.slot_size) is None
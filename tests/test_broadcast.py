@@ -0,0 +1,79 @@
+# tests/test_broadcast.py
+
+import threading
+
+import numpy as np
+
+from common.broadcast import DownlinkEncoding, RoundBroadcast
+from common.compression import decompress
+from common.manifest import LayerEntry, ModelManifest, expand_flat_payload
+from common.model_store import ModelVersionStore
+from common.quantization import dequantize
+from common.serialization import CONTENT_TYPE_BINARY, CONTENT_TYPE_JSON, decode_payload
+
+OLD = [np.zeros((2, 2), np.float32), np.zeros(2, np.float32)]
+NEW = [np.full((2, 2), 0.5, np.float32), np.array([1.0, -1.0], np.float32)]
+
+
+def round_broadcast(**encoding):
+    store = ModelVersionStore()
+    base = store.add(OLD)
+    version = store.add(NEW)
+    encoding = DownlinkEncoding(**{'content_type': CONTENT_TYPE_BINARY, **encoding})
+    return RoundBroadcast(encoding, store, version, {'epochs': 1}), base
+
+
+def decode(body, content_type=CONTENT_TYPE_BINARY, codec='identity'):
+    return decode_payload(decompress(body, codec), content_type)
+
+
+def test_full_body_is_encoded_once_and_shared():
+    broadcast, _ = round_broadcast()
+    bodies = []
+    threads = [threading.Thread(target=lambda: bodies.append(broadcast.full_body())) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert all(body is bodies[0] for body in bodies)
+    # Um único encode: os bytes contabilizados são os de um corpo
+    assert broadcast.compression_stats.compressed_bytes == len(bodies[0])
+    metadata, tensors = decode(bodies[0])
+    assert metadata['epochs'] == 1
+    assert all(np.array_equal(a, b) for a, b in zip(tensors, NEW))
+
+
+def test_diff_body_is_cached_per_base():
+    broadcast, base = round_broadcast()
+    body = broadcast.diff_body(base)
+    assert broadcast.diff_body(base) is body
+    assert broadcast.is_diff(body)
+    assert not broadcast.is_diff(broadcast.full_body())
+    metadata, tensors = decode(body)
+    assert metadata['base_version'] == base
+    assert all(np.array_equal(a, b - o) for a, b, o in zip(tensors, NEW, OLD))
+
+
+def test_unknown_base_has_no_diff():
+    broadcast, _ = round_broadcast()
+    assert broadcast.diff_body('0' * 64) is None
+
+
+def test_pull_body_carries_only_the_model_url():
+    broadcast, _ = round_broadcast(content_type=CONTENT_TYPE_JSON)
+    metadata, tensors = decode(broadcast.full_body('http://orchestrator:5002/model/abc'), CONTENT_TYPE_JSON)
+    assert tensors == []
+    assert metadata['model_url'] == 'http://orchestrator:5002/model/abc'
+
+
+def test_encoding_quantizes_flattens_and_compresses():
+    manifest = ModelManifest([
+        LayerEntry('0:kernel', (2, 2), 'float32', 0, 4),
+        LayerEntry('1:bias', (2,), 'float32', 4, 2),
+    ], architecture='abc')
+    broadcast, _ = round_broadcast(quantization='fp16', compression='gzip', manifest=manifest)
+    metadata, tensors = decode(broadcast.full_body(), codec='gzip')
+    assert metadata['manifest_id'] == manifest.manifest_id
+    layers = dequantize(expand_flat_payload(metadata, tensors, manifest), metadata['quantization'])
+    assert all(np.allclose(a, b) for a, b in zip(layers, NEW))
+    assert broadcast.serialization_time > 0
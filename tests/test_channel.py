@@ -0,0 +1,152 @@
+# tests/test_channel.py
+
+import socket
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+import requests
+
+from common.channel import CLOSED, HALF_OPEN, OPEN, ChannelPool, CircuitBreaker, CircuitOpenError
+
+
+class _HealthHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        self.send_response(self.server.status)
+        self.send_header('Content-Length', '0')
+        self.end_headers()
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def client():
+    """Cliente de teste que responde GET /health; retorna o endpoint do /fit"""
+    httpd = ThreadingHTTPServer(('127.0.0.1', 0), _HealthHandler)
+    httpd.status = 200
+    threading.Thread(target=httpd.serve_forever, daemon=True).start()
+    httpd.endpoint = f'http://127.0.0.1:{httpd.server_address[1]}/fit'
+    yield httpd
+    httpd.shutdown()
+    httpd.server_close()
+
+
+@pytest.fixture
+def dead_endpoint():
+    """Endpoint de uma porta sem ninguém ouvindo"""
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        port = sock.getsockname()[1]
+    return f'http://127.0.0.1:{port}/fit'
+
+
+def test_breaker_opens_after_consecutive_failures():
+    breaker = CircuitBreaker(failure_threshold=3, base_backoff=60.0)
+    breaker.record_failure()
+    breaker.record_failure()
+    assert breaker.state == CLOSED
+    breaker.record_success()
+    breaker.record_failure()
+    breaker.record_failure()
+    assert breaker.state == CLOSED  # O sucesso zerou a contagem
+    breaker.record_failure()
+    assert breaker.state == OPEN
+    assert not breaker.allow()
+    assert 0 < breaker.retry_after() <= 60.0
+
+
+def test_breaker_half_opens_after_backoff_and_closes_on_success():
+    breaker = CircuitBreaker(failure_threshold=1, base_backoff=0.05)
+    breaker.record_failure()
+    assert not breaker.allow()
+    time.sleep(0.06)
+    assert breaker.retry_after() == 0.0
+    assert breaker.allow()
+    assert breaker.state == HALF_OPEN
+    breaker.record_success()
+    assert breaker.state == CLOSED
+
+
+def test_backoff_doubles_on_each_reopening_up_to_the_limit():
+    breaker = CircuitBreaker(failure_threshold=1, base_backoff=0.05, max_backoff=0.1)
+    breaker.record_failure()
+    backoffs = [breaker._backoff]
+    for _ in range(2):
+        time.sleep(breaker._backoff + 0.01)
+        assert breaker.allow()
+        breaker.record_failure()  # Uma falha no meio-aberto reabre o circuito
+        assert breaker.state == OPEN
+        backoffs.append(breaker._backoff)
+    assert backoffs == [0.05, 0.1, 0.1]
+
+
+def test_call_records_outcome_in_breaker(client, dead_endpoint):
+    pool = ChannelPool([client.endpoint, dead_endpoint], failure_threshold=2, base_backoff=60.0,
+                       probe_timeout=1.0)
+    try:
+        assert pool.call(client.endpoint, lambda: 'ok') == 'ok'
+
+        def fit():
+            return pool[dead_endpoint].post(dead_endpoint, timeout=1.0)
+
+        for _ in range(2):
+            with pytest.raises(requests.exceptions.ConnectionError):
+                pool.call(dead_endpoint, fit)
+        assert pool.states() == {client.endpoint: CLOSED, dead_endpoint: OPEN}
+        assert not pool.available(dead_endpoint)
+        # Circuito aberto: com probe=True o cliente nem é chamado
+        with pytest.raises(CircuitOpenError):
+            pool.call(dead_endpoint, fit, probe=True)
+    finally:
+        pool.close()
+
+
+def test_warm_up_probes_half_open_client(client):
+    pool = ChannelPool([client.endpoint], failure_threshold=1, base_backoff=0.05, probe_timeout=1.0)
+    try:
+        breaker = pool[client.endpoint].breaker
+        breaker.record_failure()
+        assert pool.warm_up([client.endpoint]) == []  # Ainda no backoff
+        time.sleep(0.06)
+        assert pool.warm_up([client.endpoint]) == [client.endpoint]
+        assert breaker.state == HALF_OPEN
+        pool.call(client.endpoint, lambda: None)
+        assert breaker.state == CLOSED
+    finally:
+        pool.close()
+
+
+def test_failed_probe_reopens_circuit(dead_endpoint):
+    pool = ChannelPool([dead_endpoint], failure_threshold=1, base_backoff=0.05, probe_timeout=1.0)
+    try:
+        pool[dead_endpoint].breaker.record_failure()
+        time.sleep(0.06)
+        assert pool.warm_up([dead_endpoint]) == []
+        assert pool.states() == {dead_endpoint: OPEN}
+        assert pool.retry_after(dead_endpoint) > 0
+    finally:
+        pool.close()
+
+
+def test_wait_until_ready_returns_ready_clients(client, dead_endpoint):
+    pool = ChannelPool([client.endpoint, dead_endpoint], probe_timeout=0.5)
+    try:
+        ready = pool.wait_until_ready([client.endpoint, dead_endpoint], deadline=0.3, poll_interval=0.1)
+        assert ready == [client.endpoint]
+        # Basta um cliente pronto com min_ready=1
+        assert pool.wait_until_ready([client.endpoint, dead_endpoint], deadline=5.0, min_ready=1) \
+            == [client.endpoint]
+    finally:
+        pool.close()
+
+
+def test_client_still_loading_is_reachable_but_not_ready(client):
+    client.status = 503
+    pool = ChannelPool([client.endpoint], probe_timeout=1.0)
+    try:
+        assert pool.warm_up([client.endpoint]) == [client.endpoint]
+        assert pool.wait_until_ready([client.endpoint], deadline=0.2, poll_interval=0.1) == []
+    finally:
+        pool.close()
@@ -0,0 +1,84 @@
+# tests/test_compression.py
+
+import io
+
+import pytest
+
+from common.compression import (
+    CompressionError, IDENTITY, available_codecs, compress, decompress, encoding_headers, max_wire_bytes,
+    negotiate_encoding, read_response_body
+)
+
+CODECS = available_codecs() + [IDENTITY]
+
+
+class FakeRaw:
+    """response.raw do urllib3: read(amt, decode_content) sobre um buffer em memória"""
+
+    def __init__(self, data):
+        self._data = io.BytesIO(data)
+        self.bytes_read = 0
+
+    def read(self, amt=None, decode_content=True):
+        chunk = self._data.read(amt)
+        self.bytes_read += len(chunk)
+        return chunk
+
+
+class FakeResponse:
+    def __init__(self, data, headers):
+        self.raw = FakeRaw(data)
+        self.headers = headers
+        self.closed = False
+
+    def close(self):
+        self.closed = True
+
+
+@pytest.mark.parametrize('codec', CODECS)
+def test_round_trip(codec):
+    data = b'pesos do modelo ' * 1000
+    assert decompress(compress(data, codec), codec) == data
+
+
+@pytest.mark.parametrize('codec', CODECS)
+def test_decompression_is_limited(codec):
+    with pytest.raises(CompressionError):
+        decompress(compress(b'\0' * 100_000, codec), codec, max_size=1000)
+
+
+def test_corrupt_payload_is_compression_error():
+    with pytest.raises(CompressionError):
+        decompress(b'nao e gzip', 'gzip')
+    with pytest.raises(CompressionError):
+        decompress(b'x', 'brotli')
+
+
+def test_negotiation():
+    assert negotiate_encoding(None) == IDENTITY
+    assert negotiate_encoding('br, gzip;q=0.8') == 'gzip'
+    assert encoding_headers(IDENTITY) == {'Accept-Encoding': IDENTITY}
+    assert encoding_headers('gzip')['Content-Encoding'] == 'gzip'
+
+
+def test_read_response_body_decompresses():
+    data = b'abc' * 1000
+    response = FakeResponse(compress(data, 'gzip'), {'Content-Encoding': 'gzip'})
+    body, wire_size, _ = read_response_body(response, max_size=10_000)
+    assert body == data and wire_size < len(data) and response.closed
+
+
+def test_oversized_content_length_is_refused_before_reading():
+    limit = max_wire_bytes(1000)
+    response = FakeResponse(b'x' * (limit + 1), {'Content-Length': str(limit + 1)})
+    with pytest.raises(CompressionError):
+        read_response_body(response, max_size=1000)
+    assert response.raw.bytes_read == 0 and response.closed
+
+
+def test_body_without_length_is_read_only_up_to_the_limit():
+    limit = max_wire_bytes(1000)
+    response = FakeResponse(b'x' * (10 * limit), {})
+    with pytest.raises(CompressionError):
+        read_response_body(response, max_size=1000)
+    assert response.raw.bytes_read == limit + 1 and response.closed
@@ -0,0 +1,132 @@
+# tests/test_dispatch.py
+
+import threading
+import time
+
+import numpy as np
+import pytest
+
+from common.aggregation import ClientUpdate, StreamingAverage, UPDATE_DENSE
+from common.dispatch import AsyncDispatcher
+
+
+def job(index, result, gate=None):
+    """Chamada que retorna `result`, depois de `gate` abrir (se houver)"""
+    def call():
+        if gate is not None:
+            gate.wait(5)
+        return result
+    return (index, f'http://client-{index}/fit', 1.0, call)
+
+
+@pytest.fixture
+def dispatcher():
+    dispatcher = AsyncDispatcher(max_concurrency=8)
+    yield dispatcher
+    dispatcher.shutdown()
+
+
+def test_all_calls_complete_without_quorum(dispatcher):
+    completed = []
+    stragglers = dispatcher.run([job(i, i) for i in range(4)], completed.append)
+    assert stragglers == []
+    assert sorted(d.result for d in completed) == [0, 1, 2, 3]
+
+
+def test_quorum_cancels_stragglers_and_keeps_them_busy(dispatcher):
+    gate = threading.Event()
+    completed = []
+    jobs = [job(0, 'a'), job(1, 'b'), job(2, 'c', gate)]
+    stragglers = dispatcher.run(jobs, completed.append, quorum=2)
+    assert [d.index for d in stragglers] == [2]
+    assert sorted(d.index for d in completed) == [0, 1]
+    # A thread do straggler continua rodando: o cliente não recebe outra chamada
+    assert dispatcher.busy('http://client-2/fit')
+    gate.set()
+    for _ in range(50):
+        if not dispatcher.busy('http://client-2/fit'):
+            break
+        time.sleep(0.05)
+    assert not dispatcher.busy('http://client-2/fit')
+
+
+def test_failures_do_not_count_for_the_quorum(dispatcher):
+    def fail():
+        raise ConnectionError('cliente fora do ar')
+
+    gate = threading.Event()
+    completed = []
+    jobs = [(0, 'http://client-0/fit', 1.0, fail), job(1, 'b'), job(2, 'c', gate)]
+    stragglers = dispatcher.run(jobs, completed.append, quorum=2, deadline=0.5)
+    gate.set()
+    assert [d.index for d in stragglers] == [2]
+    errors = [d for d in completed if d.error is not None]
+    assert [d.index for d in errors] == [0] and isinstance(errors[0].error, ConnectionError)
+
+
+def test_deadline_ends_the_round(dispatcher):
+    gate = threading.Event()
+    start = time.time()
+    stragglers = dispatcher.run([job(0, 'a'), job(1, 'b', gate)], lambda d: None, deadline=0.2)
+    gate.set()
+    assert time.time() - start < 2
+    assert [d.index for d in stragglers] == [1]
+
+
+def test_on_complete_can_chain_new_calls(dispatcher):
+    completed = []
+
+    def on_complete(dispatch):
+        completed.append(dispatch.result)
+        if dispatch.result < 3:
+            return [job(dispatch.index, dispatch.result + 1)]
+
+    dispatcher.run([job(0, 0)], on_complete)
+    assert completed == [0, 1, 2, 3]
+
+
+def test_call_cancelled_before_starting_releases_the_client():
+    blocker = threading.Event()
+    dispatcher = AsyncDispatcher(max_concurrency=1)  # A segunda chamada fica na fila do pool
+    try:
+        ran = []
+        jobs = [job(0, 'a', blocker), (1, 'b', 1.0, lambda: ran.append(1))]
+        stragglers = dispatcher.run(jobs, lambda d: None, deadline=0.2)
+        assert sorted(d.index for d in stragglers) == [0, 1]
+        assert not dispatcher.busy('b') and dispatcher.busy('http://client-0/fit')
+        blocker.set()
+        time.sleep(0.2)
+        assert ran == []
+    finally:
+        blocker.set()
+        dispatcher.shutdown()
+
+
+def test_sealed_aggregator_refuses_the_straggler_fold(dispatcher):
+    weights = [np.zeros(3, dtype=np.float32)]
+    aggregator = StreamingAverage(weights)
+    straggler_started, gate, done = threading.Event(), threading.Event(), threading.Event()
+    late = {}
+
+    def fast():
+        straggler_started.wait(5)
+        aggregator.add(ClientUpdate(UPDATE_DENSE, [weights[0] + 1]), 1, 0)
+        return 0
+
+    def straggler():
+        straggler_started.set()
+        gate.wait(5)
+        try:
+            aggregator.add(ClientUpdate(UPDATE_DENSE, [weights[0] + 100]), 1, 1)
+        except ValueError as e:
+            late[1] = e
+        finally:
+            done.set()
+
+    stragglers = dispatcher.run([(0, 'a', 1.0, fast), (1, 'b', 1.0, straggler)], lambda d: None, quorum=1)
+    aggregator.seal()
+    gate.set()
+    assert done.wait(5)
+    assert [d.index for d in stragglers] == [1]
+    assert 1 in late and aggregator.clients == {0: 1}
+    np.testing.assert_array_equal(aggregator.result()[0], [1.0, 1.0, 1.0])
@@ -0,0 +1,128 @@
+# tests/test_edge_aggregator.py
+
+import importlib.util
+import json
+import os
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import numpy as np
+import pytest
+
+pytest.importorskip('flask')
+
+from common.manifest import LayerEntry, ModelManifest, expand_flat_payload, flatten_payload
+from common.serialization import CONTENT_TYPE_BINARY, decode_payload, encode_payload, request_headers
+from common.streaming import CONTENT_TYPE_STREAM
+
+EDGE_APP = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'edge-aggregator', 'edge_app.py')
+
+MANIFEST = ModelManifest([
+    LayerEntry('0:kernel', (2, 2), 'float32', 0, 4),
+    LayerEntry('1:bias', (2,), 'float32', 4, 2),
+], architecture='abc')
+
+GLOBAL = [np.ones((2, 2), np.float32), np.zeros(2, np.float32)]
+
+
+class _ClientHandler(BaseHTTPRequestHandler):
+    """Cliente de teste: devolve os pesos recebidos + `offset`, com `samples` amostras"""
+
+    def do_GET(self):
+        self._reply(200, b'{}', 'application/json')
+
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers['Content-Length']))
+        if self.path == '/manifest':
+            self._reply(200, b'{}', 'application/json')
+            return
+        metadata, tensors = decode_payload(body, self.headers['Content-Type'])
+        weights = expand_flat_payload(metadata, tensors, MANIFEST)
+        tensors, result = flatten_payload(
+            [w + self.server.offset for w in weights], {'sample_count': self.server.samples}, MANIFEST
+        )
+        self._reply(200, encode_payload(tensors, result, CONTENT_TYPE_BINARY), CONTENT_TYPE_BINARY)
+
+    def _reply(self, status, body, content_type):
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+def start_client(offset, samples):
+    httpd = ThreadingHTTPServer(('127.0.0.1', 0), _ClientHandler)
+    httpd.offset, httpd.samples = offset, samples
+    threading.Thread(target=httpd.serve_forever, daemon=True).start()
+    return httpd
+
+
+@pytest.fixture(scope='module')
+def edge():
+    """edge_app importado com dois clientes de teste (offset 1 com 1 amostra, 4 com 3)"""
+    clients = [start_client(1.0, 1), start_client(4.0, 3)]
+    endpoints = ','.join(f'http://127.0.0.1:{c.server_address[1]}/fit' for c in clients)
+    previous = os.environ.get('EDGE_CLIENT_ENDPOINTS')
+    os.environ['EDGE_CLIENT_ENDPOINTS'] = endpoints
+    try:
+        spec = importlib.util.spec_from_file_location('edge_app', EDGE_APP)
+        module = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(module)
+    finally:
+        if previous is None:
+            del os.environ['EDGE_CLIENT_ENDPOINTS']
+        else:
+            os.environ['EDGE_CLIENT_ENDPOINTS'] = previous
+    yield module
+    module.dispatcher.shutdown()
+    for client in clients:
+        client.shutdown()
+        client.server_close()
+
+
+def fit_body(weights, **config):
+    tensors, metadata = flatten_payload(weights, {'model_version': 'root-1', **config}, MANIFEST)
+    return encode_payload(tensors, metadata, CONTENT_TYPE_BINARY)
+
+
+def post_fit(edge, body):
+    return edge.app.test_client().post('/fit', data=body, headers=request_headers(CONTENT_TYPE_BINARY))
+
+
+def test_fit_requires_manifest(edge):
+    edge.session["manifest"] = None
+    assert post_fit(edge, fit_body(GLOBAL)).status_code == 412
+
+
+def test_edge_returns_weighted_average_of_its_clients(edge):
+    client = edge.app.test_client()
+    assert client.post('/manifest', json=MANIFEST.to_dict()).status_code == 200
+
+    response = post_fit(edge, fit_body(GLOBAL))
+    assert response.status_code == 200
+    metadata, tensors = decode_payload(response.data, response.headers['Content-Type'])
+    assert metadata['sample_count'] == 4
+    assert metadata['edge_clients'] == 2
+    assert metadata['model_version'] == 'root-1'
+    # (1 * (w + 1) + 3 * (w + 4)) / 4 = w + 3.25
+    weights = expand_flat_payload(metadata, tensors, MANIFEST)
+    assert all(np.allclose(new, old + 3.25) for new, old in zip(weights, GLOBAL))
+
+
+def test_diff_over_unknown_base_is_409(edge):
+    edge.app.test_client().post('/manifest', json=MANIFEST.to_dict())
+    body = fit_body([np.zeros((2, 2), np.float32), np.zeros(2, np.float32)], base_version='desconhecida')
+    response = post_fit(edge, body)
+    assert response.status_code == 409
+    assert 'model_version' in json.loads(response.data)
+
+
+def test_edge_rejects_streaming_and_malformed_bodies(edge):
+    client = edge.app.test_client()
+    response = client.post('/fit', data=b'x', headers={'Content-Type': CONTENT_TYPE_STREAM})
+    assert response.status_code == 415
+    assert post_fit(edge, b'lixo').status_code == 415
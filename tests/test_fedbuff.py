@@ -0,0 +1,60 @@
+# tests/test_fedbuff.py
+
+import numpy as np
+import pytest
+
+from common.aggregation import ClientUpdate, UPDATE_DENSE, UPDATE_SPARSE_DELTA
+from common.fedbuff import FedBuffServer, staleness_weight
+from common.serialization import PayloadError
+
+
+def global_weights():
+    return [np.zeros((2, 2), dtype=np.float32), np.zeros(2, dtype=np.float32)]
+
+
+def test_staleness_weight():
+    assert staleness_weight(0) == 1.0
+    assert staleness_weight(3, exponent=0.5) == pytest.approx(0.5)
+
+
+def test_buffer_applies_a_weighted_step():
+    weights = global_weights()
+    server = FedBuffServer(weights, buffer_size=2, server_lr=1.0, staleness_exponent=0.5)
+    assert server.add(ClientUpdate(UPDATE_DENSE, [w + 2 for w in weights]), 10, 0, weights)
+    assert not server.ready()
+    assert server.add(ClientUpdate(UPDATE_DENSE, [w + 4 for w in weights]), 30, 0, weights)
+    assert server.ready()
+    assert server.apply() == [0, 0]
+    assert server.step == 1
+    for layer in server.global_weights:
+        np.testing.assert_allclose(layer, (2 * 10 + 4 * 30) / 40)
+
+
+def test_stale_update_is_down_weighted_and_max_staleness_discards():
+    weights = global_weights()
+    server = FedBuffServer(weights, buffer_size=1, max_staleness=1)
+    server.add(ClientUpdate(UPDATE_DENSE, [w + 1 for w in weights]), 1, 0, weights)
+    server.apply()
+    assert server.add(ClientUpdate(UPDATE_DENSE, [w + 4 for w in weights]), 1, 0, weights)
+    server.apply()
+    # Delta de 4 com defasagem 1: peso 1/sqrt(2) no numerador, amostras cheias no denominador
+    np.testing.assert_allclose(server.global_weights[1], 1 + 4 * staleness_weight(1), rtol=1e-6)
+    assert not server.add(ClientUpdate(UPDATE_DENSE, weights), 1, 0, weights)
+
+
+def test_sparse_delta_accumulates_repeated_indices():
+    server = FedBuffServer(global_weights(), buffer_size=1)
+    update = ClientUpdate(UPDATE_SPARSE_DELTA, [np.array([1, 1, 5], dtype=np.uint32),
+                                                np.array([1.0, 2.0, 3.0], dtype=np.float32)])
+    assert server.add(update, 1, 0)
+    server.apply()
+    np.testing.assert_allclose(server.global_weights[0].reshape(-1), [0, 3, 0, 0])
+    np.testing.assert_allclose(server.global_weights[1], [0, 3])
+
+
+def test_out_of_range_sparse_index_is_rejected():
+    server = FedBuffServer(global_weights(), buffer_size=1)
+    update = ClientUpdate(UPDATE_SPARSE_DELTA, [np.array([6], dtype=np.uint32), np.array([1.0], dtype=np.float32)])
+    with pytest.raises(PayloadError):
+        server.add(update, 1, 0)
+    assert not server.ready()
@@ -0,0 +1,115 @@
+# tests/test_grpc_transport.py
+
+import queue
+import threading
+
+import pytest
+
+grpc = pytest.importorskip('grpc')
+
+from common.grpc_transport import (
+    CHANNEL_OPTIONS, MESSAGE_ERRORS, SESSION_METHOD, GrpcTaskServer, decode_message, encode_message,
+    result_messages
+)
+
+
+def read_all(upload):
+    body = upload.raw.read()
+    return body, len(body), 0.0
+
+
+def test_message_round_trip():
+    header, body = decode_message(encode_message({'type': 'task', 'task_id': 'a'}, b'corpo'))
+    assert header == {'type': 'task', 'task_id': 'a'}
+    assert bytes(body) == b'corpo'
+
+
+def test_result_is_split_into_chunks():
+    messages = [decode_message(m) for m in result_messages({'type': 'result'}, b'x' * 10, chunk_bytes=4)]
+    assert messages[0][0] == {'type': 'result', 'content_length': 10}
+    assert [bytes(body) for _, body in messages[1:]] == [b'xxxx', b'xxxx', b'xx']
+
+
+@pytest.mark.parametrize('data', [b'\x01', b'\x05\x00\x00\x00{"typ', b'\x02\x00\x00\x00[]'])
+def test_malformed_message_raises_decode_error(data):
+    with pytest.raises(MESSAGE_ERRORS):
+        decode_message(data)
+
+
+@pytest.fixture
+def grpc_server():
+    server = GrpcTaskServer(host='127.0.0.1', port=0, heartbeat_interval=0.5)
+    server.start()
+    yield server
+    server.stop()
+
+
+def open_session(server, client):
+    """Stream de um cliente de teste: retorna (fila de envio, respostas)"""
+    outbox = queue.Queue()
+    outbox.put(encode_message({'type': 'hello', 'client': client}))
+
+    def requests_iter():
+        while True:
+            message = outbox.get()
+            if message is None:
+                return
+            yield message
+
+    channel = grpc.insecure_channel(f'127.0.0.1:{server.port}', options=CHANNEL_OPTIONS)
+    session = channel.stream_stream(SESSION_METHOD)
+    return outbox, session(requests_iter())
+
+
+def next_task(responses):
+    for data in responses:
+        header, body = decode_message(data)
+        if header['type'] == 'task':
+            return header, bytes(body)
+
+
+def test_result_reaches_the_task(grpc_server):
+    outbox, responses = open_session(grpc_server, 'client-1')
+    try:
+        task = grpc_server.submit('http://client-1:5000/fit', b'modelo', {}, read_all)
+        header, body = next_task(responses)
+        assert body == b'modelo'
+        for message in result_messages({'type': 'result', 'task_id': header['task_id'], 'status': 200}, b'pesos'):
+            outbox.put(message)
+        assert task.wait(5)
+        assert task.status == 200
+        assert task.result[0] == b'pesos'
+    finally:
+        outbox.put(None)
+        responses.cancel()
+
+
+def test_malformed_message_fails_client_and_aborts_stream(grpc_server):
+    outbox, responses = open_session(grpc_server, 'client-1')
+    try:
+        result = {}
+        runner = threading.Thread(target=lambda: result.update(task=grpc_server.run(
+            'http://client-1:5000/fit', b'modelo', {}, read_all, timeout=10
+        )))
+        runner.start()
+        next_task(responses)
+        outbox.put(b'\x01')  # Cabeçalho truncado
+        runner.join(5)
+        assert not runner.is_alive()
+        assert result['task'].status == 400
+        assert 'ilegível' in result['task'].error
+        with pytest.raises(grpc.RpcError) as error:
+            for _ in responses:
+                pass
+        assert error.value.code() == grpc.StatusCode.CANCELLED
+    finally:
+        outbox.put(None)
+        responses.cancel()
+
+
+def test_session_must_start_with_hello(grpc_server):
+    channel = grpc.insecure_channel(f'127.0.0.1:{grpc_server.port}', options=CHANNEL_OPTIONS)
+    responses = channel.stream_stream(SESSION_METHOD)(iter([b'\x01']))
+    with pytest.raises(grpc.RpcError) as error:
+        next(responses)
+    assert error.value.code() == grpc.StatusCode.INVALID_ARGUMENT
@@ -0,0 +1,123 @@
+# tests/test_manifest.py
+
+import numpy as np
+import pytest
+
+from common.manifest import (
+    LayerEntry, ManifestMismatch, ModelManifest, expand_flat_payload, flatten_payload, handshake_manifest,
+    manifest_url
+)
+
+
+@pytest.fixture
+def manifest():
+    return ModelManifest([
+        LayerEntry('0:kernel', (2, 3), 'float32', 0, 6),
+        LayerEntry('1:bias', (3,), 'float32', 6, 3),
+    ], architecture='abc')
+
+
+def layers():
+    return [np.arange(6, dtype=np.float32).reshape(2, 3), np.array([7, 8, 9], dtype=np.float32)]
+
+
+def test_flatten_and_unflatten_round_trip(manifest):
+    flat = manifest.flatten(layers())
+    assert flat.tolist() == [0, 1, 2, 3, 4, 5, 7, 8, 9]
+    restored = manifest.unflatten(flat)
+    assert [l.shape for l in restored] == [(2, 3), (3,)]
+    assert np.shares_memory(restored[0], flat)  # Views, sem cópia
+    assert all(np.array_equal(a, b) for a, b in zip(restored, layers()))
+
+
+def test_dict_round_trip_keeps_id(manifest):
+    other = ModelManifest.from_dict(manifest.to_dict())
+    assert other.manifest_id == manifest.manifest_id
+    manifest.check(other)
+
+
+def test_id_depends_on_layout(manifest):
+    swapped = ModelManifest([
+        LayerEntry('0:kernel', (3, 2), 'float32', 0, 6),
+        LayerEntry('1:bias', (3,), 'float32', 6, 3),
+    ], architecture='abc')
+    assert swapped.manifest_id != manifest.manifest_id
+    with pytest.raises(ManifestMismatch):
+        manifest.check(swapped)
+    with pytest.raises(ManifestMismatch):
+        manifest.check(ModelManifest(manifest.layers, architecture='xyz'))
+
+
+def test_from_dict_rejects_malformed_or_tampered(manifest):
+    with pytest.raises(ManifestMismatch):
+        ModelManifest.from_dict({'layers': [{'name': 'x'}], 'architecture': 'abc'})
+    data = manifest.to_dict()
+    data['layers'][1]['size'] = 4
+    with pytest.raises(ManifestMismatch):
+        ModelManifest.from_dict(data)
+
+
+def test_flatten_rejects_wrong_shapes(manifest):
+    with pytest.raises(ManifestMismatch):
+        manifest.flatten(layers()[:1])
+    with pytest.raises(ManifestMismatch):
+        manifest.flatten([np.zeros((3, 2), np.float32), np.zeros(3, np.float32)])
+    with pytest.raises(ManifestMismatch):
+        manifest.unflatten(np.zeros(8, np.float32))
+
+
+def test_payload_goes_flat_only_when_it_matches(manifest):
+    tensors, metadata = flatten_payload(layers(), {'samples': 5}, manifest)
+    assert len(tensors) == 1
+    assert metadata == {'samples': 5, 'manifest_id': manifest.manifest_id}
+    restored = expand_flat_payload(metadata, tensors, manifest)
+    assert all(np.array_equal(a, b) for a, b in zip(restored, layers()))
+
+    # Delta esparso (índices + valores) passa inalterado
+    sparse = [np.array([1, 4], np.int32), np.array([0.5, 0.25], np.float32)]
+    assert flatten_payload(sparse, {}, manifest) == (sparse, {})
+    assert expand_flat_payload({}, sparse, manifest) is sparse
+
+
+def test_unknown_manifest_id_is_rejected(manifest):
+    with pytest.raises(ManifestMismatch):
+        expand_flat_payload({'manifest_id': 'outro'}, [np.zeros(9, np.float32)], manifest)
+    with pytest.raises(ManifestMismatch):
+        expand_flat_payload({'manifest_id': manifest.manifest_id}, [np.zeros(9, np.float32)], None)
+
+
+class _Response:
+    def __init__(self, status_code, body=None):
+        self.status_code = status_code
+        self._body = body or {}
+
+    def json(self):
+        return self._body
+
+    def raise_for_status(self):
+        pass
+
+
+class _Session:
+    """Sessão que registra o POST e responde com `response`"""
+
+    def __init__(self, response):
+        self.response = response
+        self.posts = []
+
+    def post(self, url, **kwargs):
+        self.posts.append((url, kwargs['json']))
+        return self.response
+
+
+def test_handshake_posts_manifest_next_to_fit(manifest):
+    session = _Session(_Response(200))
+    handshake_manifest('http://client-1:5000/fit', manifest, timeout=1.0, session=session)
+    assert manifest_url('http://client-1:5000/fit') == 'http://client-1:5000/manifest'
+    assert session.posts == [('http://client-1:5000/manifest', manifest.to_dict())]
+
+
+def test_handshake_conflict_raises_mismatch(manifest):
+    session = _Session(_Response(409, {'error': 'Arquitetura diferente'}))
+    with pytest.raises(ManifestMismatch, match='Arquitetura diferente'):
+        handshake_manifest('http://client-1:5000/fit', manifest, timeout=1.0, session=session)
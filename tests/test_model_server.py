@@ -0,0 +1,73 @@
+# tests/test_model_server.py
+
+import numpy as np
+import requests
+import pytest
+
+from common.broadcast import DownlinkEncoding
+from common.model_server import ModelServer, etag_matches, version_encoder
+from common.model_store import ModelVersionStore
+from common.serialization import CONTENT_TYPE_BINARY, decode_payload
+
+
+def store_with_two_versions():
+    store = ModelVersionStore()
+    base = store.add([np.zeros(4, dtype=np.float32)])
+    target = store.add([np.ones(4, dtype=np.float32)])
+    return store, base, target
+
+
+def server_for(store, **kwargs):
+    encoding = DownlinkEncoding(CONTENT_TYPE_BINARY)
+    return ModelServer(store, version_encoder(store, encoding), CONTENT_TYPE_BINARY, **kwargs)
+
+
+@pytest.mark.parametrize('diffs', [True, False])
+def test_base_is_ignored_without_diffs(diffs):
+    store, base, target = store_with_two_versions()
+    body, _ = server_for(store, diffs=diffs).get_body(target, base)
+    metadata, _ = decode_payload(body, CONTENT_TYPE_BINARY)
+    assert metadata['base_version'] == (base if diffs else None)
+
+
+@pytest.fixture
+def running_server():
+    store, base, target = store_with_two_versions()
+    server = server_for(store, content_encoding='gzip', host='127.0.0.1', port=0)
+    server.start()
+    url = f'http://127.0.0.1:{server._httpd.server_address[1]}/model/{target}'
+    yield server, url, base
+    server.stop()
+
+
+def test_etag_depends_on_the_codec(running_server):
+    _, url, _ = running_server
+    gzip = requests.get(url, headers={'Accept-Encoding': 'gzip'})
+    identity = requests.get(url, headers={'Accept-Encoding': 'identity'})
+    assert gzip.headers['Content-Encoding'] == 'gzip' and 'Content-Encoding' not in identity.headers
+    assert gzip.headers['Vary'] == 'Accept-Encoding'
+    assert gzip.headers['ETag'] != identity.headers['ETag']
+
+
+def test_if_none_match_returns_304_for_the_same_representation(running_server):
+    _, url, base = running_server
+    first = requests.get(url, params={'base': base}, headers={'Accept-Encoding': 'gzip'})
+    etag = first.headers['ETag']
+    again = requests.get(url, params={'base': base}, headers={'Accept-Encoding': 'gzip', 'If-None-Match': etag})
+    assert again.status_code == 304 and again.content == b'' and again.headers['ETag'] == etag
+    # Outro codec, outra representação: o corpo é enviado
+    other = requests.get(url, params={'base': base},
+                         headers={'Accept-Encoding': 'identity', 'If-None-Match': etag})
+    assert other.status_code == 200 and other.content
+
+
+def test_unknown_version_is_404(running_server):
+    _, url, _ = running_server
+    assert requests.get(url[:-64] + 'f' * 64).status_code == 404
+
+
+def test_etag_matching():
+    assert etag_matches('W/"a.gzip", "b.gzip"', '"a.gzip"')
+    assert etag_matches('*', '"a.gzip"')
+    assert not etag_matches('"a.identity"', '"a.gzip"')
+    assert not etag_matches(None, '"a.gzip"')
@@ -0,0 +1,79 @@
+# tests/test_quantization.py
+
+import numpy as np
+import pytest
+
+from common.quantization import dequantize, quantize
+
+
+def layers():
+    rng = np.random.default_rng(0)
+    return [rng.normal(size=(64, 32)).astype(np.float32), rng.uniform(0.5, 2.0, size=32).astype(np.float32)]
+
+
+def test_none_is_identity():
+    tensors = layers()
+    quantized, params = quantize(tensors, 'none')
+    assert quantized is tensors
+    assert params is None
+    assert dequantize(quantized, params) is quantized
+
+
+def test_unknown_mode_is_rejected():
+    with pytest.raises(ValueError):
+        quantize(layers(), 'int4')
+
+
+def test_fp16_round_trip():
+    tensors = layers()
+    quantized, params = quantize(tensors, 'fp16')
+    assert all(q.dtype == np.float16 for q in quantized)
+    for original, restored in zip(tensors, dequantize(quantized, params)):
+        assert restored.dtype == np.float32
+        np.testing.assert_allclose(restored, original, rtol=1e-3)
+
+
+@pytest.mark.parametrize('stochastic', [False, True])
+def test_int8_error_is_within_one_step(stochastic):
+    tensors = layers()
+    quantized, params = quantize(tensors, 'int8', stochastic=stochastic, rng=np.random.default_rng(1))
+    assert all(q.dtype == np.int8 for q in quantized)
+    for original, restored, (scale, _) in zip(tensors, dequantize(quantized, params), params['params']):
+        assert restored.dtype == np.float32
+        # Arredondamento determinístico erra até meio passo; o estocástico, até um passo
+        bound = scale * (1.0 if stochastic else 0.5) + 1e-6
+        assert np.abs(restored - original).max() <= bound
+
+
+def test_int8_keeps_zero_exact():
+    # O zero-point faz o 0.0 (ex.: coordenadas não enviadas) voltar exatamente como 0.0
+    tensor = np.array([0.0, 0.3, -1.7, 0.0, 5.0], dtype=np.float32)
+    quantized, params = quantize([tensor], 'int8')
+    (restored,) = dequantize(quantized, params)
+    assert restored[0] == 0.0 and restored[3] == 0.0
+
+
+def test_int8_stochastic_rounding_is_unbiased():
+    tensor = np.full(20000, 0.123, dtype=np.float32)
+    tensor[0] = 1.0  # Define a escala
+    quantized, params = quantize([tensor], 'int8', stochastic=True, rng=np.random.default_rng(2))
+    (restored,) = dequantize(quantized, params)
+    assert abs(float(restored[1:].mean()) - 0.123) < 1e-3
+
+
+def test_integer_tensors_pass_through():
+    indices = np.array([3, 1, 4], dtype=np.uint32)
+    values = np.array([0.5, -0.25, 1.0], dtype=np.float32)
+    quantized, params = quantize([indices, values], 'int8')
+    assert quantized[0].dtype == np.uint32
+    np.testing.assert_array_equal(quantized[0], indices)
+    assert params['params'][0] is None
+    restored_indices, _ = dequantize(quantized, params)
+    np.testing.assert_array_equal(restored_indices, indices)
+
+
+def test_constant_and_empty_tensors():
+    quantized, params = quantize([np.zeros(4, dtype=np.float32), np.zeros(0, dtype=np.float32)], 'int8')
+    zeros, empty = dequantize(quantized, params)
+    np.testing.assert_array_equal(zeros, np.zeros(4, dtype=np.float32))
+    assert empty.size == 0
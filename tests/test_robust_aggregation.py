@@ -0,0 +1,167 @@
+# tests/test_robust_aggregation.py
+
+import numpy as np
+import pytest
+
+from common.aggregation import (
+    ClientUpdate, StreamingAverage, UPDATE_DENSE, UPDATE_DENSE_DELTA, UPDATE_SPARSE_DELTA
+)
+from common.robust_aggregation import (
+    AGGREGATION_RULES, RobustAggregator, coordinate_median, distances_from_gram, gram_matrix,
+    make_aggregator, trim_count, trimmed_mean
+)
+from common.serialization import PayloadError
+
+ROBUST_RULES = [rule for rule in AGGREGATION_RULES if rule != 'fedavg']
+
+
+def global_weights():
+    return [np.zeros((8, 4), dtype=np.float32), np.zeros(4, dtype=np.float32)]
+
+
+def honest_and_attacker(weights, honest=6, shift=100.0):
+    """`honest` clientes perto de +1 e um atacante deslocado de `shift`"""
+    rng = np.random.default_rng(0)
+    updates = [[w + 1 + 0.01 * rng.normal(size=w.shape).astype(np.float32) for w in weights]
+               for _ in range(honest)]
+    updates.append([w + shift for w in weights])
+    return updates
+
+
+def aggregate(rule, updates, weights, samples=None, **params):
+    aggregator = make_aggregator(rule, weights, capacity=2, **params)
+    for i, update in enumerate(updates):
+        aggregator.add(ClientUpdate(UPDATE_DENSE, update), samples[i] if samples else 10)
+    return aggregator, aggregator.result()
+
+
+@pytest.mark.parametrize('rule', ROBUST_RULES)
+def test_attacker_is_neutralised(rule):
+    weights = global_weights()
+    _, result = aggregate(rule, honest_and_attacker(weights), weights, byzantine=1)
+    for layer in result:
+        np.testing.assert_allclose(layer, 1.0, atol=0.05)
+
+
+def test_fedavg_is_not_robust():
+    weights = global_weights()
+    _, result = aggregate('fedavg', honest_and_attacker(weights), weights)
+    assert isinstance(make_aggregator('fedavg', weights), StreamingAverage)
+    assert float(result[0].mean()) > 10
+
+
+@pytest.mark.parametrize('n, fraction, expected', [
+    (7, 0.1, 1),   # int(0.7) seria 0: a regra viraria uma média comum
+    (7, 0.2, 1),
+    (7, 0.3, 2),
+    (10, 0.45, 4),
+    (3, 0.1, 1),
+    (2, 0.1, 0),   # Com 2 atualizações não há o que aparar
+    (7, 0.0, 0),
+    (5, 0.9, 2),   # Nunca descarta todas
+])
+def test_trim_count(n, fraction, expected):
+    assert trim_count(n, fraction) == expected
+
+
+def test_trimmed_mean_with_seven_clients_drops_the_outlier():
+    weights = global_weights()
+    aggregator, result = aggregate('trimmed_mean', honest_and_attacker(weights), weights, trim_fraction=0.1)
+    assert aggregator.trimmed == 1
+    assert "1 de 7" in aggregator.summary()
+    for layer in result:
+        np.testing.assert_allclose(layer, 1.0, atol=0.05)
+
+
+def test_kernels_match_numpy_for_any_block_size():
+    rng = np.random.default_rng(1)
+    deltas = rng.normal(size=(6, 1000)).astype(np.float32)
+    out = np.empty(1000, dtype=np.float32)
+    for block_bytes in (4 * 6, 4 * 6 * 37, 1 << 20):
+        np.testing.assert_allclose(coordinate_median(deltas, out, block_bytes), np.median(deltas, axis=0),
+                                   rtol=1e-6)
+        expected = np.sort(deltas, axis=0)[1:5].mean(axis=0)
+        np.testing.assert_allclose(trimmed_mean(deltas, out, 0.2, block_bytes), expected, rtol=1e-5, atol=1e-6)
+        exact = deltas.astype(np.float64)
+        np.testing.assert_allclose(gram_matrix(deltas, block_bytes), exact @ exact.T, rtol=1e-5)
+
+
+def test_distances_from_gram():
+    rows = np.array([[0, 0], [3, 4], [6, 8]], dtype=np.float32)
+    distances = distances_from_gram(gram_matrix(rows))
+    np.testing.assert_allclose(distances, [[0, 25, 100], [25, 0, 25], [100, 25, 0]])
+
+
+def test_krum_excludes_and_multi_krum_averages():
+    weights = global_weights()
+    updates = honest_and_attacker(weights)
+    krum, _ = aggregate('krum', updates, weights, byzantine=1)
+    assert krum.excluded == 6
+    multi, result = aggregate('multi_krum', updates, weights, byzantine=1)
+    assert multi.excluded == 1
+    honest_mean = [np.mean([u[i] for u in updates[:6]], axis=0) for i in range(len(weights))]
+    for got, want in zip(result, honest_mean):
+        np.testing.assert_allclose(got, want, rtol=1e-5)
+
+
+def test_norm_bounded_clips_large_deltas():
+    weights = global_weights()
+    updates = [[w + 1 for w in weights] for _ in range(3)] + [[w + 10 for w in weights]]
+    aggregator, result = aggregate('norm_bounded', updates, weights)
+    assert aggregator.excluded == 1
+    for layer in result:
+        np.testing.assert_allclose(layer, 1.0, rtol=1e-5)
+
+
+def test_deltas_are_relative_to_global_and_weighted():
+    weights = [w + 5 for w in global_weights()]
+    aggregator = RobustAggregator(weights, 'multi_krum', capacity=1)
+    aggregator.add(ClientUpdate(UPDATE_DENSE, [w + 1 for w in weights]), 10)
+    aggregator.add(ClientUpdate(UPDATE_DENSE_DELTA, [np.full_like(w, 4) for w in weights]), 30)
+    for layer in aggregator.result():
+        np.testing.assert_allclose(layer, 5 + (1 * 10 + 4 * 30) / 40, rtol=1e-6)
+
+
+def test_late_updates_are_refused_and_close_is_idempotent():
+    weights = global_weights()
+    aggregator = RobustAggregator(weights, 'median')
+    aggregator.add(ClientUpdate(UPDATE_DENSE, weights), 1)
+    aggregator.result()
+    with pytest.raises(ValueError):
+        aggregator.add(ClientUpdate(UPDATE_DENSE, weights), 1)
+    aggregator.close()
+    aggregator.close()
+
+
+def test_sealed_aggregator_still_aggregates():
+    weights = global_weights()
+    aggregator = RobustAggregator(weights, 'median')
+    for k in range(3):
+        aggregator.add(ClientUpdate(UPDATE_DENSE, [w + k for w in weights]), 1, client=k)
+    aggregator.seal()
+    with pytest.raises(ValueError):
+        aggregator.add(ClientUpdate(UPDATE_DENSE, [w + 50 for w in weights]), 1, client=3)
+    assert aggregator.clients == {0: 1, 1: 1, 2: 1}
+    for layer in aggregator.result():
+        np.testing.assert_allclose(layer, 1.0)
+    aggregator.close()
+
+
+def test_sparse_rows_accumulate_and_are_range_checked():
+    weights = global_weights()
+    aggregator = RobustAggregator(weights, 'median')
+    for _ in range(3):
+        aggregator.add(ClientUpdate(UPDATE_SPARSE_DELTA, [np.array([3, 3], dtype=np.uint32),
+                                                         np.array([1.0, 1.5], dtype=np.float32)]), 1)
+    with pytest.raises(PayloadError):
+        aggregator.add(ClientUpdate(UPDATE_SPARSE_DELTA, [np.array([36], dtype=np.uint32),
+                                                         np.array([1.0], dtype=np.float32)]), 1)
+    result = np.concatenate([layer.reshape(-1) for layer in aggregator.result()])
+    assert result[3] == pytest.approx(2.5) and np.count_nonzero(result) == 1
+
+
+def test_unknown_rule_is_rejected():
+    with pytest.raises(ValueError):
+        RobustAggregator(global_weights(), 'fedavg')
+    with pytest.raises(ValueError):
+        make_aggregator('mode', global_weights())
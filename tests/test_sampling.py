@@ -0,0 +1,70 @@
+# tests/test_sampling.py
+
+import numpy as np
+import pytest
+
+from common.sampling import ClientSampler
+
+
+def test_all_selects_every_eligible_client():
+    sampler = ClientSampler('all', fraction=0.1)
+    assert sampler.clients_per_round(50) == 50
+    assert sampler.select([4, 2, 9]) == [4, 2, 9]
+
+
+def test_fraction_and_min_clients():
+    sampler = ClientSampler('uniform', fraction=0.1, min_clients=3)
+    assert sampler.clients_per_round(100) == 10
+    assert sampler.clients_per_round(10) == 3
+    assert sampler.clients_per_round(2) == 2
+
+
+def test_unknown_strategy_is_rejected():
+    with pytest.raises(ValueError):
+        ClientSampler('round_robin')
+
+
+def test_uniform_samples_without_replacement():
+    sampler = ClientSampler('uniform', fraction=0.25, seed=0)
+    chosen = sampler.select(range(40))
+    assert len(chosen) == 10
+    assert len(set(chosen)) == 10
+    assert chosen == sorted(chosen)
+    assert set(chosen) <= set(range(40))
+    assert len(sampler.select(range(40), k=3)) == 3
+
+
+def test_seed_makes_selection_reproducible():
+    assert ClientSampler('uniform', 0.2, seed=7).select(range(50)) \
+        == ClientSampler('uniform', 0.2, seed=7).select(range(50))
+
+
+def test_stratified_allocates_proportionally():
+    sampler = ClientSampler('stratified', fraction=0.5, num_strata=2, seed=0)
+    # Quatro clientes pequenos, quatro grandes e quatro sem contagem
+    sample_counts = {i: 10 for i in range(4)} | {i: 1000 for i in range(4, 8)}
+    chosen = sampler.select(range(12), sample_counts=sample_counts)
+    assert len(chosen) == 6
+    assert sum(i < 4 for i in chosen) == 2
+    assert sum(4 <= i < 8 for i in chosen) == 2
+    assert sum(i >= 8 for i in chosen) == 2
+
+
+def test_speed_favors_fast_clients():
+    sampler = ClientSampler('speed', seed=0)
+    # Pesos 1 / rtt: cada rápido tem 40% de chance, cada lento 10%
+    rtts = {0: 1.0, 1: 1.0, 2: 4.0, 3: 4.0}
+    counts = np.zeros(4)
+    for _ in range(400):
+        for i in sampler.select(range(4), rtt_estimates=rtts, k=1):
+            counts[i] += 1
+    assert counts[:2].sum() > 2 * counts[2:].sum()
+    assert counts[2:].sum() > 0  # Os lentos continuam tendo chance
+
+
+def test_speed_gives_unknown_clients_the_median():
+    sampler = ClientSampler('speed', seed=0)
+    chosen = set()
+    for _ in range(50):
+        chosen.update(sampler.select(range(3), rtt_estimates={0: 1.0, 1: 1.0}, k=1))
+    assert 2 in chosen
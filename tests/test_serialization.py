@@ -0,0 +1,111 @@
+# tests/test_serialization.py
+
+import json
+import struct
+
+import numpy as np
+import pytest
+
+from common.serialization import (
+    CONTENT_TYPE_BINARY, CONTENT_TYPE_JSON, MAGIC, PayloadError, decode_payload, decode_weights,
+    encode_payload, encode_weights
+)
+
+
+def sample_weights():
+    return [
+        np.arange(12, dtype=np.float32).reshape(3, 4),
+        np.array([-1.5, 2.25], dtype=np.float16),
+        np.array([1, -2, 3], dtype=np.int8),
+        np.array([7, 8], dtype=np.uint32).astype(np.int64),
+        np.float32(3.5).reshape(()),
+    ]
+
+
+@pytest.mark.parametrize('content_type', [CONTENT_TYPE_BINARY, CONTENT_TYPE_JSON])
+def test_round_trip(content_type):
+    weights = sample_weights()
+    metadata, decoded = decode_payload(encode_payload(weights, {'sample_count': 10}, content_type), content_type)
+    assert metadata['sample_count'] == 10
+    assert len(decoded) == len(weights)
+    for original, restored in zip(weights, decoded):
+        assert restored.dtype == original.dtype
+        assert restored.shape == original.shape
+        np.testing.assert_array_equal(restored, original)
+
+
+def test_binary_decode_is_zero_copy_and_read_only():
+    body = encode_weights([np.ones(4, dtype=np.float32)])
+    _, (tensor,) = decode_weights(body)
+    assert not tensor.flags.writeable
+    assert np.shares_memory(tensor, np.frombuffer(body, dtype=np.uint8))
+
+
+def test_content_type_parameters_are_ignored():
+    body = encode_payload([np.zeros(2, dtype=np.float32)], {}, CONTENT_TYPE_JSON)
+    _, (tensor,) = decode_payload(body, 'application/json; charset=utf-8')
+    np.testing.assert_array_equal(tensor, np.zeros(2, dtype=np.float32))
+
+
+def test_unsupported_dtype_is_rejected():
+    with pytest.raises(PayloadError):
+        encode_weights([np.zeros(2, dtype=np.complex64)])
+
+
+def _with_nbytes(body: bytes, nbytes: int) -> bytes:
+    """Payload de um único tensor 1-D com o campo de tamanho trocado"""
+    meta_len = struct.unpack_from('<I', body, 4)[0]
+    offset = 4 + 4 + meta_len + 4 + 2 + 4  # Até o tamanho em bytes do primeiro tensor
+    return body[:offset] + struct.pack('<Q', nbytes) + body[offset + 8:]
+
+
+MALFORMED_BINARY = {
+    'empty': b'',
+    'bad_magic': b'XXXX' + encode_weights([np.zeros(2, dtype=np.float32)])[4:],
+    'truncated_header': MAGIC + b'\x05\x00',
+    'truncated_metadata': MAGIC + struct.pack('<I', 100) + b'{}',
+    'truncated_tensor': encode_weights([np.zeros(8, dtype=np.float32)])[:-5],
+    'missing_tensor': encode_weights([np.zeros(2, dtype=np.float32)])[:-8],
+    'nbytes_mismatch': _with_nbytes(encode_weights([np.zeros(4, dtype=np.float32)]), 8),
+    'nbytes_overflow': _with_nbytes(encode_weights([np.zeros(4, dtype=np.float32)]), 1 << 62),
+    'unknown_dtype': encode_weights([np.zeros(2, dtype=np.float32)]).replace(
+        struct.pack('<BB', 0, 1) + struct.pack('<I', 2), struct.pack('<BB', 99, 1) + struct.pack('<I', 2)
+    ),
+    'invalid_metadata_json': MAGIC + struct.pack('<I', 3) + b'{x}' + struct.pack('<I', 0),
+    'metadata_not_object': MAGIC + struct.pack('<I', 2) + b'[]' + struct.pack('<I', 0),
+    'metadata_not_utf8': MAGIC + struct.pack('<I', 2) + b'\xff\xfe' + struct.pack('<I', 0),
+}
+
+
+@pytest.mark.parametrize('body', MALFORMED_BINARY.values(), ids=MALFORMED_BINARY.keys())
+def test_malformed_binary_payload_raises_payload_error(body):
+    with pytest.raises(PayloadError):
+        decode_payload(body, CONTENT_TYPE_BINARY)
+
+
+MALFORMED_JSON = {
+    'invalid_json': b'{"weights": [1, 2',
+    'not_object': b'[1, 2, 3]',
+    'not_utf8': b'\xff\xfe{}',
+    'ragged_tensor': json.dumps({'weights': [[[1, 2], [3]]]}).encode(),
+    'bad_dtype': json.dumps({'weights': [[1, 2]], 'dtypes': ['not-a-dtype']}).encode(),
+    'non_numeric': json.dumps({'weights': [['a', 'b']]}).encode(),
+    'fewer_dtypes': json.dumps({'weights': [[1], [2]], 'dtypes': ['float32']}).encode(),
+    'more_dtypes': json.dumps({'weights': [[1]], 'dtypes': ['float32', 'int8']}).encode(),
+    'object_dtype': json.dumps({'weights': [[1]], 'dtypes': ['object']}).encode(),
+    'string_dtype': json.dumps({'weights': [[1]], 'dtypes': ['<U8']}).encode(),
+    'dtype_not_string': json.dumps({'weights': [[1]], 'dtypes': [{'a': 1}]}).encode(),
+    'weights_not_list': json.dumps({'weights': {'0': [1]}}).encode(),
+    'int8_overflow': json.dumps({'weights': [[1000]], 'dtypes': ['int8']}).encode(),
+}
+
+
+@pytest.mark.parametrize('body', MALFORMED_JSON.values(), ids=MALFORMED_JSON.keys())
+def test_malformed_json_payload_raises_payload_error(body):
+    with pytest.raises(PayloadError):
+        decode_payload(body, CONTENT_TYPE_JSON)
+
+
+def test_unknown_content_type_raises_payload_error():
+    with pytest.raises(PayloadError):
+        decode_payload(b'{}', 'text/plain')
@@ -0,0 +1,71 @@
+# tests/test_sharded_aggregation.py
+
+import numpy as np
+import pytest
+
+from common.aggregation import ClientUpdate, UPDATE_DENSE
+from common.robust_aggregation import AGGREGATION_RULES, SERIAL_EXECUTOR, RobustAggregator
+from common.sharded_aggregation import ShardedExecutor, create_executor, shard_ranges
+
+ROBUST_RULES = [rule for rule in AGGREGATION_RULES if rule != 'fedavg']
+
+
+@pytest.fixture(scope='module')
+def sharded():
+    executor = ShardedExecutor(3)
+    yield executor
+    executor.shutdown()
+
+
+def model_weights():
+    # Camadas que não se alinham às fatias, para que uma fatia cruze camadas
+    rng = np.random.default_rng(0)
+    return [rng.normal(size=(50, 70)).astype(np.float32), rng.normal(size=1234).astype(np.float32)]
+
+
+def client_updates(weights, clients=7):
+    rng = np.random.default_rng(1)
+    updates = [[w + rng.normal(scale=0.1, size=w.shape).astype(np.float32) for w in weights]
+               for _ in range(clients - 1)]
+    updates.append([w + 50 for w in weights])
+    return updates
+
+
+def aggregate(rule, executor, updates, weights):
+    aggregator = RobustAggregator(weights, rule, capacity=2, byzantine=1, trim_fraction=0.2,
+                                  block_bytes=4096, executor=executor)
+    for i, update in enumerate(updates):
+        aggregator.add(ClientUpdate(UPDATE_DENSE, update), 10 + i)
+    return aggregator.result(), aggregator.excluded
+
+
+@pytest.mark.parametrize('rule', ROBUST_RULES)
+def test_sharded_matches_serial(rule, sharded):
+    weights = model_weights()
+    updates = client_updates(weights)
+    serial, serial_excluded = aggregate(rule, SERIAL_EXECUTOR, updates, weights)
+    parallel, parallel_excluded = aggregate(rule, sharded, updates, weights)
+    assert parallel_excluded == serial_excluded
+    for got, want in zip(parallel, serial):
+        assert got.shape == want.shape
+        # Mesma operação por coluna; só a ordem das somas parciais (Gram, normas) muda
+        np.testing.assert_allclose(got, want, rtol=1e-5, atol=1e-6)
+
+
+def test_shard_ranges_cover_all_columns():
+    for num_cols, num_shards in ((1, 4), (1000, 3), (5000, 3), (4096, 4), (10 ** 6, 7)):
+        ranges = shard_ranges(num_cols, num_shards, alignment=1024)
+        assert ranges[0][0] == 0 and ranges[-1][1] == num_cols
+        assert all(stop == start for (_, stop), (start, _) in zip(ranges, ranges[1:]))
+        assert len(ranges) <= num_shards
+        assert all(start % 1024 == 0 for start, _ in ranges)
+
+
+def test_run_rejects_foreign_arrays(sharded):
+    with pytest.raises(ValueError):
+        sharded.run('sq_norms', np.ones((2, 10), dtype=np.float32))
+
+
+def test_create_executor():
+    assert create_executor(1) is SERIAL_EXECUTOR
+    assert create_executor(0) is SERIAL_EXECUTOR
@@ -0,0 +1,62 @@
+# tests/test_sparsification.py
+
+import numpy as np
+
+from common.sparsification import ErrorFeedback, flatten, topk_sparsify
+
+
+def test_flatten_concatenates_layers_as_float32():
+    flat = flatten([np.ones((2, 3), dtype=np.float64), np.arange(2, dtype=np.float32)])
+    assert flat.dtype == np.float32
+    np.testing.assert_array_equal(flat, [1, 1, 1, 1, 1, 1, 0, 1])
+
+
+def test_topk_selects_largest_magnitudes_in_order():
+    vector = np.array([0.1, -5.0, 0.2, 3.0, -0.05, 4.0], dtype=np.float32)
+    sparse = topk_sparsify(vector, density=0.5)
+    assert sparse.indices.dtype == np.uint32
+    np.testing.assert_array_equal(sparse.indices, [1, 3, 5])
+    np.testing.assert_array_equal(sparse.values, vector[[1, 3, 5]])
+
+
+def test_topk_keeps_at_least_one_and_at_most_all():
+    vector = np.array([1.0, -2.0, 3.0], dtype=np.float32)
+    assert len(topk_sparsify(vector, density=0.0).indices) == 1
+    np.testing.assert_array_equal(topk_sparsify(vector, density=2.0).indices, [0, 1, 2])
+
+
+def test_error_feedback_conserves_the_update():
+    rng = np.random.default_rng(0)
+    feedback = ErrorFeedback()
+    deltas = [[rng.normal(size=(10, 10)).astype(np.float32), rng.normal(size=10).astype(np.float32)]
+              for _ in range(5)]
+    sent = np.zeros(110, dtype=np.float32)
+    for delta in deltas:
+        sparse = feedback.compress(delta, density=0.1)
+        assert len(sparse.indices) == 11
+        sent[sparse.indices] += sparse.values
+    # O que foi enviado mais o resíduo é exatamente a soma dos deltas
+    total = sum(flatten(delta) for delta in deltas)
+    np.testing.assert_allclose(sent + feedback.residual, total, atol=1e-5)
+
+
+def test_error_feedback_sends_accumulated_residual():
+    feedback = ErrorFeedback()
+    small = [np.array([0.4, 1.0], dtype=np.float32)]
+    first = feedback.compress(small, density=0.5)
+    np.testing.assert_array_equal(first.indices, [1])
+    # O 0.4 não enviado se acumula até superar as novas coordenadas
+    second = feedback.compress([np.array([0.4, 0.5], dtype=np.float32)], density=0.5)
+    np.testing.assert_array_equal(second.indices, [0])
+    np.testing.assert_allclose(second.values, [0.8])
+
+
+def test_error_feedback_reset_and_shape_change():
+    feedback = ErrorFeedback()
+    feedback.compress([np.array([1.0, 0.5], dtype=np.float32)], density=0.5)
+    feedback.reset()
+    assert feedback.residual is None
+    feedback.compress([np.array([1.0, 0.5], dtype=np.float32)], density=0.5)
+    # Resíduo de outro modelo (shape diferente) é ignorado
+    sparse = feedback.compress([np.array([0.1, 0.2, 0.3], dtype=np.float32)], density=1.0)
+    np.testing.assert_allclose(sparse.values, [0.1, 0.2, 0.3])
@@ -0,0 +1,133 @@
+# tests/test_streaming.py
+
+import io
+import struct
+
+import numpy as np
+import pytest
+
+from common.serialization import PayloadError
+from common.streaming import STREAM_CHUNK_BYTES, STREAM_MAGIC, LayerStream, read_stream
+
+LIMIT = 16 * 1024 * 1024
+
+
+def layers():
+    return [
+        np.arange(20, dtype=np.float32).reshape(4, 5),
+        np.array([1.5, -2.5], dtype=np.float16),
+        np.array([3, 1, 4], dtype=np.uint32).astype(np.int64),
+        np.float32(7.0).reshape(()),
+    ]
+
+
+def encode(tensors, metadata=None) -> bytes:
+    return b''.join(LayerStream(tensors, metadata))
+
+
+class Trickle(io.RawIOBase):
+    """Stream que entrega poucos bytes por leitura, como um socket"""
+
+    def __init__(self, data: bytes, step: int = 3):
+        self._data = io.BytesIO(data)
+        self._step = step
+
+    def readable(self):
+        return True
+
+    def readinto(self, buffer):
+        chunk = self._data.read(min(len(buffer), self._step))
+        buffer[:len(chunk)] = chunk
+        return len(chunk)
+
+
+class ReadOnly:
+    """Stream sem readinto (ex.: o corpo de uma requisição do Flask)"""
+
+    def __init__(self, data: bytes):
+        self._data = io.BytesIO(data)
+
+    def read(self, size):
+        return self._data.read(size)
+
+
+@pytest.mark.parametrize('wrap', [io.BytesIO, Trickle, ReadOnly])
+def test_round_trip(wrap):
+    tensors = layers()
+    metadata, stream = read_stream(wrap(encode(tensors, {'sample_count': 3})), LIMIT)
+    assert metadata == {'sample_count': 3}
+    decoded = list(stream)
+    assert len(decoded) == len(tensors)
+    for original, restored in zip(tensors, decoded):
+        assert restored.dtype == original.dtype
+        assert restored.shape == original.shape
+        np.testing.assert_array_equal(restored, original)
+
+
+def test_layers_are_read_on_demand():
+    body = io.BytesIO(encode(layers()))
+    _, stream = read_stream(body, LIMIT)
+    header_end = body.tell()
+    next(stream)
+    # Só a primeira camada foi consumida do stream
+    assert header_end < body.tell() < len(body.getvalue())
+
+
+def test_large_layer_is_chunked():
+    tensor = np.ones(STREAM_CHUNK_BYTES // 2, dtype=np.float32)  # 2 pedaços
+    chunks = list(LayerStream([tensor]))
+    assert max(len(chunk) for chunk in chunks) == STREAM_CHUNK_BYTES
+    _, stream = read_stream(io.BytesIO(b''.join(chunks)), LIMIT)
+    np.testing.assert_array_equal(next(stream), tensor)
+
+
+def test_stream_counts_emitted_bytes():
+    stream = LayerStream(layers())
+    body = b''.join(stream)
+    assert stream.nbytes == len(body)
+
+
+def _header(metadata: bytes) -> bytes:
+    return STREAM_MAGIC + struct.pack('<I', len(metadata)) + metadata
+
+
+MALFORMED_HEADERS = {
+    'empty': b'',
+    'bad_magic': b'FLW1' + encode(layers())[4:],
+    'truncated_metadata': STREAM_MAGIC + struct.pack('<I', 10) + b'{}',
+    'metadata_over_limit': STREAM_MAGIC + struct.pack('<I', LIMIT + 1),
+    'invalid_metadata_json': _header(b'{x'),
+    'metadata_not_object': _header(b'[1]'),
+    'metadata_not_utf8': _header(b'\xff\xfe'),
+}
+
+
+@pytest.mark.parametrize('body', MALFORMED_HEADERS.values(), ids=MALFORMED_HEADERS.keys())
+def test_malformed_header_raises_payload_error(body):
+    with pytest.raises(PayloadError):
+        read_stream(io.BytesIO(body), LIMIT)
+
+
+def _layer(dtype_code: int, shape, nbytes: int, data: bytes = b'') -> bytes:
+    return bytes([dtype_code, len(shape)]) + struct.pack(f'<{len(shape)}I', *shape) + struct.pack('<Q', nbytes) + data
+
+
+MALFORMED_LAYERS = {
+    'missing_end_marker': encode(layers())[:-1],
+    'truncated_layer': encode([np.zeros(100, dtype=np.float32)])[:-50],
+    'unknown_dtype': _header(b'{}') + _layer(99, (2,), 8, bytes(8)) + b'\xff',
+    'nbytes_mismatch': _header(b'{}') + _layer(0, (4,), 8, bytes(8)) + b'\xff',
+    'layer_over_limit': _header(b'{}') + _layer(0, (4,), LIMIT + 4) + b'\xff',
+}
+
+
+@pytest.mark.parametrize('body', MALFORMED_LAYERS.values(), ids=MALFORMED_LAYERS.keys())
+def test_malformed_layer_raises_payload_error(body):
+    _, stream = read_stream(io.BytesIO(body), LIMIT)
+    with pytest.raises(PayloadError):
+        list(stream)
+
+
+def test_unsupported_dtype_is_rejected_when_sending():
+    with pytest.raises(PayloadError):
+        encode([np.zeros(2, dtype=np.complex64)])
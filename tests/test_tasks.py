@@ -0,0 +1,79 @@
+# tests/test_tasks.py
+
+import threading
+import time
+
+import pytest
+import requests
+
+from common.tasks import TaskServer, TaskTimeout
+
+
+@pytest.fixture
+def task_server():
+    server = TaskServer(host='127.0.0.1', port=0, poll_wait=2.0)
+    server.start()
+    server.url = f'http://127.0.0.1:{server._httpd.server_address[1]}'
+    yield server
+    server.stop()
+
+
+def read_all(upload):
+    body = upload.raw.read()
+    return body, len(body), 0.0
+
+
+def test_task_goes_only_to_its_client(task_server):
+    polled = {}
+
+    def poll(client):
+        polled[client] = task_server.poll(client, 1.0)
+
+    threads = [threading.Thread(target=poll, args=(client,)) for client in ('client-1', 'client-2')]
+    for thread in threads:
+        thread.start()
+    time.sleep(0.1)
+    task = task_server.submit('http://client-1:5000/fit', b'modelo', {}, read_all)
+    threads[0].join(2)
+    assert polled['client-1'] is task
+    threads[1].join(2)
+    assert polled['client-2'] is None
+
+
+def test_result_round_trip_over_http(task_server):
+    def client():
+        response = requests.get(f'{task_server.url}/task', params={'client': 'client-1', 'wait': 2})
+        assert response.status_code == 200 and response.content == b'modelo'
+        task_id = response.headers['X-Task-Id']
+        requests.post(f'{task_server.url}/task/{task_id}/result', data=b'pesos',
+                      headers={'Content-Type': 'application/octet-stream'})
+
+    thread = threading.Thread(target=client)
+    thread.start()
+    task = task_server.run('http://client-1:5000/fit', b'modelo', {}, read_all, timeout=5)
+    thread.join(5)
+    assert task.status == 200 and task.result[0] == b'pesos'
+
+
+def test_unanswered_task_times_out_and_late_result_is_gone(task_server):
+    with pytest.raises(TaskTimeout):
+        task_server.run('http://client-1:5000/fit', b'modelo', {}, read_all, timeout=0.1)
+    response = requests.post(f'{task_server.url}/task/{"0" * 32}/result', data=b'pesos')
+    assert response.status_code == 410
+
+
+@pytest.mark.parametrize('wait', ['abc', '-1', 'nan'])
+def test_invalid_wait_is_400(task_server, wait):
+    response = requests.get(f'{task_server.url}/task', params={'client': 'client-1', 'wait': wait})
+    assert response.status_code == 400
+
+
+def test_empty_poll_is_204(task_server):
+    response = requests.get(f'{task_server.url}/task', params={'client': 'client-1', 'wait': '0'})
+    assert response.status_code == 204
+
+
+def test_invalid_fit_status_is_400(task_server):
+    response = requests.post(f'{task_server.url}/task/{"0" * 32}/result', data=b'x',
+                             headers={'X-Fit-Status': 'ok'})
+    assert response.status_code == 400
@@ -0,0 +1,118 @@
+# tests/test_training.py
+
+import importlib.util
+import os
+import subprocess
+import sys
+
+import pytest
+
+from common.training import TrainingConfig, _config_values, aggregation_executor
+from common.robust_aggregation import SERIAL_EXECUTOR
+
+
+def test_from_env_reads_prefixed_names():
+    config = TrainingConfig.from_env({
+        'NUM_ROUNDS': '4',
+        'TRAINING_MODE': 'fedbuff',
+        'PIPELINED_EVALUATION': '1',
+        'WIRE_FORMAT': 'json',
+        'COMPRESSION_LEVEL': '7',
+        'MODEL_TRANSFER': 'pull',
+        'MODEL_SERVER_PORT': '6000',
+        'ROUND_QUORUM': '5',
+        'ROUND_DEADLINE': '2.5',
+        'FEDBUFF_BUFFER_SIZE': '8',
+        'SAMPLING_STRATEGY': 'uniform',
+        'SAMPLING_SEED': '42',
+        'TASK_PROTOCOL': 'poll',
+        'AGGREGATION_RULE': 'median',
+        'AGGREGATION_WORKERS': '3',
+        'CLIENT_ENDPOINTS': 'http://a:5000/fit, ,http://b:5000/fit',
+    })
+    assert config.num_rounds == 4 and config.training_mode == 'fedbuff'
+    assert config.pipelined_evaluation is True
+    assert config.encoding.wire_format == 'json' and config.encoding.compression_level == 7
+    assert config.model.transfer == 'pull'
+    assert config.model.server_url == 'http://orchestrator:6000'
+    assert (config.round.quorum, config.round.deadline) == (5, 2.5)
+    assert config.fedbuff.buffer_size == 8
+    assert config.server_steps == 4
+    assert (config.sampling.strategy, config.sampling.seed) == ('uniform', 42)
+    assert config.tasks.protocol == 'poll'
+    assert config.aggregation.rule == 'median' and config.aggregation.shards == 3
+    assert config.client_endpoints == ['http://a:5000/fit', 'http://b:5000/fit']
+
+
+def test_from_env_defaults_and_endpoints_file(tmp_path):
+    endpoints = tmp_path / 'endpoints.txt'
+    endpoints.write_text('http://a:5000/fit\n\nhttp://b:5000/fit\n')
+    config = TrainingConfig.from_env({'CLIENT_ENDPOINTS_FILE': str(endpoints), 'ROUND_QUORUM': ' '})
+    assert config == TrainingConfig(client_endpoints=['http://a:5000/fit', 'http://b:5000/fit'])
+    assert config.encoding.compression_level is None
+    assert config.aggregation.shards == 1
+
+
+def test_invalid_aggregation_rule_is_rejected():
+    with pytest.raises(ValueError):
+        TrainingConfig.from_env({'AGGREGATION_RULE': 'mode'})
+
+
+def test_streaming_is_push_only():
+    config = TrainingConfig.from_env({'STREAMING': '1', 'TASK_PROTOCOL': 'grpc'})
+    assert config.encoding.streaming is False
+
+
+def test_diffs_are_off_with_downlink_quantization():
+    assert TrainingConfig.from_env({'DOWNLINK_QUANTIZATION': 'int8'}).model.diffs is False
+    assert TrainingConfig.from_env({'UPLINK_QUANTIZATION': 'int8'}).model.diffs is True
+
+
+def test_fedavg_aggregates_in_process():
+    config = TrainingConfig.from_env({'AGGREGATION_WORKERS': '4'})
+    assert aggregation_executor(config) is SERIAL_EXECUTOR
+
+
+def test_optional_transports_are_imported_lazily():
+    # Num interpretador novo: os outros testes podem já ter importado os transportes
+    code = ("import sys, common.training; "
+            "print(sorted(m for m in ('grpc', 'common.grpc_transport', 'common.tasks', 'common.model_server') "
+            "if m in sys.modules))")
+    result = subprocess.run([sys.executable, '-c', code], capture_output=True, text=True, check=True,
+                            cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    assert result.stdout.strip() == '[]'
+
+
+def _load_test_config():
+    """node_failure_tests/config.py, carregado pelo caminho (o diretório não é um pacote)"""
+    path = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'node_failure_tests', 'config.py')
+    spec = importlib.util.spec_from_file_location('failure_tests_config', path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def test_from_module_reads_every_session_constant():
+    module = _load_test_config()
+    names = []
+    _config_values(TrainingConfig, lambda name: names.append(name))
+    # Fora da sessão: timeouts do baseline, exportação, cenários e análise
+    other = {'MIN_TIMEOUT', 'MAX_TIMEOUT', 'ALPHA', 'BETA', 'RESULTS_DIR', 'EXPORT_JSON', 'EXPORT_GRAPHS',
+             'CUSTOM_SCENARIOS', 'RESILIENCE_THRESHOLDS', 'CONVERGENCE_THRESHOLD', 'GRAPH_SETTINGS'}
+    constants = {name for name in vars(module) if name.isupper()}
+    assert constants - other <= set(names)
+
+
+def test_from_module_values_reach_the_config():
+    module = _load_test_config()
+    module.AGGREGATION_RULE = 'trimmed_mean'
+    module.AGGREGATION_TRIM_FRACTION = 0.2
+    module.ROUND_QUORUM = 2
+    module.SAMPLING_STRATEGY = 'speed'
+    module.COMPRESSION_LEVEL = None
+    config = TrainingConfig.from_module(module)
+    assert config.aggregation.rule == 'trimmed_mean' and config.aggregation.trim_fraction == 0.2
+    assert config.round.quorum == 2 and config.sampling.strategy == 'speed'
+    assert config.model.server_url == module.MODEL_SERVER_URL
+    assert config.client_endpoints == module.CLIENT_ENDPOINTS and config.num_rounds == module.NUM_ROUNDS
+    assert config.encoding.compression_level is None